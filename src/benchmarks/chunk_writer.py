@@ -0,0 +1,95 @@
+"""
+Chunk insert throughput: the former insert path (pydantic round-trip and one
+ordered insert_many per file) against ChunkModel.bulk_insert_chunks.
+
+Needs a local mongod; writes to a throwaway database that is dropped afterwards.
+Run from src/:
+    python -m benchmarks.chunk_writer --chunks 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from helpers.config import get_settings
+from models.ChunkModel import ChunkModel
+from models.db_schemes.chunk import Chunk
+from utils.files.chunck import get_content_hash
+
+CONTENT = ("retrieval augmented generation splits documents into overlapping chunks "
+           "that are embedded and stored for vector search. ") * 7
+
+
+def make_chunks(count: int):
+    return [
+        {
+            "project_id": "benchmark",
+            "filename": "benchmark.txt",
+            "file_index": 0,
+            "file_id": "benchmark",
+            "chunk_id": i,
+            "total_chunks": count,
+            "chunk_size": len(CONTENT),
+            "content": CONTENT,
+            "content_hash": get_content_hash(f"{i}"),
+            "metadata": {"project_id": "benchmark", "filename": "benchmark.txt", "page": i // 4,
+                         "start_index": i * 800, "end_index": i * 800 + len(CONTENT)},
+        }
+        for i in range(count)
+    ]
+
+
+async def legacy_insert(chunk_model: ChunkModel, chunks):
+    docs = [Chunk(**doc).model_dump() for doc in chunks]
+    result = await chunk_model.collection.insert_many(docs)
+    return len(result.inserted_ids)
+
+
+async def run(name, chunk_model: ChunkModel, count: int, insert):
+    chunks = make_chunks(count)
+    await chunk_model.collection.delete_many({})
+
+    start = time.perf_counter()
+    inserted = await insert(chunks)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34}{count:>10}{inserted:>10}{elapsed:>10.2f}{inserted / elapsed:>14.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--database", default="rag_benchmark")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(get_settings().MONGODB_URL)
+    chunk_model = ChunkModel(db_client=client[args.database])
+    await chunk_model.create_indexes()
+
+    async def bulk(chunks, fast_validation: bool):
+        inserted, _ = await chunk_model.bulk_insert_chunks(
+            chunks,
+            fast_validation=fast_validation,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency
+        )
+        return inserted
+
+    print(f"{'writer':<34}{'chunks':>10}{'inserted':>10}{'seconds':>10}{'chunks/s':>14}")
+    try:
+        for count in args.chunks:
+            await run("legacy (validated, ordered)", chunk_model, count,
+                      lambda chunks: legacy_insert(chunk_model, chunks))
+            await run("bulk (validated)", chunk_model, count,
+                      lambda chunks: bulk(chunks, fast_validation=False))
+            await run(f"bulk fast x{args.concurrency}", chunk_model, count,
+                      lambda chunks: bulk(chunks, fast_validation=True))
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
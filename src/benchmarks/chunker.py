@@ -0,0 +1,90 @@
+"""
+Throughput of the streaming FileChunker against the old process_simpler_splitter.
+
+Run from src/:
+    python -m benchmarks.chunker --mb 200 --chunk-size 1000 --overlap 200
+"""
+import argparse
+import random
+import time
+
+from utils.files.chunck import FileChunker, CHUNK_UNIT_CHAR, CHUNK_UNIT_TOKEN
+
+WORDS = ("retrieval augmented generation vector index chunk overlap page token "
+         "mongo qdrant embedding query answer document project file stream").split()
+
+
+def make_pages(total_mb: int, page_chars: int = 3000):
+    """Deterministic pages of short lines, about total_mb megabytes of text"""
+    rng = random.Random(7)
+    line = lambda: " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 14)))
+    lines_per_page = page_chars // 60
+    pattern = "\n".join(line() for _ in range(lines_per_page * 16)).split("\n")
+
+    pages = []
+    total = 0
+    index = 0
+    while total < total_mb * 1048576:
+        start = (index * 7) % (len(pattern) - lines_per_page)
+        page = "\n".join(pattern[start:start + lines_per_page])
+        pages.append(page)
+        total += len(page)
+        index += 1
+    return pages
+
+
+def legacy_splitter(texts, chunk_size: int, splitter_tag: str = "\n"):
+    """The former ProcessController.process_simpler_splitter"""
+    full_text = " ".join(texts)
+    lines = [doc.strip() for doc in full_text.split(splitter_tag) if len(doc.strip()) > 1]
+
+    chunks = []
+    current_chunk = ""
+    for line in lines:
+        current_chunk += line + splitter_tag
+        if len(current_chunk) >= chunk_size:
+            chunks.append(current_chunk.strip())
+            current_chunk = ""
+
+    if len(current_chunk) >= 0:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def run(name, fn, total_chars):
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28}{count:>12}{elapsed:>10.2f}{total_chars / 1048576 / elapsed:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = make_pages(args.mb)
+    total_chars = sum(len(page) for page in pages)
+    print(f"{len(pages)} pages, {total_chars / 1048576:.0f} MB of text")
+    print(f"{'splitter':<28}{'chunks':>12}{'seconds':>10}{'MB/s':>12}")
+
+    run("legacy (no overlap)", lambda: len(legacy_splitter(pages, args.chunk_size)), total_chars)
+
+    char_chunker = FileChunker(args.chunk_size, 0, CHUNK_UNIT_CHAR)
+    run("streaming char (no overlap)",
+        lambda: sum(1 for _ in char_chunker.iter_chunks((page, {}) for page in pages)), total_chars)
+
+    overlap_chunker = FileChunker(args.chunk_size, args.overlap, CHUNK_UNIT_CHAR)
+    run("streaming char + overlap",
+        lambda: sum(1 for _ in overlap_chunker.iter_chunks((page, {}) for page in pages)), total_chars)
+
+    # About 6 characters per word in the generated text
+    token_chunker = FileChunker(args.chunk_size // 6, args.overlap // 6, CHUNK_UNIT_TOKEN)
+    run("streaming token + overlap",
+        lambda: sum(1 for _ in token_chunker.iter_chunks((page, {}) for page in pages)), total_chars)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Recall@k against queries per second of the IVF-PQ store, over nprobe and refine.
+
+Uses the synthetic corpus of the quantization benchmark; the exact scan of the
+MMAP store on the same vectors is the baseline row. Queries are searched one
+at a time, as the search endpoint does. The index files go to a temporary
+directory unless --path is given.
+Run from src/:
+    python -m benchmarks.ivf_pq --vectors 200000 --dim 384 --nlist 1024
+    python -m benchmarks.ivf_pq --nprobe 1 4 16 64 --refine 0 4 16
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.vector_quantization import make_corpus, exact_top_k, recall
+from stores.VectorDB.VectorDBEnum import DistanceMethodEnums
+from stores.VectorDB.Providers.MmapVectorDB import MmapVectorDB
+from stores.VectorDB.Providers.IvfPqVectorDB import IvfPqVectorDB
+
+COLLECTION = "benchmark_ivf_pq"
+
+
+def insert(db, vectors, batch_size: int = 10000):
+    db.create_collection(collection_name=COLLECTION, embedding_size=vectors.shape[1], do_reset=True)
+    for start in range(0, len(vectors), batch_size):
+        ids = range(start, min(start + batch_size, len(vectors)))
+        db.insert_many(
+            collection_name=COLLECTION,
+            text=[""] * len(ids),
+            vector=vectors[start:start + batch_size],
+            metadata=[{"i": i} for i in ids],
+            record_id=[str(i) for i in ids]
+        )
+    # training runs in the background after an insert; the benchmark wants the trained index
+    db.compact(COLLECTION)
+
+
+def measure(search, queries, truth):
+    found = []
+    start = time.perf_counter()
+    for query in queries:
+        found.append([document.metadata["i"] for document in search(query) or []])
+    seconds = time.perf_counter() - start
+    return recall(found, truth), len(queries) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--subvectors", type=int, default=48)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--refine", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--path", default=None, help="directory for the index files")
+    args = parser.parse_args()
+
+    vectors, queries = make_corpus(args.vectors, args.dim, args.queries)
+    truth = exact_top_k(vectors, queries, args.k)
+    path = args.path or tempfile.mkdtemp(prefix="ivf_pq_")
+
+    exact = MmapVectorDB(db_path=f"{path}/exact", distance_method=DistanceMethodEnums.COSINE.value)
+    exact.connect()
+    insert(exact, vectors)
+    exact_recall, exact_qps = measure(
+        lambda query: exact.search_by_vector(COLLECTION, query, args.k), queries, truth
+    )
+    exact.delete_collection(COLLECTION)
+
+    db = IvfPqVectorDB(
+        db_path=f"{path}/ivf_pq",
+        distance_method=DistanceMethodEnums.COSINE.value,
+        nlist=args.nlist,
+        pq_subvectors=args.subvectors
+    )
+    db.connect()
+    start = time.perf_counter()
+    insert(db, vectors)
+    build_seconds = time.perf_counter() - start
+    info = db.get_collection_info(COLLECTION)
+    print(f"{info['vectors_count']} vectors, {info['nlist']} lists, {info['pq_subvectors']} bytes per code, "
+          f"built in {build_seconds:.1f}s")
+
+    print(f"{'nprobe':>8}{'refine':>8}{'recall@k':>10}{'QPS':>10}")
+    print(f"{'exact':>8}{'-':>8}{exact_recall:>10.3f}{exact_qps:>10.1f}")
+    for refine in args.refine:
+        db.refine = refine
+        for nprobe in args.nprobe:
+            found_recall, qps = measure(
+                lambda query: db.search_by_vector(COLLECTION, query, args.k, nprobe=nprobe), queries, truth
+            )
+            print(f"{nprobe:>8}{refine:>8}{found_recall:>10.3f}{qps:>10.1f}")
+    db.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
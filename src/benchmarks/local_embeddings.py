@@ -0,0 +1,57 @@
+"""
+CPU throughput of the local embedding provider, in texts/s and texts/s per core.
+
+Uses the feature-hashing encoder unless --model names a sentence-transformers
+model already on disk.
+Run from src/:
+    python -m benchmarks.local_embeddings --texts 20000 --threads 1 2 4
+    python -m benchmarks.local_embeddings --model /models/all-MiniLM-L6-v2 --texts 2000
+"""
+import argparse
+import os
+import random
+import time
+
+from stores.llm.LLMEnum import LocalEnum
+from stores.llm.providers.LocalProvider import LocalProvider
+
+WORDS = ("retrieval augmented generation vector index chunk overlap page token "
+         "mongo qdrant embedding query answer document project file stream").split()
+
+
+def make_texts(count: int, words_per_text: int):
+    rng = random.Random(7)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_text)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=LocalEnum.HASHING.value)
+    parser.add_argument("--embedding-size", type=int, default=384)
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=120, help="words per text, about one chunk")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.words)
+
+    print(f"{'model':<24}{'threads':>8}{'texts':>10}{'seconds':>10}{'texts/s':>12}{'per core':>12}")
+    for threads in args.threads:
+        provider = LocalProvider(embedding_batch_size=args.batch_size, num_threads=threads)
+        provider.set_embedding_model(model_id=args.model, embedding_size=args.embedding_size)
+        # warm up: model weights, thread start-up
+        provider.embed_texts(texts[:args.batch_size])
+
+        start = time.perf_counter()
+        vectors = provider.embed_texts(texts)
+        elapsed = time.perf_counter() - start
+
+        rate = len(vectors) / elapsed
+        name = os.path.basename(args.model.rstrip("/"))[:22]
+        print(f"{name:<24}{threads:>8}{len(vectors):>10}{elapsed:>10.2f}{rate:>12.0f}{rate / threads:>12.0f}")
+        provider.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
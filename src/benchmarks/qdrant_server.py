@@ -0,0 +1,125 @@
+"""
+Search throughput of the embedded Qdrant store against a Qdrant server under
+concurrent load.
+
+Every mode searches the same synthetic collection with --concurrency searches
+in flight: "threads" shares one sync client between worker threads, as the
+sync endpoints do, "async" awaits search_many_async on the event loop, as the
+batch endpoint does. The embedded store serializes searches behind its lock
+and runs them in Python; the server rows show what REST and gRPC connections
+that are kept open add on top of the server's own search time. Without --url
+only the embedded rows run, in a temporary directory unless --path is given.
+Run from src/:
+    python -m benchmarks.qdrant_server --vectors 20000 --concurrency 1 8 32
+    python -m benchmarks.qdrant_server --url http://localhost:6333 --concurrency 1 8 32 64
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.vector_quantization import make_corpus
+from stores.VectorDB.VectorDBEnum import DistanceMethodEnums
+from stores.VectorDB.Providers.QdrantDB import QdrantDB
+
+COLLECTION = "benchmark_qdrant_server"
+
+
+def insert(db, vectors, batch_size: int = 1000):
+    db.create_collection(collection_name=COLLECTION, embedding_size=vectors.shape[1], do_reset=True)
+    for start in range(0, len(vectors), batch_size):
+        ids = range(start, min(start + batch_size, len(vectors)))
+        db.insert_many(
+            collection_name=COLLECTION,
+            text=[""] * len(ids),
+            vector=vectors[start:start + batch_size].tolist(),
+            metadata=[{"i": i} for i in ids],
+            record_id=list(ids)
+        )
+
+
+def run_threads(db, queries, k: int, concurrency: int):
+    def search(query):
+        start = time.perf_counter()
+        db.search_by_vector(collection_name=COLLECTION, vector=query, limit=k)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(search, queries))
+    return time.perf_counter() - start, latencies
+
+
+async def run_async(db, queries, k: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def search(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await db.search_many_async(collection_name=COLLECTION, vectors=[query], limit=k)
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(search(query) for query in queries))
+    return time.perf_counter() - start, latencies
+
+
+async def measure(name: str, db, queries, args):
+    for concurrency in args.concurrency:
+        for mode in ("threads", "async"):
+            if mode == "threads":
+                seconds, latencies = await asyncio.to_thread(run_threads, db, queries, args.k, concurrency)
+            else:
+                seconds, latencies = await run_async(db, queries, args.k, concurrency)
+            latencies = np.array(latencies) * 1000
+            print(f"{name:<12}{mode:<9}{concurrency:>12}{len(queries) / seconds:>10.1f}"
+                  f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}")
+
+
+async def run(args, targets, vectors, queries):
+    # a single event loop: the async client's connections belong to the loop that opened them
+    for name, options in targets:
+        db = QdrantDB(distance_method=DistanceMethodEnums.COSINE.value, timeout=300, **options)
+        db.connect()
+        try:
+            # one build per store; the gRPC row reuses the collection the REST row built
+            if name != "grpc":
+                insert(db, vectors)
+            await measure(name, db, queries, args)
+            if name != "rest":
+                db.delete_collection(collection_name=COLLECTION)
+        finally:
+            await db.disconnect_async()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="Qdrant server, e.g. http://localhost:6333")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--path", default=None, help="directory for the embedded store")
+    args = parser.parse_args()
+
+    vectors, queries = make_corpus(args.vectors, args.dim, args.queries)
+    queries = queries.tolist()
+    targets = [("embedded", dict(db_path=args.path or tempfile.mkdtemp(prefix="qdrant_server_")))]
+    if args.url:
+        targets += [
+            (protocol, dict(db_path=None, url=args.url, api_key=args.api_key, prefer_grpc=protocol == "grpc"))
+            for protocol in ("rest", "grpc")
+        ]
+
+    print(f"{args.vectors} vectors, dim {args.dim}, {args.queries} queries, k {args.k}")
+    print(f"{'store':<12}{'mode':<9}{'concurrency':>12}{'QPS':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    asyncio.run(run(args, targets, vectors, queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Memory, startup time and search latency of one collection per project against
+projects sharing a few collections partitioned by project_id.
+
+Each layout is built in its own process; a fresh process then opens the store
+(startup), searches random projects with the project filter the app uses
+(latency) and reports its resident memory. Local stores go to a temporary
+directory unless --path is given; --url builds the Qdrant layouts on a server
+instead, where HNSW and payload indexes are real and RSS is the server's.
+Local Qdrant evaluates filters in Python without payload indexes, so its
+shared-layout latency is only an upper bound.
+Run from src/:
+    python -m benchmarks.tenancy --projects 10000 --chunks 20
+    python -m benchmarks.tenancy --backend MMAP --projects 10000
+    python -m benchmarks.tenancy --url http://localhost:6333 --projects 10000
+"""
+import argparse
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from stores.VectorDB.VectorDBEnum import VectorDBEnum, DistanceMethodEnums, TenancyEnums
+
+LAYOUTS = [TenancyEnums.COLLECTION.value, TenancyEnums.SHARED.value]
+
+
+def get_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_nlp_controller(vectordb_client, layout: str, shared_collections: int):
+    from controllers.NLPController import NLPController
+    nlp_controller = NLPController(vectordb_client=vectordb_client, generation_client=None, embedding_client=None)
+    nlp_controller.app_settings = nlp_controller.app_settings.model_copy(update={
+        "VECTOR_DB_TENANCY": layout,
+        "VECTOR_DB_SHARED_COLLECTIONS": shared_collections,
+    })
+    return nlp_controller
+
+
+def open_store(args, path: str):
+    distance = DistanceMethodEnums.COSINE.value
+    if args.backend == VectorDBEnum.MMAP.value:
+        from stores.VectorDB.Providers.MmapVectorDB import MmapVectorDB
+        db = MmapVectorDB(db_path=path, distance_method=distance)
+        db.connect()
+        return db
+
+    from stores.VectorDB.Providers.QdrantDB import QdrantDB
+    db = QdrantDB(db_path=path, distance_method=distance, url=args.url, timeout=300)
+    db.connect()
+    return db
+
+
+def make_project(args, project: int):
+    rng = np.random.default_rng(project)
+    vectors = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(args, layout: str, path: str, results):
+    db = open_store(args, path)
+    nlp_controller = get_nlp_controller(db, layout, args.shared_collections)
+    start = time.perf_counter()
+    for project in range(args.projects):
+        project_id = f"p{project}"
+        collection_name, shared = nlp_controller.get_read_collection(project_id)
+        db.create_collection(collection_name=collection_name, embedding_size=args.dim, shared=shared)
+        db.insert_many(
+            collection_name=collection_name,
+            text=[""] * args.chunks,
+            vector=make_project(args, project),
+            metadata=[{"project_id": project_id, "chunk_id": chunk} for chunk in range(args.chunks)],
+            record_id=[project * args.chunks + chunk + 1 for chunk in range(args.chunks)]
+        )
+    results.put(time.perf_counter() - start)
+
+
+def search(args, layout: str, path: str, results):
+    base_rss = get_rss_mb()
+    start = time.perf_counter()
+    db = open_store(args, path)
+    nlp_controller = get_nlp_controller(db, layout, args.shared_collections)
+    # the first search of a store maps or loads it
+    collection_name, _ = nlp_controller.get_read_collection("p0")
+    db.search_by_vector(collection_name=collection_name, vector=make_project(args, 0)[0], limit=args.k)
+    startup = time.perf_counter() - start
+
+    rng = np.random.default_rng(11)
+    latencies = []
+    for project in rng.integers(0, args.projects, args.queries):
+        project_id = f"p{project}"
+        collection_name, shared = nlp_controller.get_read_collection(project_id)
+        query = make_project(args, int(project))[0]
+        start = time.perf_counter()
+        db.search_by_vector(
+            collection_name=collection_name,
+            vector=query,
+            limit=args.k,
+            metadata_filter=nlp_controller.get_project_filter(project_id, shared)
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+    results.put((startup, get_rss_mb() - base_rss, np.percentile(latencies, 50), np.percentile(latencies, 95)))
+
+
+def run(target, *args):
+    # a fresh interpreter per step, so memory and startup aren't shared between layouts
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=target, args=(*args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default=VectorDBEnum.QDRANT.value,
+                        choices=[VectorDBEnum.QDRANT.value, VectorDBEnum.MMAP.value])
+    parser.add_argument("--url", default=None, help="Qdrant server, e.g. http://localhost:6333")
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--chunks", type=int, default=20, help="chunks per project")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shared-collections", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--path", default=None, help="directory for the local stores")
+    args = parser.parse_args()
+
+    path = args.path or tempfile.mkdtemp(prefix="tenancy_")
+    print(f"{args.backend}: {args.projects} projects x {args.chunks} chunks, dim {args.dim}")
+    print(f"{'layout':<12}{'build s':>10}{'startup s':>11}{'RSS MB':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for layout in LAYOUTS:
+        layout_path = f"{path}/{layout}"
+        build_seconds = run(build, args, layout, layout_path)
+        startup, rss, p50, p95 = run(search, args, layout, layout_path)
+        print(f"{layout:<12}{build_seconds:>10.1f}{startup:>11.2f}{rss:>10.1f}{p50:>10.2f}{p95:>10.2f}")
+        if not args.path and not args.url:
+            shutil.rmtree(layout_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Peak memory of the upload path: buffered `await file.read()` vs DataController.stream_upload.
+
+Run from src/:
+    python -m benchmarks.upload_memory --sizes 8 32 128 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from starlette.datastructures import UploadFile
+
+from controllers import DataController
+
+
+def make_source_file(directory: str, size_mb: int) -> str:
+    path = os.path.join(directory, f"source_{size_mb}mb.txt")
+    line = b"the quick brown fox jumps over the lazy dog 0123456789\n"
+    block = line * (1048576 // len(line) + 1)
+    with open(path, "wb") as f:
+        remaining = size_mb * 1048576
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+    return path
+
+
+async def buffered_upload(source_path: str, target_dir: str):
+    with open(source_path, "rb") as src:
+        upload = UploadFile(file=src, filename="doc.txt")
+        content = await upload.read()
+        with open(os.path.join(target_dir, os.urandom(8).hex()), "wb") as f:
+            f.write(content)
+
+
+async def streamed_upload(source_path: str, target_dir: str):
+    data_controller = DataController()
+    with open(source_path, "rb") as src:
+        upload = UploadFile(file=src, filename="doc.txt")
+        uploaded, _ = await data_controller.stream_upload(upload, temp_dir=target_dir)
+        data_controller.commit_upload(uploaded, os.path.join(target_dir, uploaded.sha256))
+
+
+async def measure(fn, source_path: str, target_dir: str, concurrency: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[fn(source_path, target_dir) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    # Allow the largest benchmark file through the size check
+    os.environ["MAX_FILE_SIZE"] = str(max(args.sizes) + 1)
+
+    work_dir = tempfile.mkdtemp(prefix="upload_bench_")
+    try:
+        print(f"{'mode':<10}{'size_mb':>8}{'conc':>6}{'peak_mb':>10}{'seconds':>10}")
+        for size_mb in args.sizes:
+            source_path = make_source_file(work_dir, size_mb)
+            for concurrency in args.concurrency:
+                for name, fn in (("buffered", buffered_upload), ("streamed", streamed_upload)):
+                    target_dir = os.path.join(work_dir, f"{name}_{size_mb}_{concurrency}")
+                    os.makedirs(target_dir)
+                    peak, elapsed = await measure(fn, source_path, target_dir, concurrency)
+                    print(f"{name:<10}{size_mb:>8}{concurrency:>6}{peak / 1048576:>10.1f}{elapsed:>10.2f}")
+                    shutil.rmtree(target_dir)
+            os.remove(source_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Recall@k and search latency of int8 and binary quantized collections against float32.
+
+The corpus is synthetic: clustered, normalized vectors, queries are perturbed
+corpus points, the exact float32 top-k is the ground truth.
+
+Without --url the quantizers are simulated in NumPy (recall and RAM only):
+Qdrant's local mode searches full vectors and ignores quantization, so its
+latencies say nothing. With --url the same corpus goes into a Qdrant server,
+one collection per mode, and recall and latency are measured there.
+Run from src/:
+    python -m benchmarks.vector_quantization --vectors 100000 --dim 384
+    python -m benchmarks.vector_quantization --url http://localhost:6333 --oversampling 1 2 4
+    python -m benchmarks.vector_quantization --url http://localhost:6333 --grpc
+"""
+import argparse
+import time
+
+import numpy as np
+
+from stores.VectorDB.VectorDBEnum import DistanceMethodEnums, QuantizationEnums
+
+MODES = [mode.value for mode in QuantizationEnums]
+
+
+def make_corpus(count: int, dim: int, queries: int, clusters: int = 64, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    picks = rng.choice(count, queries, replace=False)
+    query_vectors = vectors[picks] + 0.3 * rng.normal(size=(queries, dim)).astype(np.float32) / np.sqrt(dim)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors.astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k):
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def ram_bytes_per_vector(mode: str, dim: int) -> int:
+    if mode == QuantizationEnums.INT8.value:
+        return dim
+    if mode == QuantizationEnums.BINARY.value:
+        return (dim + 7) // 8
+    return 4 * dim
+
+
+def simulate(mode, vectors, queries, k, oversampling):
+    """Candidates from quantized scores, then rescored with the float32 originals"""
+    if mode == QuantizationEnums.NONE.value:
+        return exact_top_k(vectors, queries, k)
+
+    if mode == QuantizationEnums.INT8.value:
+        # one value range for the whole collection, clipped at the 0.99 quantile like Qdrant's
+        low, high = np.quantile(vectors, [0.005, 0.995])
+        scale = (high - low) / 255
+        encode = lambda x: (np.clip(np.round((x - low) / scale), 0, 255) - 128).astype(np.float32)
+        approximate = encode(queries) @ encode(vectors).T
+    else:
+        approximate = np.where(queries > 0, 1.0, -1.0) @ np.where(vectors > 0, 1.0, -1.0).T
+
+    candidates = np.argsort(-approximate, axis=1)[:, :max(k, int(k * oversampling))]
+    found = []
+    for query, ids in zip(queries, candidates):
+        exact = vectors[ids] @ query
+        found.append(ids[np.argsort(-exact)[:k]])
+    return np.array(found)
+
+
+def run_simulation(args, vectors, queries, truth):
+    print(f"{'mode':<10}{'oversampling':>14}{'recall@k':>10}{'RAM MB':>10}")
+    for mode in MODES:
+        for oversampling in (args.oversampling if mode != QuantizationEnums.NONE.value else [1.0]):
+            found = simulate(mode, vectors, queries, args.k, oversampling)
+            ram = ram_bytes_per_vector(mode, args.dim) * len(vectors) / 1048576
+            print(f"{mode:<10}{oversampling:>14.1f}{recall(found, truth):>10.3f}{ram:>10.1f}")
+
+
+def run_qdrant(args, vectors, queries, truth):
+    from qdrant_client import models
+    from stores.VectorDB.Providers.QdrantDB import QdrantDB
+
+    print(f"{'mode':<10}{'oversampling':>14}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'RAM MB':>10}")
+    for mode in MODES:
+        db = QdrantDB(db_path=None, distance_method=DistanceMethodEnums.COSINE.value, quantization=mode,
+                      url=args.url, prefer_grpc=args.grpc, timeout=300)
+        db.connect()
+        name = f"benchmark_quantization_{mode}"
+        db.create_collection(collection_name=name, embedding_size=args.dim, do_reset=True)
+        db.client.upload_points(
+            collection_name=name,
+            points=[
+                models.PointStruct(id=i, vector=vector.tolist(), payload={"text": "", "metadata": None})
+                for i, vector in enumerate(vectors)
+            ],
+            batch_size=512,
+            parallel=4
+        )
+        # searches only use the quantized index once it is built
+        while db.client.get_collection(name).status != models.CollectionStatus.GREEN:
+            time.sleep(1)
+
+        try:
+            for oversampling in (args.oversampling if mode != QuantizationEnums.NONE.value else [1.0]):
+                db.search_params.quantization.oversampling = oversampling
+                latencies, found = [], []
+                for query in queries:
+                    start = time.perf_counter()
+                    results = db.client.search(
+                        collection_name=name,
+                        query_vector=query.tolist(),
+                        limit=args.k,
+                        search_params=db.search_params
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    found.append([point.id for point in results])
+                ram = ram_bytes_per_vector(mode, args.dim) * len(vectors) / 1048576
+                print(f"{mode:<10}{oversampling:>14.1f}{recall(found, truth):>10.3f}"
+                      f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}{ram:>10.1f}")
+        finally:
+            db.delete_collection(collection_name=name)
+            db.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--url", default=None, help="Qdrant server, e.g. http://localhost:6333")
+    parser.add_argument("--grpc", action="store_true", help="talk to the server over gRPC")
+    args = parser.parse_args()
+
+    vectors, queries = make_corpus(args.vectors, args.dim, args.queries)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    if args.url:
+        run_qdrant(args, vectors, queries, truth)
+    else:
+        run_simulation(args, vectors, queries, truth)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,10 @@ class BaseController:
     def __init__(self):
         self.app_settings = get_settings()
 
+        self.base_dir = os.path.dirname(os.path.dirname(__file__))
+        self.files_dir = os.path.join(self.base_dir, "assets/files")
+        self.database_dir = os.path.join(self.base_dir, "assets/database")
+
     def get_database_path(self,db_name:str):
         database_path=os.path.join(
         self.database_dir,db_name
@@ -0,0 +1,268 @@
+from .IngestionController import IngestionController
+from .DataController import DataController, UploadedFile
+import asyncio
+import tarfile
+import time
+import zipfile
+from helpers.pipeline import Pipeline, PipelineStage
+from models.AssetModel import AssetModel
+from models.enums.JobEnum import JobStageEnum
+from utils.files.chunck import CHUNK_UNIT_CHAR
+from utils.files.file_types import (
+    DOCX_CONTENT_TYPE,
+    GZIP_CONTENT_TYPE,
+    TAR_CONTENT_TYPE,
+    ZIP_CONTENT_TYPE,
+)
+
+# Failures kept in the job result, the count is always complete
+MAX_REPORTED_FAILURES = 100
+
+# Seconds between progress updates of a running bulk job
+PROGRESS_INTERVAL = 2.0
+
+
+class BulkIngestionController(IngestionController):
+    """
+    Ingests many files, or the members of zip/tar archives, in one job.
+
+    Members are streamed into the blob store one at a time and flow through
+    parse -> chunk -> Mongo insert -> embed -> vector upsert stages connected
+    by bounded queues, so parsing the next document overlaps with storing
+    and indexing the previous ones.
+    """
+
+    def __init__(self, db_client, process_pool=None, vectordb_client=None,
+                 embedding_client=None, queue_size: int = 8, file_index_block_size: int = 1):
+        super().__init__(
+            db_client=db_client,
+            process_pool=process_pool,
+            vectordb_client=vectordb_client,
+            embedding_client=embedding_client,
+            file_index_block_size=file_index_block_size
+        )
+        self.queue_size = queue_size
+        self.data_controller = DataController()
+
+    async def run_job(self, job, report=None):
+        """Job handler for bulk ingest jobs, see helpers.job_queue.JobQueue"""
+        params = job.params
+        try:
+            return await self.ingest_sources(
+                project_id=job.project_id,
+                sources=params["sources"],
+                chunk_size=params["chunk_size"],
+                chunk_overlap=params["chunk_overlap"],
+                chunk_unit=params.get("chunk_unit", CHUNK_UNIT_CHAR),
+                report=report
+            )
+        finally:
+            # staged uploads are only needed until their members are in the blob store
+            for source in params["sources"]:
+                self.data_controller.remove_temp_file(source["path"])
+
+    async def ingest_sources(self, project_id: str, sources: list, chunk_size: int, chunk_overlap: int,
+                             chunk_unit: str = CHUNK_UNIT_CHAR, report=None):
+        """
+        Run every file of the staged sources through the pipeline.
+        Returns (result, timings) with aggregate docs/s and chunks/s.
+        """
+        chunk_config = self.get_chunk_config(chunk_size, chunk_overlap, chunk_unit)
+        asset_model = AssetModel(db_client=self.db_client)
+        stats = {"seen": 0, "documents": 0, "reused": 0, "chunks": 0, "added": 0, "failed": 0}
+        failures = []
+
+        async def parse(doc: dict):
+            if "error" in doc:
+                raise ValueError(doc["error"])
+
+            asset = await asset_model.add_reference(
+                project_id=project_id,
+                file_id=doc["file_id"],
+                sha256=doc["sha256"],
+                asset_name=doc["filename"],
+                asset_size=doc["size"],
+                content_type=doc["content_type"]
+            )
+            # stored only once referenced, a concurrent release of the blob's last reference keeps it
+            doc["path"], _ = self.data_controller.store_blob(doc.pop("uploaded"))
+
+            doc["name"] = self.get_document_name(doc["file_id"], asset)
+            synced = await self.reuse_chunks(project_id, doc["file_id"], doc["name"], asset, chunk_config)
+            if synced is not None:
+                doc["chunk_count"], doc["chunks"], doc["removed"], doc["moved"] = synced
+                doc["is_reused"] = True
+                return doc
+
+            doc["chunks"], _ = await self.parse_file(
+                project_id, doc["file_id"], doc["name"], doc["path"], doc["content_type"],
+                chunk_size, chunk_overlap, chunk_unit
+            )
+            doc["asset"] = asset
+            return doc
+
+        async def store(doc: dict):
+            # only chunks whose content hash is new move on to be embedded
+            if not doc.get("is_reused"):
+                doc["chunk_count"], doc["chunks"], doc["removed"], doc["moved"] = await self.store_chunks(
+                    project_id, doc["file_id"], doc["name"], doc["chunks"], doc.pop("asset"), chunk_config
+                )
+            doc["chunks"] = await self.get_chunks_to_index(project_id, doc["file_id"], doc["chunks"])
+            return doc
+
+        async def embed(doc: dict):
+            doc["vectors"] = []
+            if doc["chunks"]:
+                doc["chunks"], doc["vectors"] = await self.embed_chunks(doc["chunks"])
+            return doc
+
+        async def upsert(doc: dict):
+            if doc["chunks"] or doc["removed"] or doc["moved"]:
+                await self.upsert_chunks(
+                    project_id, doc["name"], doc["chunks"], doc.pop("vectors"), doc["removed"], doc["moved"]
+                )
+            return doc
+
+        def on_done(doc: dict):
+            stats["documents"] += 1
+            stats["reused"] += int(bool(doc.get("is_reused")))
+            stats["chunks"] += doc["chunk_count"]
+            stats["added"] += len(doc["chunks"])
+
+        def on_error(stage: str, doc: dict, error: Exception):
+            stats["failed"] += 1
+            if "uploaded" in doc:
+                self.data_controller.remove_temp_file(doc["uploaded"].temp_path)
+            if len(failures) < MAX_REPORTED_FAILURES:
+                failures.append({"filename": doc.get("filename"), "stage": stage, "error": str(error)})
+
+        parse_workers = self.process_pool.max_workers if self.process_pool is not None else 1
+        stages = [
+            PipelineStage(JobStageEnum.PARSE.value, parse, workers=parse_workers),
+            PipelineStage(JobStageEnum.STORE.value, store, workers=2),
+        ]
+        if self.can_index:
+            stages += [
+                PipelineStage(JobStageEnum.EMBED.value, embed),
+                PipelineStage(JobStageEnum.UPSERT.value, upsert),
+            ]
+
+        pipeline = Pipeline(stages, queue_size=self.queue_size, on_error=on_error, on_done=on_done)
+
+        async def iter_docs():
+            # archives are read on a thread, one member per step
+            docs = self.iter_source_files(sources)
+            while True:
+                doc = await asyncio.to_thread(next, docs, None)
+                if doc is None:
+                    return
+                stats["seen"] += 1
+                yield doc
+
+        async def report_progress():
+            while True:
+                await asyncio.sleep(PROGRESS_INTERVAL)
+                finished = stats["documents"] + stats["failed"]
+                await report(JobStageEnum.PIPELINE.value, finished / max(1, stats["seen"]), pipeline.timer.as_dict())
+
+        started = time.perf_counter()
+        progress_task = asyncio.create_task(report_progress()) if report is not None else None
+        try:
+            timings = await pipeline.run(iter_docs())
+        finally:
+            if progress_task is not None:
+                progress_task.cancel()
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "documents": stats["documents"],
+            "reused_documents": stats["reused"],
+            "failed_documents": stats["failed"],
+            "chunks_created": stats["chunks"],
+            "chunks_added": stats["added"],
+            "elapsed_seconds": round(elapsed, 4),
+            "docs_per_second": round(stats["documents"] / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_second": round(stats["chunks"] / elapsed, 2) if elapsed else 0.0,
+            "failures": failures,
+        }
+        return result, timings
+
+    def iter_source_files(self, sources: list):
+        """
+        Blocking generator over every file of the staged sources, archives expanded.
+        Each file is yielded as a temp file, moved into the blob store once referenced.
+        """
+        for source in sources:
+            archive_type = self.get_archive_type(source["path"], source["content_type"])
+            if archive_type is None:
+                yield self.store_source(source)
+                continue
+
+            try:
+                if archive_type == ZIP_CONTENT_TYPE:
+                    yield from self.iter_zip_members(source["path"])
+                else:
+                    yield from self.iter_tar_members(source["path"])
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+                yield {"filename": source["filename"], "error": f"Could not read archive: {e}"}
+
+    def get_archive_type(self, file_path: str, content_type: str):
+        if content_type in (ZIP_CONTENT_TYPE, DOCX_CONTENT_TYPE):
+            # a docx is a zip too, tell them apart by the word document inside
+            try:
+                with zipfile.ZipFile(file_path) as archive:
+                    if "word/document.xml" in archive.namelist():
+                        return None
+            except zipfile.BadZipFile:
+                return None
+            return ZIP_CONTENT_TYPE
+
+        if content_type in (TAR_CONTENT_TYPE, GZIP_CONTENT_TYPE):
+            return TAR_CONTENT_TYPE
+
+        return None
+
+    def iter_zip_members(self, file_path: str):
+        with zipfile.ZipFile(file_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or self.is_hidden_member(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    yield self.store_member(member, info.filename)
+
+    def iter_tar_members(self, file_path: str):
+        # stream mode reads the archive front to back without seeking
+        with tarfile.open(file_path, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile() or self.is_hidden_member(info.name):
+                    continue
+                member = archive.extractfile(info)
+                yield self.store_member(member, info.name)
+
+    def is_hidden_member(self, name: str) -> bool:
+        return any(part.startswith(".") or part == "__MACOSX" for part in name.split("/"))
+
+    def store_member(self, member, filename: str) -> dict:
+        uploaded, signal = self.data_controller.stream_file(member, temp_dir=self.data_controller.temp_dir)
+        if uploaded is None:
+            return {"filename": filename, "error": signal.value}
+        return self.store_uploaded(uploaded, filename)
+
+    def store_source(self, source: dict) -> dict:
+        uploaded = UploadedFile(
+            temp_path=source["path"],
+            size=source["size"],
+            sha256=source["sha256"],
+            content_type=source["content_type"]
+        )
+        return self.store_uploaded(uploaded, source["filename"])
+
+    def store_uploaded(self, uploaded: UploadedFile, filename: str) -> dict:
+        return {
+            "filename": filename,
+            "file_id": self.data_controller.get_file_id(uploaded, filename),
+            "sha256": uploaded.sha256,
+            "size": uploaded.size,
+            "content_type": uploaded.content_type,
+            "uploaded": uploaded,
+        }
@@ -2,26 +2,214 @@ from fastapi import UploadFile
 from controllers.BaseController import BaseController
 from helpers.config import get_settings
 from enums.ResponseEnum import ResponseEnum
+from utils.files.file_types import sniff_content_type
+from dataclasses import dataclass
+import hashlib
 import logging
+import os
+import uuid
+
+
+@dataclass
+class UploadedFile:
+    temp_path: str
+    size: int
+    sha256: str
+    content_type: str
+
+
+class UploadWriter:
+    """
+    Writes a stream to a temp file block by block. The first block is sniffed
+    for the real content type; size and type limits stop the copy early.
+    """
+
+    def __init__(self, temp_path: str, max_size: int, allowed_types: list, sniff):
+        self.temp_path = temp_path
+        self.max_size = max_size
+        self.allowed_types = allowed_types
+        self.sniff = sniff
+
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.content_type = None
+        self.signal = ResponseEnum.SUCCESS
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.temp_path, "wb")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def write(self, block: bytes):
+        if self.content_type is None:
+            self.content_type = self.sniff(block)
+            if self.content_type not in self.allowed_types:
+                self.signal = ResponseEnum.FILE_TYPE_NOT_SUPPORTED
+                return
+
+        self.size += len(block)
+        if self.size > self.max_size:
+            self.signal = ResponseEnum.FILE_SIZE_EXCEEDED
+            return
+
+        self.hasher.update(block)
+        self.file.write(block)
+
+    def finish(self):
+        if self.size == 0:
+            self.signal = ResponseEnum.FILE_EMPTY
+            return
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+
 class DataController(BaseController):
     def __init__(self):
         super().__init__()
         self.size_scale = 1048576
         self.settings = get_settings()  # Add this line
-    
+        self.logger = logging.getLogger(__name__)
+
+        self.upload_dir = "uploads"
+        self.temp_dir = os.path.join(self.upload_dir, "tmp")
+        self.blob_dir = os.path.join(self.upload_dir, "blobs")
+
     async def validate_upload(self, file: UploadFile):
         if file.content_type not in self.settings.FILE_ALLOWED_TYPES:
-            return False, ResponseEnum.ERROR
+            return False, ResponseEnum.FILE_TYPE_NOT_SUPPORTED
 
-        # Read file to check size
-        content = await file.read()
-        file_size = len(content)
+        # The declared size (when the client sent one) lets us reject early,
+        # the real size is enforced while streaming in stream_upload
+        if file.size is not None and file.size > self.settings.MAX_FILE_SIZE * self.size_scale:
+            return False, ResponseEnum.FILE_SIZE_EXCEEDED
 
-        # Reset file pointer for later use
-        await file.seek(0)
+        return True, ResponseEnum.SUCCESS
 
-        if file_size > self.settings.MAX_FILE_SIZE * self.size_scale:
-            return False, ResponseEnum.ERROR
+    def sniff_content_type(self, block: bytes) -> str:
+        """Detect the content type from the first bytes of a file"""
+        return sniff_content_type(block, self.settings.FILE_TEXT_FALLBACK_ENCODINGS)
 
-        return True, ResponseEnum.SUCCESS
-        
\ No newline at end of file
+    def open_upload_writer(self, temp_dir: str, max_size: int = None, allowed_types: list = None):
+        os.makedirs(temp_dir, exist_ok=True)
+        return UploadWriter(
+            temp_path=os.path.join(temp_dir, f".{uuid.uuid4().hex}.part"),
+            max_size=max_size if max_size is not None else self.settings.MAX_FILE_SIZE * self.size_scale,
+            allowed_types=allowed_types if allowed_types is not None else self.settings.FILE_ALLOWED_TYPES,
+            sniff=self.sniff_content_type
+        )
+
+    async def stream_upload(self, file: UploadFile, temp_dir: str,
+                            max_size: int = None, allowed_types: list = None):
+        """
+        Copy an upload to a temp file block by block, hashing and counting bytes
+        as they arrive. Returns (UploadedFile, signal); the file is None on failure.
+        """
+        writer = self.open_upload_writer(temp_dir, max_size=max_size, allowed_types=allowed_types)
+        try:
+            with writer:
+                while writer.signal == ResponseEnum.SUCCESS:
+                    block = await file.read(self.settings.FILE_DEFAULT_CHUNK_SIZE)
+                    if not block:
+                        writer.finish()
+                        break
+                    writer.write(block)
+        except Exception as e:
+            self.logger.error(f"Error while streaming upload {file.filename}: {e}")
+            writer.signal = ResponseEnum.FILE_UPLOAD_FAILED
+
+        return self.close_upload_writer(writer)
+
+    def stream_file(self, fileobj, temp_dir: str, max_size: int = None, allowed_types: list = None):
+        """Blocking counterpart of stream_upload for file objects, e.g. archive members"""
+        writer = self.open_upload_writer(temp_dir, max_size=max_size, allowed_types=allowed_types)
+        try:
+            with writer:
+                while writer.signal == ResponseEnum.SUCCESS:
+                    block = fileobj.read(self.settings.FILE_DEFAULT_CHUNK_SIZE)
+                    if not block:
+                        writer.finish()
+                        break
+                    writer.write(block)
+        except Exception as e:
+            self.logger.error(f"Error while streaming file: {e}")
+            writer.signal = ResponseEnum.FILE_UPLOAD_FAILED
+
+        return self.close_upload_writer(writer)
+
+    def close_upload_writer(self, writer: "UploadWriter"):
+        if writer.signal != ResponseEnum.SUCCESS:
+            self.remove_temp_file(writer.temp_path)
+            return None, writer.signal
+
+        return UploadedFile(
+            temp_path=writer.temp_path,
+            size=writer.size,
+            sha256=writer.hasher.hexdigest(),
+            content_type=writer.content_type
+        ), writer.signal
+
+    def commit_upload(self, uploaded: UploadedFile, file_path: str):
+        """Atomically move a streamed upload to its final location"""
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        os.replace(uploaded.temp_path, file_path)
+        return file_path
+
+    def get_file_id(self, uploaded: UploadedFile, filename: str) -> str:
+        """Content-addressed id: the sha256 plus the original extension"""
+        return f"{uploaded.sha256}{os.path.splitext(filename or '')[1].lower()}"
+
+    def get_blob_path(self, sha256: str) -> str:
+        """Sharded location of a blob: blobs/ab/cd/<sha256>"""
+        return os.path.join(self.blob_dir, sha256[:2], sha256[2:4], sha256)
+
+    def resolve_file_path(self, file_id: str) -> str:
+        """Blob path for content-addressed ids, flat uploads path for legacy names"""
+        sha256 = os.path.splitext(file_id)[0]
+        blob_path = self.get_blob_path(sha256)
+        if len(sha256) == 64 and os.path.exists(blob_path):
+            return blob_path
+        return os.path.join(self.upload_dir, file_id)
+
+    def store_blob(self, uploaded: UploadedFile):
+        """
+        Move a streamed upload into the content-addressed store.
+        Returns (blob_path, is_duplicate); duplicates keep the existing blob.
+        Call it once the upload's asset reference is recorded, see detach_blob.
+        """
+        blob_path = self.get_blob_path(uploaded.sha256)
+        if os.path.exists(blob_path):
+            self.remove_temp_file(uploaded.temp_path)
+            return blob_path, True
+
+        self.commit_upload(uploaded, blob_path)
+        return blob_path, False
+
+    def detach_blob(self, sha256: str):
+        """
+        First step of removing a blob: move it out of the store and return where
+        it went, or None if it is gone. The caller then counts the blob's
+        references and removes or restores it. An upload whose reference was
+        recorded before that count is seen by it; one recorded after finds no
+        blob and stores its own copy.
+        """
+        blob_path = self.get_blob_path(sha256)
+        detached_path = f"{blob_path}.{uuid.uuid4().hex}.removing"
+        try:
+            os.rename(blob_path, detached_path)
+        except FileNotFoundError:
+            return None
+        return detached_path
+
+    def restore_blob(self, sha256: str, detached_path: str):
+        # a copy stored meanwhile has the same content, replacing it is harmless
+        os.replace(detached_path, self.get_blob_path(sha256))
+
+    def remove_temp_file(self, temp_path: str):
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,298 @@
+from .BaseController import BaseController
+from .DataController import DataController
+from .NLPController import NLPController
+from .ProcessController import ProcessController
+import asyncio
+import logging
+import os
+from helpers.timing import StageTimer
+from models.AssetModel import AssetModel
+from models.ChunkModel import ChunkModel
+from models.ProjectModel import ProjectModel
+from models.db_schemes import Project
+from models.db_schemes.chunk import Chunk
+from models.enums.JobEnum import JobStageEnum
+from utils.files.chunck import CHUNK_UNIT_CHAR, get_content_hash, number_duplicate_hashes
+
+# Job progress when each stage starts
+STAGE_PROGRESS = {
+    JobStageEnum.PARSE: 0.0,
+    JobStageEnum.STORE: 0.5,
+    JobStageEnum.EMBED: 0.6,
+    JobStageEnum.UPSERT: 0.9,
+}
+
+
+class IngestionController(BaseController):
+    """Runs the ingestion pipeline of one file: parse -> chunk -> store -> embed -> upsert"""
+
+    def __init__(self, db_client, process_pool=None, vectordb_client=None, embedding_client=None,
+                 file_index_block_size: int = 1):
+        super().__init__()
+
+        self.db_client = db_client
+        self.chunk_model = ChunkModel(db_client=db_client, file_index_block_size=file_index_block_size)
+        self.process_pool = process_pool
+        self.vectordb_client = vectordb_client
+        self.embedding_client = embedding_client
+
+    async def run_job(self, job, report=None):
+        """Job handler for ingest jobs, see helpers.job_queue.JobQueue"""
+        params = job.params
+        file_path = DataController().resolve_file_path(params["file_id"])
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {params['file_id']}")
+
+        return await self.ingest_file(
+            project_id=job.project_id,
+            file_id=params["file_id"],
+            file_path=file_path,
+            chunk_size=params["chunk_size"],
+            chunk_overlap=params["chunk_overlap"],
+            chunk_unit=params.get("chunk_unit", CHUNK_UNIT_CHAR),
+            report=report
+        )
+
+    @property
+    def can_index(self) -> bool:
+        return self.vectordb_client is not None and self.embedding_client is not None
+
+    async def ingest_file(self, project_id: str, file_id: str, file_path: str,
+                          chunk_size: int, chunk_overlap: int, chunk_unit: str = CHUNK_UNIT_CHAR,
+                          report=None):
+        """
+        Chunk a stored file into the project, reusing an identical chunk set when one exists,
+        then embed and index the chunks when vector clients are configured.
+        A new version of a file only stores and embeds the chunks that changed.
+        Returns (result, timings).
+        """
+        timer = StageTimer()
+
+        async def enter_stage(stage: JobStageEnum):
+            if report is not None:
+                await report(stage.value, STAGE_PROGRESS[stage], timer.as_dict())
+
+        chunk_config = self.get_chunk_config(chunk_size, chunk_overlap, chunk_unit)
+        asset = await AssetModel(db_client=self.db_client).get_asset(project_id, file_id)
+        filename = self.get_document_name(file_id, asset)
+
+        # linking an existing chunk set counts as storing
+        with timer.stage("store"):
+            synced = await self.reuse_chunks(project_id, file_id, filename, asset, chunk_config)
+        is_reused = synced is not None
+
+        if not is_reused:
+            # Parse and chunk in the process pool so the event loop stays free
+            await enter_stage(JobStageEnum.PARSE)
+            content_type = asset.content_type if asset is not None else None
+            chunk_dicts, timings = await self.parse_file(
+                project_id, file_id, filename, file_path, content_type, chunk_size, chunk_overlap, chunk_unit
+            )
+            timer.merge(timings)
+
+            await enter_stage(JobStageEnum.STORE)
+            with timer.stage("store"):
+                synced = await self.store_chunks(project_id, file_id, filename, chunk_dicts, asset, chunk_config)
+
+        chunk_count, inserted, removed, moved = synced
+        to_index = await self.get_chunks_to_index(project_id, file_id, inserted)
+        indexed = await self.index_chunks(project_id, filename, to_index, removed, moved, timer, enter_stage)
+
+        return {
+            "chunks_created": chunk_count,
+            "chunks_added": len(inserted),
+            "chunks_removed": len(removed),
+            "chunks_indexed": indexed,
+            "chunks_unindexed": len(to_index) - indexed,
+            "is_reused": is_reused
+        }, timer.as_dict()
+
+    def get_chunk_config(self, chunk_size: int, chunk_overlap: int, chunk_unit: str = CHUNK_UNIT_CHAR):
+        return {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunk_unit": chunk_unit}
+
+    def get_document_name(self, file_id: str, asset) -> str:
+        """Chunks are grouped by the uploaded name, so a new upload of a file is a new version"""
+        return asset.asset_name if asset is not None else file_id
+
+    async def reuse_chunks(self, project_id: str, file_id: str, filename: str, asset, chunk_config: dict):
+        """
+        Reuse an identical chunk set instead of parsing the file again.
+        Returns (chunk_count, inserted chunk dicts, removed content hashes, moved chunk dicts),
+        or None when the file must be parsed.
+        """
+        if asset is None:
+            return None
+
+        asset_model = AssetModel(db_client=self.db_client)
+        chunk_model = self.chunk_model
+
+        # Same content already chunked into this project with the same config
+        if asset.chunk_config == chunk_config:
+            existing_count = await chunk_model.count_file_chunks(project_id, file_id)
+            if existing_count:
+                return existing_count, [], [], []
+
+        # Same content already chunked by another project: link its chunk set and vectors
+        source = await asset_model.find_chunked_asset(asset.sha256, chunk_config, exclude_project_id=project_id)
+        if source is None:
+            return None
+
+        chunk_dicts = await chunk_model.get_linked_chunks(
+            source_project_id=source.project_id,
+            source_file_id=source.file_id,
+            project_id=project_id,
+            file_id=file_id,
+            filename=filename
+        )
+        if not chunk_dicts:
+            return None
+
+        # chunk sets stored before content hashing get their hashes now
+        if any(not chunk.get("content_hash") for chunk in chunk_dicts):
+            for chunk in chunk_dicts:
+                chunk["content_hash"] = get_content_hash(chunk["content"])
+            number_duplicate_hashes(chunk_dicts)
+
+        synced = await self.store_chunks(project_id, file_id, filename, chunk_dicts, asset, chunk_config)
+        await self.link_vectors(project_id, file_id, filename, source)
+        return synced
+
+    async def link_vectors(self, project_id: str, file_id: str, filename: str, source) -> int:
+        """
+        Upsert the vectors the source project stored for a linked chunk set under this
+        project's point ids, and mark those chunks indexed. Chunks whose source has no
+        vector stay unindexed and are embedded like new ones. Returns the chunks linked.
+        """
+        if not self.can_index:
+            return 0
+
+        to_link = await self.chunk_model.get_unindexed_chunks(project_id, file_id)
+        content_hashes = [chunk["content_hash"] for chunk in to_link if chunk.get("content_hash")]
+        if not content_hashes:
+            return 0
+
+        vectors = await asyncio.to_thread(
+            self.get_nlp_controller().get_chunk_vectors,
+            source.project_id, self.get_document_name(source.file_id, source), content_hashes
+        )
+        chunks = [Chunk(**chunk) for chunk in to_link if chunk.get("content_hash") in vectors]
+        if chunks:
+            await self.upsert_chunks(project_id, filename, chunks, [vectors[chunk.content_hash] for chunk in chunks])
+        return len(chunks)
+
+    async def parse_file(self, project_id: str, file_id: str, filename: str, file_path: str, content_type: str,
+                         chunk_size: int, chunk_overlap: int, chunk_unit: str = CHUNK_UNIT_CHAR):
+        """Extract and chunk a file in the process pool, returns (chunk_dicts, timings)"""
+        process_controller = ProcessController(project_id=project_id, process_pool=self.process_pool)
+        metadata = {
+            "project_id": project_id,
+            "filename": filename
+        }
+        if content_type is None:
+            content_type = process_controller.get_file_content_type(file_path)
+
+        try:
+            chunk_dicts, timings = await process_controller.process_file(
+                file_path=file_path,
+                content_type=content_type,
+                metadata=metadata,
+                chunk_size=chunk_size,
+                overlap_size=chunk_overlap,
+                length_unit=chunk_unit
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"File processing timed out: {file_id}")
+
+        if not chunk_dicts:
+            raise ValueError("File is empty or contains no readable text")
+
+        for chunk in chunk_dicts:
+            chunk["file_id"] = file_id
+
+        return chunk_dicts, timings
+
+    async def store_chunks(self, project_id: str, file_id: str, filename: str,
+                           chunk_dicts: list, asset, chunk_config: dict):
+        """
+        Diff the chunk set against the stored version of the file by content hash.
+        Returns (chunk_count, inserted chunk dicts, removed content hashes, moved chunk dicts).
+        """
+        # chunks come from our own chunker, the cheap validation is enough
+        inserted, removed, moved = await self.chunk_model.sync_file_chunks(
+            chunk_dicts, project_id, filename, fast_validation=True
+        )
+
+        if asset is not None:
+            await AssetModel(db_client=self.db_client).set_chunk_config(project_id, file_id, chunk_config)
+
+        return len(chunk_dicts), inserted, removed, moved
+
+    async def get_chunks_to_index(self, project_id: str, file_id: str, inserted: list) -> list:
+        """
+        The inserted chunks, plus the ones of the file an earlier run stored without
+        indexing: their embedding failed or no vector clients were configured then.
+        """
+        if not self.can_index:
+            return inserted
+        return await self.chunk_model.get_unindexed_chunks(project_id, file_id)
+
+    async def index_chunks(self, project_id: str, filename: str, inserted: list, removed: list, moved: list,
+                           timer: StageTimer, enter_stage) -> int:
+        """
+        Embed and upsert new chunks, drop the vectors of removed ones and rewrite the
+        payload of moved ones; returns the chunks indexed
+        """
+        if not self.can_index or not (inserted or removed or moved):
+            return 0
+
+        vectors = []
+        if inserted:
+            await enter_stage(JobStageEnum.EMBED)
+            with timer.stage("embed"):
+                inserted, vectors = await self.embed_chunks(inserted)
+
+        await enter_stage(JobStageEnum.UPSERT)
+        with timer.stage("upsert"):
+            await self.upsert_chunks(project_id, filename, inserted, vectors, removed, moved)
+        return len(inserted)
+
+    def get_nlp_controller(self):
+        return NLPController(
+            vectordb_client=self.vectordb_client,
+            generation_client=None,
+            embedding_client=self.embedding_client
+        )
+
+    async def embed_chunks(self, chunk_dicts: list):
+        """Returns (chunks, vectors)"""
+        chunks = [Chunk(**chunk) for chunk in chunk_dicts]
+        vectors = await self.get_nlp_controller().embed_chunks_async(chunks)
+
+        # a chunk whose batch kept failing is stored unindexed, the next run of the file retries it
+        failed = [chunk for chunk, vector in zip(chunks, vectors) if vector is None]
+        if failed:
+            logging.getLogger(__name__).warning(
+                f"{len(failed)} of {len(chunks)} chunks of {failed[0].filename} could not be embedded"
+            )
+            pairs = [(chunk, vector) for chunk, vector in zip(chunks, vectors) if vector is not None]
+            chunks = [chunk for chunk, _ in pairs]
+            vectors = [vector for _, vector in pairs]
+        return chunks, vectors
+
+    async def upsert_chunks(self, project_id: str, filename: str, chunks: list, vectors: list, removed: list = None,
+                            moved: list = None):
+        project = await ProjectModel(db_client=self.db_client).get_project_or_create_one(project_id)
+        if not isinstance(project, Project):
+            project = Project(**project)
+
+        nlp_controller = self.get_nlp_controller()
+        if removed:
+            await asyncio.to_thread(nlp_controller.delete_chunk_vectors, project, filename, removed)
+        if moved:
+            # kept chunks of a new version: their vectors stay, file_id, chunk_id and metadata follow the new version
+            await asyncio.to_thread(
+                nlp_controller.update_chunk_vectors, project, filename, [Chunk(**chunk) for chunk in moved]
+            )
+        if chunks:
+            await asyncio.to_thread(nlp_controller.index_into_vector_db, project, chunks, False, vectors)
+            await self.chunk_model.mark_indexed(project_id, filename, [chunk.content_hash for chunk in chunks])
@@ -1,66 +1,242 @@
-from multiprocessing import Value
-from pymongo.typings import _DocumentType
-from qdrant_client.grpc import Document, RetrievedPoint
-
 from stores.llm.templetes.locales.ar.rag import document_prompt, footer_prompt, system_prompt
 from .BaseController import BaseController
-from models.db_schemes import Project,chunk
+from models.db_schemes import Project, RetrievedDocument
+from models.db_schemes.chunk import Chunk
+from helpers.timing import StageTimer
 from stores.llm.LLMEnum import  OpenAIEnum,CohereEnum,DocumentEnum
+from stores.VectorDB.VectorDBEnum import TenancyEnums
 
 from typing import List
+import asyncio
+import heapq
+import uuid
+import zlib
+
+# Namespace of the UUIDv5 point ids derived from chunks
+POINT_ID_NAMESPACE=uuid.UUID("6f1c1d2e-8a53-5b8e-9c4f-2f0d6a7e9b31")
 
 class NLPController(BaseController):
-    def __init__(self,vectordb_client,generation_client,ebedding_client):
+    def __init__(self,vectordb_client,generation_client,embedding_client,chunk_model=None):
         super().__init__()
 
         self.vectordb_client=vectordb_client
         self.generation_client=generation_client
-        self.ebedding_client=ebedding_client
+        self.embedding_client=embedding_client
+        # lexical search over the stored chunks, hybrid searches need it
+        self.chunk_model=chunk_model
 
     def create_collection_name(self,project_id:str):
         return f"collection_{project_id}"
 
+    def create_shared_collection_name(self,project_id:str):
+        # a stable hash, so a project always lands in the same shared collection
+        shard=zlib.crc32(project_id.encode("utf-8"))%self.app_settings.VECTOR_DB_SHARED_COLLECTIONS
+        return f"shared_collection_{shard}"
+
+    def get_read_collection(self,project_id:str):
+        """(collection name, shared) searches of the project use"""
+        if self.app_settings.VECTOR_DB_TENANCY==TenancyEnums.SHARED.value:
+            return self.create_shared_collection_name(project_id),True
+        return self.create_collection_name(project_id),False
+
+    def get_write_collections(self,project_id:str):
+        """(collection name, shared) pairs writes of the project go to, both layouts while migrating"""
+        tenancy=self.app_settings.VECTOR_DB_TENANCY
+        collections=[]
+        if tenancy!=TenancyEnums.SHARED.value:
+            collections.append((self.create_collection_name(project_id),False))
+        if tenancy!=TenancyEnums.COLLECTION.value:
+            collections.append((self.create_shared_collection_name(project_id),True))
+        return collections
+
+    def get_project_filter(self,project_id:str,shared:bool,metadata_filter:dict=None):
+        # a shared collection holds other projects too, every query and delete is scoped to this one
+        if not shared:
+            return metadata_filter
+        return {**(metadata_filter or {}),"project_id":project_id}
+
+    def create_point_id(self,project_id:str,file_id:str,content_hash:str):
+        # the same chunk of the same file always maps to the same point, retries overwrite it
+        return str(uuid.uuid5(POINT_ID_NAMESPACE,f"{project_id}:{file_id}:{content_hash}"))
+
+    def get_point_metadata(self,project_id:str,chunk:Chunk):
+        # filename and content hash let vectors of removed chunks be deleted later,
+        # project, file and chunk ids are indexed payload keys searches filter on
+        return {
+            **(chunk.metadata or {}),
+            "project_id":project_id,
+            "filename":chunk.filename,
+            "file_id":chunk.file_id,
+            "file_index":chunk.file_index,
+            "chunk_id":chunk.chunk_id,
+            "content_hash":chunk.content_hash
+        }
+
     def reset_vector_db_collection(self,project:Project):
-        collection_name=self.create_collection_name(project_id=project.project_id)
-        return self.vectordb_client.delete_collection(collection_name=collection_name)
+        result=None
+        for collection_name,shared in self.get_write_collections(project.project_id):
+            if shared:
+                if self.vectordb_client.is_collection_existed(collection_name):
+                    result=self.vectordb_client.delete_by_metadata(
+                        collection_name=collection_name,
+                        metadata_filter=self.get_project_filter(project.project_id,shared)
+                    )
+            else:
+                result=self.vectordb_client.delete_collection(collection_name=collection_name)
+        return result
 
     def get_vector_db_collection_info(self,project:Project):
-        collection_name=self.create_collection_name(project_id=project.project_id)
+        collection_name,_=self.get_read_collection(project.project_id)
         collection_info= self.vectordb_client.get_collection_info(collection_name=collection_name)
 
         return collection_info
 
-    def index_into_vector_db(self,project:Project,chunks:List[chunk],do_reset:bool=False):
-        # step 1 : get collection name
-        collection_name=self.create_collection_name(project_id=project.project_id)
-        # step 2 :manage item
-        texts=[c.chunk_text for c in chunks]
-        metadata=[c.chunk_metadata for c in chunks]
-        vectors=[
-            self.ebedding_client.embed_text(text=text,document_type=DocumentTypeEnum.DOCUMENT.VALUE)
-            for text in texts
-        ]
-
-        # step 3 :create collection if not exists
-        _=self.vectordb_client.create_collection(
-            collection_name=collection_name,
-            embedding_size=self.embedding_client.embedding_size,
-            do_reset=do_reset
+    def embed_chunks(self,chunks:List[Chunk]):
+        # one batched call, None marks chunks whose embedding failed
+        vectors=self.embedding_client.embed_texts(
+            texts=[c.content for c in chunks],
+            document_type=DocumentEnum.DOCUMENT.value
         )
-        # step 4 :insert into vector db
-        _=self.vectordb_client.insert_many(
-            collection_name=collection_name,
-            texts=texts,
-            metadata=metadata,
-            vectors=vectors
+        return vectors if vectors is not None else [None]*len(chunks)
+
+    async def embed_chunks_async(self,chunks:List[Chunk]):
+        vectors=await self.embedding_client.embed_texts_async(
+            texts=[c.content for c in chunks],
+            document_type=DocumentEnum.DOCUMENT.value
         )
+        return vectors if vectors is not None else [None]*len(chunks)
+
+    def index_into_vector_db(self,project:Project,chunks:List[Chunk],do_reset:bool=False,vectors:list=None):
+        # step 1 :manage item
+        texts=[c.content for c in chunks]
+        metadata=[self.get_point_metadata(project.project_id,c) for c in chunks]
+        record_ids=[
+            self.create_point_id(project.project_id,c.file_id or c.filename,c.content_hash or str(c.chunk_id))
+            for c in chunks
+        ]
+        if vectors is None:
+            vectors=self.embed_chunks(chunks)
+        # chunks that could not be embedded are left out of the collection
+        embedded=[i for i,vector in enumerate(vectors) if vector is not None]
+        if len(embedded)<len(chunks):
+            texts=[texts[i] for i in embedded]
+            metadata=[metadata[i] for i in embedded]
+            record_ids=[record_ids[i] for i in embedded]
+            vectors=[vectors[i] for i in embedded]
+        if not vectors:
+            return False
+
+        if do_reset:
+            self.reset_vector_db_collection(project)
+
+        for collection_name,shared in self.get_write_collections(project.project_id):
+            # step 2 :create collection if not exists
+            _=self.vectordb_client.create_collection(
+                collection_name=collection_name,
+                embedding_size=self.embedding_client.embedding_size,
+                shared=shared
+            )
+            # step 3 :insert into vector db
+            inserted=self.vectordb_client.insert_many(
+                collection_name=collection_name,
+                text=texts,
+                metadata=metadata,
+                vector=vectors,
+                record_id=record_ids
+            )
+            # the chunks stay unindexed and the caller's job fails, a re-run indexes them
+            if not inserted:
+                raise RuntimeError(f"Could not insert {len(vectors)} vectors into {collection_name}")
         return True
 
-    def search_vector_db_collection(self,project:Project,text:str,limit:int=10):
+    def get_chunk_vectors(self,project_id:str,filename:str,content_hashes:List[str]):
+        """content_hash -> stored vector of the project's chunks of a file, for the chunks that have one"""
+        collection_name,shared=self.get_read_collection(project_id)
+        if not content_hashes or not self.vectordb_client.is_collection_existed(collection_name):
+            return {}
+
+        vectors={}
+        for points in self.vectordb_client.scroll_points(
+            collection_name=collection_name,
+            metadata_filter=self.get_project_filter(
+                project_id,shared,{"filename":filename,"content_hash":content_hashes}
+            ),
+            with_vectors=True
+        ):
+            for point in points:
+                # vectors of another embedding model can't be mixed into this collection
+                if point["vector"] is not None and len(point["vector"])==self.embedding_client.embedding_size:
+                    vectors[(point["metadata"] or {}).get("content_hash")]=point["vector"]
+        return vectors
+
+    def update_chunk_vectors(self,project:Project,filename:str,chunks:List[Chunk]):
+        """Rewrites the payload of the chunks' points from their current fields; the vectors stay"""
+        metadata={c.content_hash:self.get_point_metadata(project.project_id,c) for c in chunks if c.content_hash}
+        if not metadata:
+            return False
+
+        result=False
+        for collection_name,shared in self.get_write_collections(project.project_id):
+            if not self.vectordb_client.is_collection_existed(collection_name):
+                continue
+            # a point's id comes from the file_id it was first indexed under, it is found by content hash
+            record_ids,point_metadata=[],[]
+            for points in self.vectordb_client.scroll_points(
+                collection_name=collection_name,
+                metadata_filter=self.get_project_filter(
+                    project.project_id,shared,{"filename":filename,"content_hash":list(metadata)}
+                ),
+                with_vectors=False
+            ):
+                for point in points:
+                    content_hash=(point["metadata"] or {}).get("content_hash")
+                    record_ids.append(point["id"])
+                    point_metadata.append(metadata[content_hash])
+            if record_ids:
+                result=self.vectordb_client.update_metadata(
+                    collection_name=collection_name,
+                    record_ids=record_ids,
+                    metadata=point_metadata
+                ) or result
+        return result
+
+    def delete_vectors(self,project:Project,metadata_filter:dict):
+        result=False
+        for collection_name,shared in self.get_write_collections(project.project_id):
+            if self.vectordb_client.is_collection_existed(collection_name):
+                result=self.vectordb_client.delete_by_metadata(
+                    collection_name=collection_name,
+                    metadata_filter=self.get_project_filter(project.project_id,shared,metadata_filter)
+                )
+        return result
+
+    def delete_chunk_vectors(self,project:Project,filename:str,content_hashes:List[str]):
+        if not content_hashes:
+            return False
+        return self.delete_vectors(project,{"filename":filename,"content_hash":content_hashes})
+
+    def delete_file_vectors(self,project:Project,file_id:str):
+        return self.delete_vectors(project,{"file_id":file_id})
 
-        collection_name=self.create_collection_name(project_id=project.project_id)
+    def delete_removed_chunk_vectors(self,project:Project,removed_chunks:List[dict]):
+        """Vectors of the chunks ChunkModel.delete_chunks removed, and no others"""
+        result=False
+        content_hashes={}
+        for chunk in removed_chunks:
+            if chunk.get("content_hash"):
+                content_hashes.setdefault(chunk["filename"],[]).append(chunk["content_hash"])
+            elif chunk.get("file_id"):
+                # chunks stored before content hashing never move to another file_id
+                result=self.delete_file_vectors(project,chunk["file_id"]) or result
+        for filename,hashes in content_hashes.items():
+            result=self.delete_chunk_vectors(project,filename,hashes) or result
+        return result
 
-        vector=self.embedding_client.embed_text(text=text,document_type=_DocumentTypeEnum=QUERY.Value)
+    def search_vector_db_collection(self,project:Project,text:str,limit:int=10,metadata_filter:dict=None):
+
+        collection_name,shared=self.get_read_collection(project.project_id)
+
+        vector=self.embedding_client.embd_text(text=text,document_type=DocumentEnum.QUERY.value)
 
         if not vector or len(vector)==0:
          return False
@@ -68,12 +244,105 @@ class NLPController(BaseController):
         results=self.vectordb_client.search_by_vector(
             collection_name=collection_name,
             vector=vector,
-            limit=limit
+            limit=limit,
+            metadata_filter=self.get_project_filter(project.project_id,shared,metadata_filter)
         )
         if not results:
             return False
         return results
 
+    async def search_many_vector_db_collection(self,project:Project,texts:List[str],limit:int=10,
+    metadata_filter:dict=None):
+        """Results per query text, in order; None for a query that could not be embedded"""
+        collection_name,shared=self.get_read_collection(project.project_id)
+        if not await asyncio.to_thread(self.vectordb_client.is_collection_existed,collection_name):
+            return [[] for _ in texts]
+
+        # all queries are embedded in one batched call and searched in one round-trip
+        vectors=await self.embedding_client.embed_texts_async(
+            texts=texts,
+            document_type=DocumentEnum.QUERY.value
+        ) or [None]*len(texts)
+        embedded=[i for i,vector in enumerate(vectors) if vector]
+
+        results=[None]*len(texts)
+        found=await self.vectordb_client.search_many_async(
+            collection_name=collection_name,
+            vectors=[vectors[i] for i in embedded],
+            limit=limit,
+            metadata_filter=self.get_project_filter(project.project_id,shared,metadata_filter)
+        )
+        for i,documents in zip(embedded,found):
+            results[i]=documents
+        return results
+
+    def get_document_key(self,document:RetrievedDocument):
+        # a chunk is its filename and content hash in both legs, stable across versions of the file
+        metadata=document.metadata or {}
+        if not metadata.get("content_hash"):
+            return document.text
+        return (metadata.get("filename"),metadata["content_hash"])
+
+    def fuse_results(self,rankings:list,limit:int,rrf_k:int):
+        """Reciprocal-rank fusion of (documents, weight) rankings: sum of weight/(rrf_k+rank) per document"""
+        scores,documents={},{}
+        for ranking,weight in rankings:
+            for rank,document in enumerate(ranking or [],start=1):
+                key=self.get_document_key(document)
+                scores[key]=scores.get(key,0.0)+weight/(rrf_k+rank)
+                documents.setdefault(key,document)
+        top=heapq.nlargest(limit,scores.items(),key=lambda item:item[1])
+        return [documents[key].model_copy(update={"score":score}) for key,score in top]
+
+    async def search_hybrid_many(self,project:Project,texts:List[str],limit:int=10,metadata_filter:dict=None,
+    dense_weight:float=None,lexical_weight:float=None,rrf_k:int=None):
+        """
+        Vector and BM25 results per query text, fused by reciprocal rank, and the
+        seconds each leg took. Weights default to the HYBRID_* settings; a leg
+        weighted 0 is skipped and the other one keeps its own scores.
+        """
+        dense_weight=self.app_settings.HYBRID_DENSE_WEIGHT if dense_weight is None else dense_weight
+        lexical_weight=self.app_settings.HYBRID_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight
+        rrf_k=rrf_k or self.app_settings.HYBRID_RRF_K
+        if self.chunk_model is None or not self.chunk_model.lexical_enabled:
+            lexical_weight=0
+
+        timer=StageTimer()
+        if lexical_weight<=0:
+            with timer.stage("dense"):
+                results=await self.search_many_vector_db_collection(project,texts,limit,metadata_filter)
+            return results,timer.as_dict()
+
+        async def search_lexical(depth:int):
+            with timer.stage("lexical"):
+                return await asyncio.gather(*(
+                    self.chunk_model.search_chunks(project.project_id,text,depth,metadata_filter)
+                    for text in texts
+                ))
+
+        if dense_weight<=0:
+            results=await search_lexical(limit)
+            return results,timer.as_dict()
+
+        async def search_dense(depth:int):
+            with timer.stage("dense"):
+                return await self.search_many_vector_db_collection(project,texts,depth,metadata_filter)
+
+        # each leg ranks deeper than the limit, a chunk ranked low by one leg can still win the fusion;
+        # the legs run concurrently: embedding + vector search, and one MongoDB query per text
+        depth=limit*self.app_settings.HYBRID_CANDIDATE_MULTIPLIER
+        dense_results,lexical_results=await asyncio.gather(search_dense(depth),search_lexical(depth))
+        with timer.stage("fusion"):
+            results=[
+                self.fuse_results(
+                    [(dense_documents,dense_weight),(lexical_documents,lexical_weight)],
+                    limit,
+                    rrf_k
+                )
+                for dense_documents,lexical_documents in zip(dense_results,lexical_results)
+            ]
+        return results,timer.as_dict()
+
     def answer_rag_question(self,project:Project,query:str,limit:int=10):
 
         answer,full_prompt,chat_history=None,None,None
@@ -1,11 +1,14 @@
 from .BaseController import BaseController
 from .ProjectController import ProjectController
+import asyncio
 import os
-from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import PyMuPDFLoader
-from models import ProcessingEnum
-from typing import List
 from dataclasses import dataclass
+from helpers.process_pool import ProcessPool
+from helpers.timing import StageTimer
+from utils.files.chunck import CHUNK_UNIT_CHAR, number_duplicate_hashes
+from utils.files.extractors import get_extractor
+from utils.files.file_types import PDF_CONTENT_TYPE, sniff_file_type
+from utils.files import workers
 
 @dataclass
 class Document:
@@ -14,95 +17,119 @@ class Document:
 
 class ProcessController(BaseController):
 
-    def __init__(self, project_id: str):
+    def __init__(self, project_id: str, process_pool: ProcessPool = None):
         super().__init__()
 
         self.project_id = project_id
         self.project_path = ProjectController().get_project_path(project_id=project_id)
+        self.process_pool = process_pool
+
+    async def run_job(self, fn, *args):
+        # without a pool the job still leaves the event loop, on a thread
+        if self.process_pool is None:
+            return await asyncio.to_thread(fn, *args)
+        return await self.process_pool.run(fn, *args)
 
     def get_file_extension(self, file_id: str):
         return os.path.splitext(file_id)[-1]
 
-    def get_file_loader(self, file_id: str):
+    def get_file_content_type(self, file_path: str):
+        # the real type comes from the file's magic bytes, not its extension
+        return sniff_file_type(file_path, self.app_settings.FILE_TEXT_FALLBACK_ENCODINGS)
 
-        file_ext = self.get_file_extension(file_id=file_id)
-        file_path = os.path.join(
-            self.project_path,
-            file_id
-        )
+    async def get_file_content(self, file_id: str):
 
+        file_path = os.path.join(self.project_path, file_id)
         if not os.path.exists(file_path):
             return None
 
-        if file_ext == ProcessingEnum.TXT.value:
-            return TextLoader(file_path, encoding="utf-8")
-
-        if file_ext == ProcessingEnum.PDF.value:
-            return PyMuPDFLoader(file_path)
-        
-        return None
-
-    def get_file_content(self, file_id: str):
-
-        loader = self.get_file_loader(file_id=file_id)
-        if loader:
-            return loader.load()
-
-        return None
-
-    def process_file_content(self, file_content: list, file_id: str,
-                            chunk_size: int=100, overlap_size: int=20):
+        # parsing runs in the process pool, never on the event loop
+        pages = await self.run_job(
+            workers.load_file_pages,
+            file_path,
+            self.get_file_content_type(file_path)
+        )
 
-        file_content_texts = [
-            rec.page_content
-            for rec in file_content
+        return [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in pages
         ]
 
-        file_content_metadata = [
-            rec.metadata
+    async def process_file_content(self, file_content: list, file_id: str,
+                            chunk_size: int=100, overlap_size: int=20,
+                            length_unit: str=CHUNK_UNIT_CHAR):
+
+        pages = [
+            (rec.page_content, rec.metadata)
             for rec in file_content
         ]
 
-        # chunks = text_splitter.create_documents(
-        #     file_content_texts,
-        #     metadatas=file_content_metadata
-        # )
-
-        chunks = self.process_simpler_splitter(
-            texts=file_content_texts,
-            metadatas=file_content_metadata,
-            chunk_size=chunk_size,
+        chunk_dicts = await self.run_job(
+            workers.chunk_pages,
+            pages,
+            {"project_id": self.project_id, "filename": file_id},
+            chunk_size,
+            overlap_size,
+            length_unit
         )
 
-        return chunks
-
-    def process_simpler_splitter(self, texts: List[str], metadatas: List[dict], chunk_size: int, splitter_tag: str="\n"):
-        
-        full_text = " ".join(texts)
-
-        # split by splitter_tag
-        lines = [ doc.strip() for doc in full_text.split(splitter_tag) if len(doc.strip()) > 1 ]
-
-        chunks = []
-        current_chunk = ""
-
-        for line in lines:
-            current_chunk += line + splitter_tag
-            if len(current_chunk) >= chunk_size:
-                chunks.append(Document(
-                    page_content=current_chunk.strip(),
-                    metadata={}
-                ))
-
-                current_chunk = ""
-
-        if len(current_chunk) >= 0:
-            chunks.append(Document(
-                page_content=current_chunk.strip(),
-                metadata={}
-            ))
-
-        return chunks
-
+        return [
+            Document(
+                page_content=chunk["content"],
+                metadata=chunk["metadata"]
+            )
+            for chunk in chunk_dicts
+        ]
 
-    
+    async def process_file(self, file_path: str, content_type: str, metadata: dict,
+                           chunk_size: int=100, overlap_size: int=20,
+                           length_unit: str=CHUNK_UNIT_CHAR):
+        """
+        Extract and chunk a file in the process pool, picking the extractor by content type.
+        Large PDFs are split into page ranges that are chunked in parallel.
+        Returns (chunk_dicts, timings) with seconds spent per stage.
+        """
+        timer = StageTimer()
+
+        # raises UnsupportedFileType before anything is sent to the pool
+        get_extractor(content_type)
+
+        page_ranges = [(0, None)]
+
+        if content_type == PDF_CONTENT_TYPE:
+            page_count = await self.run_job(workers.count_pdf_pages, file_path)
+            pages_per_task = max(1, self.app_settings.PDF_PAGES_PER_TASK)
+            page_ranges = [
+                (start, start + pages_per_task)
+                for start in range(0, page_count, pages_per_task)
+            ] or page_ranges
+
+        with timer.stage("process"):
+            results = await asyncio.gather(*[
+                self.run_job(
+                    workers.chunk_file,
+                    file_path,
+                    content_type,
+                    metadata,
+                    chunk_size,
+                    overlap_size,
+                    length_unit,
+                    start,
+                    stop
+                )
+                for start, stop in page_ranges
+            ])
+
+        # extract/chunk are summed over parallel page ranges (CPU seconds)
+        for result in results:
+            timer.merge(result["timings"])
+
+        # page ranges are chunked independently, renumber chunks in file order
+        chunk_dicts = [chunk for result in results for chunk in result["chunks"]]
+        for chunk_id, chunk in enumerate(chunk_dicts):
+            chunk["chunk_id"] = chunk_id
+            chunk["total_chunks"] = len(chunk_dicts)
+        if len(results) > 1:
+            number_duplicate_hashes(chunk_dicts)
+
+        return chunk_dicts, timer.as_dict()
@@ -1,6 +1,5 @@
 from .BaseController import BaseController
 from fastapi import UploadFile
-from models import ResponseSignal
 import os
 
 class ProjectController(BaseController):
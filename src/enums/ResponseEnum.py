@@ -3,4 +3,8 @@ from enum import Enum
 class ResponseEnum(Enum):
     SUCCESS = "success"
     ERROR = "error"
-    # Add your enum values here
\ No newline at end of file
+    FILE_TYPE_NOT_SUPPORTED = "file_type_not_supported"
+    FILE_SIZE_EXCEEDED = "file_size_exceeded"
+    FILE_EMPTY = "file_empty"
+    FILE_UPLOAD_FAILED = "file_upload_failed"
+    # Add your enum values here
@@ -35,14 +35,91 @@ class Settings(BaseSettings):
     # Add these required fields with default values
     ALLOWED_FILE_EXTENSIONS: list = [".pdf", ".txt", ".doc", ".docx"]
     MAX_FILE_SIZE: int = 10  # MB
+    FILE_DEFAULT_CHUNK_SIZE: int = 512000  # bytes read per block while streaming uploads
+    FILE_TEXT_FALLBACK_ENCODINGS: list = ["cp1256"]  # tried in order after UTF-8 for text files without a BOM
+    PROCESS_POOL_SIZE: int = 2  # worker processes per app worker, 0 = one per core
+    PROCESS_POOL_JOB_TIMEOUT: int = 300  # seconds
+    PDF_PAGES_PER_TASK: int = 16  # larger PDFs are chunked in parallel page ranges
+    JOB_WORKER_CONCURRENCY: int = 2  # ingestion jobs run at once per app worker
+    JOB_QUEUE_MAX_QUEUED: int = 100  # new jobs are refused (429) beyond this many waiting
+    JOB_LEASE_SECONDS: int = 120  # a job whose worker stops renewing is reclaimed after this
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_POLL_INTERVAL: float = 1.0  # seconds between queue polls of an idle worker
+    BULK_MAX_UPLOAD_SIZE: int = 1024  # MB per file or archive of a bulk upload
+    BULK_PIPELINE_QUEUE_SIZE: int = 8  # documents buffered between bulk pipeline stages
+    BULK_FILE_INDEX_BLOCK_SIZE: int = 16  # file indexes a bulk job reserves per counter round-trip
+    VECTOR_DB_BACKEND: str = "QDRANT"  # QDRANT, MMAP or IVF_PQ
+    VECTOR_DB_PATH: str = "qdrant_db"  # under assets/database
+    VECTOR_DB_URL: str | None = None  # Qdrant server, e.g. http://qdrant:6333; unset opens the embedded store at VECTOR_DB_PATH
+    VECTOR_DB_API_KEY: str | None = None
+    VECTOR_DB_PREFER_GRPC: bool = True  # talk to the server over gRPC on VECTOR_DB_GRPC_PORT
+    VECTOR_DB_GRPC_PORT: int = 6334
+    VECTOR_DB_TIMEOUT: int = 30  # seconds per server request
+    VECTOR_DB_DISTANCE_METHOD: str = "cosine"
+    VECTOR_DB_TENANCY: str = "collection"  # collection, migrating or shared, see migrations/shared_collections.py
+    VECTOR_DB_SHARED_COLLECTIONS: int = 4  # collections the projects are hashed over; fixed once data is in them
+    VECTOR_DB_QUANTIZATION: str = "none"  # none, int8 or binary for new collections; originals then live on disk
+    VECTOR_DB_QUANTIZATION_OVERSAMPLING: float = 2.0  # candidates fetched per result before rescoring
+    VECTOR_DB_QUANTIZATION_RESCORE: bool = True
+    VECTOR_DB_MMAP_DTYPE: str = "float32"  # float16 halves the MMAP store's size
+    VECTOR_DB_IVF_NLIST: int = 1024  # inverted lists of an IVF_PQ collection, about sqrt(vectors)
+    VECTOR_DB_IVF_PQ_SUBVECTORS: int = 48  # bytes per PQ code; must divide the embedding size, else the next lower divisor
+    VECTOR_DB_IVF_NPROBE: int = 16  # lists searched per query
+    VECTOR_DB_IVF_REFINE: int = 16  # candidates per result rescored with the full vectors, 0 ranks by PQ alone
+    VECTOR_DB_IVF_TRAIN_ROWS: int = 50000  # IVF_PQ collections are searched exactly until this size
+    VECTOR_DB_UPLOAD_BATCH_SIZE: int = 256  # points per upsert request
+    VECTOR_DB_UPLOAD_PARALLEL: int = 1  # upload processes, only for Qdrant server inserts of over batch size x this points
+    VECTOR_DB_UPLOAD_MAX_RETRIES: int = 3  # a failed batch is retried alone this many times
+    CHUNK_WRITE_BATCH_SIZE: int = 1000  # chunk documents per insert_many
+    CHUNK_WRITE_BATCH_BYTES: int = 8388608  # approximate bytes per insert_many
+    CHUNK_WRITE_CONCURRENCY: int = 4  # insert_many batches in flight
+    NLP_MAX_BATCH_QUERIES: int = 64  # queries one batch search request may carry
+    LEXICAL_INDEX_ENABLED: bool = True  # BM25 terms stored with each chunk, searched alongside the vectors
+    LEXICAL_BM25_K1: float = 1.2
+    LEXICAL_BM25_B: float = 0.75
+    LEXICAL_MAX_CANDIDATES: int = 5000  # chunks scored per lexical search
+    HYBRID_DENSE_WEIGHT: float = 1.0  # reciprocal-rank fusion weights, a request may override them
+    HYBRID_LEXICAL_WEIGHT: float = 1.0
+    HYBRID_RRF_K: int = 60
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4  # each leg returns limit * this many results to fuse
+    PROJECT_COUNT_CACHE_SECONDS: int = 30  # how long the project listing reuses its total count
+    GENERATION_BACKEND: str = "OPENAI"
+    EMBEDDING_BACKEND: str = "COHERE"
+    OPENAI_API_KEY: str | None = None
+    OPENAI_API_URL: str | None = None
+    COHERE_API_KEY: str | None = None
+    GENERATION_MODEL_ID: str | None = None
+    EMBEDDING_MODEL_ID: str | None = None
+    EMBEDDING_MODEL_SIZE: int | None = None
+    INPUT_DEFAULT_MAX_CHAR: int = 1024
+    GENERATION_DEFAULT_MAX_TOKEN: int = 200
+    GENERATION_DEFAULT_TEMPERATURE: float = 0.1
+    EMBEDDING_BATCH_SIZE: int = 96  # texts per embedding request, capped by each provider's limit
+    EMBEDDING_BATCH_MAX_CHARS: int = 200000  # total characters per embedding request
+    LLM_MAX_CONCURRENCY: int = 8  # in-flight async requests per provider client
+    LLM_HTTP_MAX_CONNECTIONS: int = 100  # shared by the async clients of all providers
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_TIMEOUT: float = 60.0  # seconds
+    LLM_REQUESTS_PER_MINUTE: int = 0  # default per-model request budget of the host, 0 = unlimited
+    LLM_TOKENS_PER_MINUTE: int = 0  # default per-model token budget of the host, 0 = unlimited
+    LLM_MODEL_RATE_LIMITS: dict = {}  # {"model-id": {"requests_per_minute": .., "tokens_per_minute": ..}}
+    LLM_MAX_THROTTLE_RETRIES: int = 8  # 429s retried per call before it fails
+    LLM_RATE_LIMIT_PATH: str | None = "rate_limits"  # under assets/database, budgets shared by all workers; None = per worker
+    LOCAL_MODEL_CACHE_DIR: str | None = None  # where sentence-transformers models are already downloaded
+    LOCAL_EMBEDDING_BATCH_SIZE: int = 64  # texts per batch handed to one CPU thread
+    LOCAL_EMBEDDING_THREADS: int = 0  # 0 = one per core
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "embedding_cache"  # under assets/database, shared by all workers
+    EMBEDDING_CACHE_MEMORY_BYTES: int = 67108864  # vector bytes kept in each worker's LRU
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES: int = 1000000
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_NAME: str = "rag"
     
     # Also add FILE_ALLOWED_TYPES if you're using it elsewhere
+    # types utils.files.extractors can read; legacy .doc files are sniffed and refused at upload
     FILE_ALLOWED_TYPES: list = [
         "application/pdf", 
         "text/plain", 
-        "application/msword",
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     ]
     
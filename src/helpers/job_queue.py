@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import socket
+from functools import partial
+from typing import Awaitable, Callable, Dict
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Bounded pool of asyncio workers draining the Mongo-backed job queue.
+
+    Jobs are claimed atomically from the jobs collection, so several app
+    workers can share one queue. A running job holds a lease that its worker
+    renews; if the worker dies the lease expires and another worker reclaims
+    the job. Handlers are `async handler(job, report) -> (result, timings)`
+    where `await report(stage, progress, timings)` publishes progress.
+    """
+
+    def __init__(self, job_model, handlers: Dict[str, Callable[..., Awaitable]],
+                 concurrency: int = 2, max_queued: int = 100, lease_seconds: int = 120,
+                 max_attempts: int = 3, poll_interval: float = 1.0):
+        self.job_model = job_model
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.wakeup = asyncio.Event()
+        self.tasks = []
+        self.running: Dict[str, str] = {}  # job_id -> worker_id
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [
+                asyncio.create_task(self.worker_loop(f"{self.worker_prefix}:{i}"))
+                for i in range(self.concurrency)
+            ]
+            self.tasks.append(asyncio.create_task(self.reaper_loop()))
+            self.logger.info(f"Job queue started with {self.concurrency} workers")
+        return self
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.logger.info("Job queue stopped")
+
+    async def enqueue(self, job_type: str, project_id: str, params: dict):
+        """Persist a new job; raises QueueFullError when too many jobs are waiting"""
+        if self.max_queued and await self.job_model.count_queued_jobs() >= self.max_queued:
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+        job = await self.job_model.create_job(job_type=job_type, project_id=project_id, params=params)
+        self.wakeup.set()
+        return job
+
+    async def worker_loop(self, worker_id: str):
+        while True:
+            try:
+                job = await self.job_model.claim_next_job(
+                    worker_id=worker_id,
+                    lease_seconds=self.lease_seconds,
+                    max_attempts=self.max_attempts
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Could not claim a job: {e}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                # idle: sleep until a job is enqueued here, or poll for jobs from other app workers
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+
+            await self.run_job(worker_id, job)
+
+    async def run_job(self, worker_id: str, job):
+        handler = self.handlers.get(job.job_type)
+        if handler is None:
+            await self.job_model.fail_job(job.job_id, worker_id, f"Unknown job type: {job.job_type}")
+            return
+
+        self.running[job.job_id] = worker_id
+        heartbeat = asyncio.create_task(self.keep_lease(job.job_id, worker_id))
+        report = partial(self.job_model.update_progress, job.job_id, worker_id)
+        try:
+            result, timings = await handler(job, report)
+        except asyncio.CancelledError:
+            # shutting down: give the job back instead of waiting for the lease to expire
+            await asyncio.shield(self.job_model.requeue_job(job.job_id, worker_id))
+            raise
+        except Exception as e:
+            self.logger.error(f"Job {job.job_id} ({job.job_type}) failed: {e}", exc_info=True)
+            await self.job_model.fail_job(job.job_id, worker_id, str(e) or e.__class__.__name__)
+        else:
+            await self.job_model.complete_job(job.job_id, worker_id, result=result, timings=timings)
+            self.logger.info(f"Job {job.job_id} ({job.job_type}) done - timings {timings}")
+        finally:
+            heartbeat.cancel()
+            self.running.pop(job.job_id, None)
+
+    async def keep_lease(self, job_id: str, worker_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.job_model.renew_lease(job_id, worker_id, self.lease_seconds)
+            except Exception as e:
+                self.logger.warning(f"Could not renew lease of job {job_id}: {e}")
+
+    async def reaper_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                failed = await self.job_model.fail_abandoned_jobs(self.max_attempts)
+                if failed:
+                    self.logger.warning(f"Failed {failed} jobs abandoned by their workers")
+            except Exception as e:
+                self.logger.warning(f"Could not check abandoned jobs: {e}")
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import AsyncIterable, Awaitable, Callable, List
+from .timing import StageTimer
+
+# Marks the end of the stream on a stage queue
+STOP = object()
+
+
+class PipelineStage:
+    def __init__(self, name: str, fn: Callable[..., Awaitable], workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+class Pipeline:
+    """
+    Stages connected by bounded asyncio queues so they run overlapped.
+
+    Each stage runs `workers` tasks calling `await fn(item)`; the result is
+    passed to the next stage, None drops the item. A full queue blocks the
+    stage feeding it, so a slow stage throttles everything before it instead
+    of letting items pile up in memory. An item whose stage raises is
+    reported to `on_error` and dropped; the rest of the stream carries on.
+    """
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = 8,
+                 on_error: Callable = None, on_done: Callable = None):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+        self.on_done = on_done
+        self.timer = StageTimer()  # busy seconds per stage, summed over its workers
+        self.logger = logging.getLogger(__name__)
+
+    async def run(self, source: AsyncIterable):
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        running = [stage.workers for stage in self.stages]
+
+        async def feed():
+            try:
+                async for item in source:
+                    await queues[0].put(item)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    await queues[0].put(STOP)
+
+        async def work(index: int):
+            stage = self.stages[index]
+            is_last = index == len(self.stages) - 1
+            while True:
+                item = await queues[index].get()
+                if item is STOP:
+                    break
+
+                try:
+                    with self.timer.stage(stage.name):
+                        result = await stage.fn(item)
+                except Exception as e:
+                    self.logger.warning(f"Pipeline stage {stage.name} failed: {e}")
+                    if self.on_error is not None:
+                        self.on_error(stage.name, item, e)
+                    continue
+
+                if result is None:
+                    continue
+                if is_last:
+                    if self.on_done is not None:
+                        self.on_done(result)
+                else:
+                    await queues[index + 1].put(result)
+
+            # the last worker of a stage closes the stream for the next one
+            running[index] -= 1
+            if running[index] == 0 and not is_last:
+                for _ in range(self.stages[index + 1].workers):
+                    await queues[index + 1].put(STOP)
+
+        tasks = [asyncio.create_task(feed())]
+        for index, stage in enumerate(self.stages):
+            tasks.extend(asyncio.create_task(work(index)) for _ in range(stage.workers))
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return self.timer.as_dict()
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+
+def report_worker_pid(pids):
+    """Worker initializer: tells the pool which processes are its own, see ProcessPool.recycle"""
+    pids.put(os.getpid())
+
+
+class ProcessPool:
+    """
+    Process pool for CPU-bound work (file parsing, chunking) called from async routes.
+
+    Jobs run in separate processes so a large file never blocks the event loop.
+    A job that exceeds its timeout raises asyncio.TimeoutError to the caller.
+    Its worker can't be interrupted, so the pool is replaced and the old one's
+    workers are terminated; the other jobs they were running or had queued
+    are run again on the new pool. A worker that dies replaces the pool too.
+    """
+
+    def __init__(self, max_workers: int = None, job_timeout: float = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.job_timeout = job_timeout
+        self.executor = None
+        # pids the current pool's workers report as they start
+        self.worker_pids = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self.executor is None:
+            # spawn: the parent holds event loop and driver threads that must not be forked
+            context = multiprocessing.get_context("spawn")
+            self.worker_pids = context.SimpleQueue()
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=report_worker_pid,
+                initargs=(self.worker_pids,)
+            )
+            self.logger.info(f"Process pool started with {self.max_workers} workers")
+        return self
+
+    async def run(self, fn, *args, timeout: float = None, **kwargs):
+        """Run fn(*args, **kwargs) in a worker process; fn must be a module-level function"""
+        timeout = timeout if timeout is not None else self.job_timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        loop = asyncio.get_running_loop()
+        call = partial(fn, *args, **kwargs)
+
+        # one rerun: a job whose pool was replaced under it is innocent, a job that kills its worker twice is not
+        for attempt in range(2):
+            executor = self.start().executor
+            future = loop.run_in_executor(executor, call)
+            try:
+                return await asyncio.wait_for(future, timeout=deadline - time.monotonic() if deadline else None)
+            except asyncio.TimeoutError:
+                self.recycle(executor)
+                raise
+            except BrokenProcessPool:
+                self.recycle(executor)
+                if attempt:
+                    raise
+                self.logger.warning(f"Process pool was replaced while running {getattr(fn, '__name__', fn)}, running it again")
+
+    def recycle(self, executor: ProcessPoolExecutor):
+        """Replaces the pool, unless that was already done, and terminates the old one's workers"""
+        if executor is not self.executor:
+            return
+        worker_pids = self.worker_pids
+        self.executor = None
+        self.start()
+
+        pids = set()
+        while not worker_pids.empty():
+            pids.add(worker_pids.get())
+        worker_pids.close()
+        # a running job can't be cancelled, only its process killed; the old pool's
+        # pending futures then fail with BrokenProcessPool and their callers rerun them.
+        # Only live children are matched, a pid of a worker that already died may be reused
+        for process in multiprocessing.active_children():
+            if process.pid in pids:
+                process.terminate()
+        # workers still starting report no pid, they exit on the shutdown sentinel
+        executor.shutdown(wait=False)
+        self.logger.warning("Process pool replaced: a job timed out or its worker died")
+
+    def shutdown(self, wait: bool = True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
+            self.worker_pids.close()
+            self.logger.info("Process pool shut down")
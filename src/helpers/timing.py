@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+
+class StageTimer:
+    """Accumulates wall time per pipeline stage (extract, chunk, store, ...)"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def track(self, name: str, items: Iterable) -> Iterator:
+        """Count the time spent producing each item of a generator towards a stage"""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - start)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def merge(self, timings: Dict[str, float]):
+        for stage, seconds in timings.items():
+            self.add(stage, seconds)
+
+    def as_dict(self, digits: int = 4) -> Dict[str, float]:
+        return {stage: round(seconds, digits) for stage, seconds in self.timings.items()}
@@ -1,13 +1,26 @@
+import os
 from fastapi import FastAPI
-from routes import base, data, projects
+from routes import base, data, projects, jobs, nlp
 from routes.base import base_router
 from motor.motor_asyncio import AsyncIOMotorClient
 from helpers.config import get_settings
 from models.ChunkModel import ChunkModel
 from models.ProjectModel import ProjectModel
+from models.AssetModel import AssetModel
+from models.JobModel import JobModel
+from models.CounterModel import CounterModel
+from migrations.seed_counters import seed_counters
+from models.enums.JobEnum import JobTypeEnum
+from controllers.BaseController import BaseController
+from controllers.IngestionController import IngestionController
+from controllers.BulkIngestionController import BulkIngestionController
 from stores.llm.LLMFactory import LLMFactory
+from stores.llm.EmbeddingCache import EmbeddingCache, CachedEmbeddingProvider
+from stores.llm.AsyncHttpPool import AsyncHttpPool
 from stores.VectorDB.VectorDBProvideFactory import VectorDBProviderFactory
 from routes.metrics import setup_metrics  
+from helpers.process_pool import ProcessPool
+from helpers.job_queue import JobQueue
 
 app = FastAPI()
 
@@ -15,9 +28,38 @@ app = FastAPI()
 setup_metrics(app)
 
 
+async def run_ingest_job(job, report):
+    # clients are looked up per job, they may be configured after the queue starts
+    ingestion_controller = IngestionController(
+        db_client=app.mongodb_client,
+        process_pool=app.process_pool,
+        vectordb_client=getattr(app, "vectordb_client", None),
+        embedding_client=getattr(app, "embedding_client", None)
+    )
+    return await ingestion_controller.run_job(job, report)
+
+
+async def run_bulk_ingest_job(job, report):
+    bulk_controller = BulkIngestionController(
+        db_client=app.mongodb_client,
+        process_pool=app.process_pool,
+        vectordb_client=getattr(app, "vectordb_client", None),
+        embedding_client=getattr(app, "embedding_client", None),
+        queue_size=get_settings().BULK_PIPELINE_QUEUE_SIZE,
+        file_index_block_size=get_settings().BULK_FILE_INDEX_BLOCK_SIZE
+    )
+    return await bulk_controller.run_job(job, report)
+
+
 async def startup_event():
     settings = get_settings()
 
+    # Process pool for parsing and chunking
+    app.process_pool = ProcessPool(
+        max_workers=settings.PROCESS_POOL_SIZE or None,
+        job_timeout=settings.PROCESS_POOL_JOB_TIMEOUT
+    ).start()
+
     # Connect to MongoDB
     app.mongo_conn = AsyncIOMotorClient(settings.MONGODB_URL)
     app.mongodb_client = app.mongo_conn[settings.MONGO_DATABASE]
@@ -37,27 +79,89 @@ async def startup_event():
         project_model = ProjectModel(db_client=app.mongodb_client)
         await project_model.create_indexes()
 
+        asset_model = AssetModel(db_client=app.mongodb_client)
+        await asset_model.create_indexes()
+
+        job_model = JobModel(db_client=app.mongodb_client)
+        await job_model.create_indexes()
+
         print("MongoDB indexes created successfully")
     except Exception as e:
         print(f"Warning: Could not create indexes: {e}")
 
+    # First start with the counters collection: continue after existing indexes
+    try:
+        if await CounterModel(db_client=app.mongodb_client).is_empty():
+            seeded = await seed_counters(app.mongodb_client)
+            print(f"Seeded {len(seeded)} counters")
+    except Exception as e:
+        print(f"Warning: Could not seed counters: {e}")
+
     # initialize LLM
     llm_factory = LLMFactory(settings)
-    app.llm_client = llm_factory.create(provider=settings.GENERATION_BACKEND)
-    app.llm_client.set_generation_model(model_id=settings.GENERATION_MODEL_ID)
+    app.llm_client = None
+    app.embedding_client = None
+    try:
+        app.llm_client = llm_factory.create(provider=settings.GENERATION_BACKEND)
+        if app.llm_client is not None and settings.GENERATION_MODEL_ID:
+            app.llm_client.set_generation_model(model_id=settings.GENERATION_MODEL_ID)
+
+        # chunks are only embedded and indexed once an embedding model is configured
+        if settings.EMBEDDING_MODEL_ID:
+            app.embedding_client = llm_factory.create(provider=settings.EMBEDDING_BACKEND)
+            if app.embedding_client is not None:
+                app.embedding_client.set_embedding_model(
+                    model_id=settings.EMBEDDING_MODEL_ID,
+                    embedding_size=settings.EMBEDDING_MODEL_SIZE
+                )
+                if settings.EMBEDDING_CACHE_ENABLED:
+                    app.embedding_client = CachedEmbeddingProvider(
+                        provider=app.embedding_client,
+                        provider_name=settings.EMBEDDING_BACKEND,
+                        cache=EmbeddingCache(
+                            db_path=os.path.join(
+                                BaseController().get_database_path(db_name=settings.EMBEDDING_CACHE_PATH),
+                                "embeddings.sqlite3"
+                            ),
+                            memory_max_bytes=settings.EMBEDDING_CACHE_MEMORY_BYTES,
+                            disk_max_entries=settings.EMBEDDING_CACHE_DISK_MAX_ENTRIES
+                        )
+                    )
+    except Exception as e:
+        print(f"Warning: LLM clients were not initialized: {e}")
 
     # Initialize Qdrant
-    vectordb_factory = VectorDBProviderFactory(config=settings, db_client=app.mongodb_client)
+    vectordb_factory = VectorDBProviderFactory(config=settings)
     app.vectordb_client = vectordb_factory.create(provider=settings.VECTOR_DB_BACKEND)
-    await app.vectordb_client.connect()
-
-    print("Qdrant connected successfully")
+    app.vectordb_client.connect()
+
+    print("Vector DB connected successfully")
+
+    # Ingestion job workers, job state lives in MongoDB. Started last: jobs resumed
+    # at startup must see the embedding and vector DB clients, or their chunks go unindexed
+    app.job_queue = JobQueue(
+        job_model=JobModel(db_client=app.mongodb_client),
+        handlers={
+            JobTypeEnum.INGEST.value: run_ingest_job,
+            JobTypeEnum.BULK_INGEST.value: run_bulk_ingest_job,
+        },
+        concurrency=settings.JOB_WORKER_CONCURRENCY,
+        max_queued=settings.JOB_QUEUE_MAX_QUEUED,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        poll_interval=settings.JOB_POLL_INTERVAL
+    ).start()
 
 
 async def shutdown_event():
     print("Shutting down connections...")
+    if getattr(app, "job_queue", None) is not None:
+        await app.job_queue.stop()
+    app.process_pool.shutdown()
     app.mongo_conn.close()
-    await app.vectordb_client.disconnect()
+    if getattr(app, "vectordb_client", None) is not None:
+        await app.vectordb_client.disconnect_async()
+    await AsyncHttpPool.close()
 
 
 app.router.lifespan.on_startup.append(startup_event)
@@ -66,6 +170,8 @@ app.router.lifespan.on_shutdown.append(shutdown_event)
 app.include_router(base_router)
 app.include_router(data.data_router)
 app.include_router(projects.project_router)
+app.include_router(jobs.job_router)
+app.include_router(nlp.nlp_router)
 
 
 if __name__ == "__main__":
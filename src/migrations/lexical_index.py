@@ -0,0 +1,78 @@
+"""
+Build the lexical (BM25) index of chunks stored before it existed, and
+recount the per-project statistics from the stored chunks.
+
+New chunks get their terms on insert; run this once after enabling
+LEXICAL_INDEX_ENABLED, or again whenever the statistics may have drifted
+(e.g. stats writes that failed). Safe to run on a live database: only
+chunks without terms are updated; a project's lexical searches find
+nothing for the moment its statistics are recounted.
+
+    cd src && python -m migrations.lexical_index
+    cd src && python -m migrations.lexical_index --project-id <project_id>
+"""
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from helpers.config import get_settings
+from models.ChunkModel import ChunkModel
+from utils.text.lexical import get_term_frequencies
+
+
+async def backfill_terms(chunk_model: ChunkModel, project_id: str, batch_size: int) -> int:
+    """Adds the lexical fields to the project's chunks that have none, returns how many"""
+    cursor = chunk_model.collection.find(
+        {"project_id": project_id, "term_count": {"$exists": False}},
+        {"content": 1}
+    )
+    updated, updates = 0, []
+    async for doc in cursor:
+        term_freqs, term_count = get_term_frequencies(doc.get("content") or "")
+        updates.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"terms": list(term_freqs), "term_freqs": term_freqs, "term_count": term_count}}
+        ))
+        if len(updates) >= batch_size:
+            await chunk_model.collection.bulk_write(updates, ordered=False)
+            updated += len(updates)
+            updates = []
+    if updates:
+        await chunk_model.collection.bulk_write(updates, ordered=False)
+        updated += len(updates)
+    return updated
+
+
+async def build_lexical_index(db_client, project_ids: list = None, batch_size: int = 1000) -> dict:
+    """Returns project_id -> chunks given terms"""
+    chunk_model = ChunkModel(db_client=db_client)
+    await chunk_model.create_indexes()
+    if not project_ids:
+        project_ids = await chunk_model.collection.distinct("project_id")
+
+    built = {}
+    for project_id in project_ids:
+        built[project_id] = await backfill_terms(chunk_model, project_id, batch_size)
+        await chunk_model.lexical_stats_model.rebuild(chunk_model.collection, project_id)
+    return built
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project-id", action="append", default=None, help="only these projects")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        built = await build_lexical_index(client[settings.MONGO_DATABASE], args.project_id, args.batch_size)
+        print(f"Rebuilt lexical stats of {len(built)} projects")
+        for project_id, updated in sorted(built.items()):
+            print(f"  {project_id}: {updated} chunks indexed")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+Flatten the key fields of Qdrant points indexed before searches filtered on
+top-level payload keys.
+
+Points written since carry project_id, file_id, filename, file_index and
+chunk_id both in their metadata and at the top level, where they are
+indexed. Older points only have them nested, so filters on those keys miss
+them until this runs. Collections created before then also get their payload
+indexes. Safe to run on a live server and to run again: only points missing
+a key are updated. The MMAP and IVF_PQ stores index the metadata itself and
+need nothing.
+
+    cd src && python -m migrations.payload_keys
+    cd src && python -m migrations.payload_keys --collection collection_<project_id>
+"""
+import argparse
+from helpers.config import get_settings
+from stores.VectorDB.VectorDBEnum import VectorDBEnum
+from stores.VectorDB.VectorDBProvideFactory import VectorDBProviderFactory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collection", action="append", default=None, help="only these collections")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if settings.VECTOR_DB_BACKEND != VectorDBEnum.QDRANT.value:
+        print(f"{settings.VECTOR_DB_BACKEND} indexes the metadata keys itself, nothing to backfill")
+        return
+
+    vectordb_client = VectorDBProviderFactory(settings).create(provider=settings.VECTOR_DB_BACKEND)
+    vectordb_client.connect()
+    try:
+        collection_names = args.collection or vectordb_client.list_all_collection()
+        print(f"Backfilling {len(collection_names)} collections")
+        for collection_name in collection_names:
+            updated = vectordb_client.backfill_payload_keys(collection_name, batch_size=args.batch_size)
+            print(f"  {collection_name}: {updated} points updated")
+    finally:
+        vectordb_client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Seed the counters collection from existing projects and chunks.
+
+Sequences only move forward, so the migration is safe to run again
+on a live database. It runs on startup while the counters collection
+is empty, and by hand with:
+
+    cd src && python -m migrations.seed_counters
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from helpers.config import get_settings
+from models.ChunkModel import ChunkModel
+from models.CounterModel import CounterModel
+from models.ProjectModel import ProjectModel
+from models.enums.CounterEnum import CounterEnum
+
+
+async def seed_counters(db_client) -> dict:
+    """Returns the seeded sequences, name -> next value"""
+    counter_model = CounterModel(db_client=db_client)
+    chunk_model = ChunkModel(db_client=db_client)
+    seeded = {}
+
+    max_project_index = await ProjectModel(db_client=db_client).get_max_project_index()
+    if max_project_index is not None:
+        seeded[CounterEnum.PROJECT_INDEX.value] = max_project_index + 1
+
+    for project_id, max_file_index in (await chunk_model.get_max_file_indexes()).items():
+        seeded[chunk_model.get_file_index_counter(project_id)] = max_file_index + 1
+
+    for name, seq in seeded.items():
+        await counter_model.seed(name, seq)
+
+    return seeded
+
+
+async def main():
+    settings = get_settings()
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        seeded = await seed_counters(client[settings.MONGO_DATABASE])
+        print(f"Seeded {len(seeded)} counters")
+        for name, seq in sorted(seeded.items()):
+            print(f"  {name}: {seq}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
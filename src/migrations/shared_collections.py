@@ -0,0 +1,115 @@
+"""
+Move the per-project vector collections into the shared, project-partitioned ones.
+
+Without downtime:
+    1. set VECTOR_DB_TENANCY=migrating and restart the workers: writes go to
+       both layouts, searches still read the per-project collections
+    2. cd src && python -m migrations.shared_collections
+       copies every collection_<project_id>, then deletes the shared points
+       its source no longer has; safe to run again
+    3. set VECTOR_DB_TENANCY=shared and restart the workers
+    4. cd src && python -m migrations.shared_collections --drop-source
+
+Points keep their ids, so copies and the workers' own writes overwrite each
+other instead of adding duplicates. Migrate live against a Qdrant server or
+the MMAP/IVF_PQ stores; the embedded Qdrant store can't index payloads, so
+the app refuses to start with it in migrating or shared mode.
+"""
+import argparse
+from helpers.config import get_settings
+from controllers.NLPController import NLPController
+from stores.VectorDB.VectorDBEnum import TenancyEnums
+from stores.VectorDB.VectorDBProvideFactory import VectorDBProviderFactory
+
+SOURCE_PREFIX = "collection_"
+
+
+def get_point_ids(vectordb_client, collection_name: str, batch_size: int, metadata_filter: dict = None) -> set:
+    return {
+        point["id"]
+        for points in vectordb_client.scroll_points(
+            collection_name, batch_size=batch_size, metadata_filter=metadata_filter, with_vectors=False
+        )
+        for point in points
+    }
+
+
+def copy_project(nlp_controller: NLPController, project_id: str, batch_size: int) -> int:
+    vectordb_client = nlp_controller.vectordb_client
+    target = nlp_controller.create_shared_collection_name(project_id)
+    copied = 0
+    for points in vectordb_client.scroll_points(nlp_controller.create_collection_name(project_id), batch_size=batch_size):
+        vectordb_client.create_collection(
+            collection_name=target,
+            embedding_size=len(points[0]["vector"]),
+            shared=True
+        )
+        vectordb_client.insert_many(
+            collection_name=target,
+            text=[point["text"] for point in points],
+            vector=[point["vector"] for point in points],
+            # points indexed before project_id was stored get it now, shared collections are filtered on it
+            metadata=[{**(point["metadata"] or {}), "project_id": project_id} for point in points],
+            record_id=[point["id"] for point in points]
+        )
+        copied += len(points)
+    return copied
+
+
+def remove_stale(nlp_controller: NLPController, project_id: str, batch_size: int) -> int:
+    """Deletes the project's shared points its source no longer has: a copy can race a delete"""
+    vectordb_client = nlp_controller.vectordb_client
+    target = nlp_controller.create_shared_collection_name(project_id)
+    if not vectordb_client.is_collection_existed(target):
+        return 0
+
+    # shared ids first: workers write the per-project collection before the shared one,
+    # so a point listed here is in the source unless it was deleted since
+    shared_ids = get_point_ids(vectordb_client, target, batch_size, nlp_controller.get_project_filter(project_id, True))
+    source_ids = get_point_ids(vectordb_client, nlp_controller.create_collection_name(project_id), batch_size)
+    stale = list(shared_ids - source_ids)
+    if stale:
+        vectordb_client.delete_points(collection_name=target, record_ids=stale)
+    return len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--drop-source", action="store_true",
+                        help="delete the per-project collections, once VECTOR_DB_TENANCY=shared")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if args.drop_source and settings.VECTOR_DB_TENANCY != TenancyEnums.SHARED.value:
+        raise SystemExit("Switch VECTOR_DB_TENANCY to shared before dropping the per-project collections")
+    if not args.drop_source and settings.VECTOR_DB_TENANCY != TenancyEnums.MIGRATING.value:
+        # otherwise writes made during the copy only reach one layout
+        raise SystemExit("Set VECTOR_DB_TENANCY=migrating and restart the workers before copying")
+
+    vectordb_client = VectorDBProviderFactory(settings).create(provider=settings.VECTOR_DB_BACKEND)
+    vectordb_client.connect()
+    try:
+        nlp_controller = NLPController(vectordb_client=vectordb_client, generation_client=None, embedding_client=None)
+        project_ids = [
+            name[len(SOURCE_PREFIX):] for name in vectordb_client.list_all_collection()
+            if name.startswith(SOURCE_PREFIX)
+        ]
+        print(f"{len(project_ids)} per-project collections")
+
+        for project_id in project_ids:
+            if args.drop_source:
+                vectordb_client.delete_collection(collection_name=nlp_controller.create_collection_name(project_id))
+                print(f"  {project_id}: dropped")
+                continue
+
+            copied = copy_project(nlp_controller, project_id, args.batch_size)
+            removed = remove_stale(nlp_controller, project_id, args.batch_size)
+            print(f"  {project_id}: {copied} copied, {removed} stale removed "
+                  f"-> {nlp_controller.create_shared_collection_name(project_id)}")
+    finally:
+        vectordb_client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
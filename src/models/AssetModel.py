@@ -0,0 +1,91 @@
+from .BaseDataModel import BaseDataModel
+from .enums.DataBaseEnum import DataBaseEnum
+from .db_schemes.asset import Asset
+from pymongo import ReturnDocument
+
+
+class AssetModel(BaseDataModel):
+    def __init__(self, db_client: object):
+        super().__init__(db_client=db_client)
+        self.collection = self.db_client[DataBaseEnum.COLLECTION_ASSET_NAME.value]
+
+    async def create_indexes(self):
+        """Create database indexes for the assets collection"""
+        indexes = Asset.get_indexes()
+        for index in indexes:
+            try:
+                await self.collection.create_index(
+                    index["key"],
+                    name=index["name"],
+                    unique=index.get("unique", False),
+                    background=True
+                )
+            except Exception as e:
+                print(f"Warning: Could not create index {index['name']}: {e}")
+
+    async def add_reference(self, project_id: str, file_id: str, sha256: str,
+                            asset_name: str, asset_size: int, content_type: str) -> Asset:
+        """Link a stored blob to a project, counting repeated uploads of the same content"""
+        record = await self.collection.find_one_and_update(
+            {"project_id": project_id, "file_id": file_id},
+            {
+                "$inc": {"ref_count": 1},
+                "$setOnInsert": {
+                    "sha256": sha256,
+                    "asset_name": asset_name,
+                    "asset_size": asset_size,
+                    "content_type": content_type,
+                    "chunk_config": None,
+                },
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return Asset(**record)
+
+    async def get_asset(self, project_id: str, file_id: str):
+        record = await self.collection.find_one({"project_id": project_id, "file_id": file_id})
+        if record is None:
+            return None
+        return Asset(**record)
+
+    async def find_chunked_asset(self, sha256: str, chunk_config: dict, exclude_project_id: str = None):
+        """Find a project that already holds a chunk set for this content and config"""
+        query = {"sha256": sha256, "chunk_config": chunk_config}
+        if exclude_project_id:
+            query["project_id"] = {"$ne": exclude_project_id}
+
+        record = await self.collection.find_one(query)
+        if record is None:
+            return None
+        return Asset(**record)
+
+    async def set_chunk_config(self, project_id: str, file_id: str, chunk_config: dict):
+        await self.collection.update_one(
+            {"project_id": project_id, "file_id": file_id},
+            {"$set": {"chunk_config": chunk_config}}
+        )
+
+    async def release_reference(self, project_id: str, file_id: str):
+        """
+        Drop one reference of a project to a blob.
+        Returns (refs left in the project, projects still holding the blob),
+        or None if the asset is unknown.
+        """
+        record = await self.collection.find_one_and_update(
+            {"project_id": project_id, "file_id": file_id, "ref_count": {"$gt": 0}},
+            {"$inc": {"ref_count": -1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if record is None:
+            return None
+
+        if record["ref_count"] == 0:
+            await self.collection.delete_one({"_id": record["_id"]})
+
+        projects_left = await self.count_blob_projects(record["sha256"])
+        return record["ref_count"], projects_left
+
+    async def count_blob_projects(self, sha256: str) -> int:
+        """Projects holding a reference to the blob"""
+        return await self.collection.count_documents({"sha256": sha256})
@@ -1,27 +1,70 @@
 from .BaseDataModel import BaseDataModel
 from .enums.DataBaseEnum import DataBaseEnum
+from .enums.CounterEnum import CounterEnum
 from .db_schemes.chunk import Chunk
+from .CounterModel import CounterModel, SequenceBlock
+from .LexicalStatsModel import LexicalStatsModel
+from .db_schemes.retrieved_document import RetrievedDocument
+from utils.text.lexical import tokenize, get_term_frequencies, bm25_idf, bm25_term_score
 from typing import List, Dict, Any
-from pymongo import ASCENDING
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+import asyncio
+import heapq
+import logging
+import time
+
+CHUNK_FIELDS = list(Chunk.model_fields)
+CHUNK_REQUIRED_FIELDS = {name for name, field in Chunk.model_fields.items() if field.is_required()}
+
+# Rough BSON size of a chunk document besides its content (keys, ids, metadata)
+CHUNK_DOCUMENT_OVERHEAD = 512
+
+# Lexical index fields of a chunk document: distinct terms (multikey indexed), term -> count, term count
+LEXICAL_FIELDS = ("terms", "term_freqs", "term_count")
+# Filter keys stored on the chunk document itself, other keys are looked up in its metadata
+CHUNK_FILTER_FIELDS = {"project_id", "filename", "file_id", "file_index", "chunk_id", "content_hash"}
 
 
 class ChunkModel(BaseDataModel):
-    def __init__(self, db_client: object):
+    def __init__(self, db_client: object, file_index_block_size: int = 1):
         super().__init__(db_client=db_client)
         self.collection = self.db_client[DataBaseEnum.COLLECTION_CHUNKS_NAME.value]
 
+        # file indexes come from a per-project counter, optionally reserved in blocks
+        self.counter_model = CounterModel(db_client=db_client)
+        self.file_index_block_size = file_index_block_size
+        self.file_index_blocks: Dict[str, SequenceBlock] = {}
+
+        self.lexical_stats_model = LexicalStatsModel(db_client=db_client)
+        self.lexical_enabled = self.app_settings.LEXICAL_INDEX_ENABLED
+
+    def get_file_index_counter(self, project_id: str) -> str:
+        return f"{CounterEnum.FILE_INDEX.value}:{project_id}"
+
     async def get_next_file_index(self, project_id: str) -> int:
         """Get the next file index for a project"""
-        # Find the highest file_index for this project
+        block = self.file_index_blocks.get(project_id)
+        if block is None:
+            block = SequenceBlock(
+                self.counter_model,
+                self.get_file_index_counter(project_id),
+                block_size=self.file_index_block_size
+            )
+            self.file_index_blocks[project_id] = block
+        return await block.next_value()
+
+    async def get_max_file_indexes(self) -> Dict[str, int]:
+        """Highest file index stored per project, used to seed the counters"""
         pipeline = [
-            {"$match": {"project_id": project_id}},
-            {"$group": {"_id": None, "max_file_index": {"$max": "$file_index"}}}
+            {"$group": {"_id": "$project_id", "max_file_index": {"$max": "$file_index"}}}
         ]
-        result = await self.collection.aggregate(pipeline).to_list(1)
-        
-        if result and result[0].get("max_file_index") is not None:
-            return result[0]["max_file_index"] + 1
-        return 0  # First file gets index 0
+        result = await self.collection.aggregate(pipeline).to_list(None)
+        return {
+            record["_id"]: record["max_file_index"]
+            for record in result
+            if record.get("max_file_index") is not None
+        }
 
     async def create_indexes(self):
         """Create database indexes for the chunks collection"""
@@ -36,8 +79,11 @@ class ChunkModel(BaseDataModel):
                 )
             except Exception as e:
                 print(f"Warning: Could not create index {index['name']}: {e}")
+        if self.lexical_enabled:
+            await self.lexical_stats_model.create_indexes()
 
-    async def insert_chunks(self, chunks: List[Dict[str, Any]], project_id: str = None):
+    async def insert_chunks(self, chunks: List[Dict[str, Any]], project_id: str = None,
+                            fast_validation: bool = False) -> int:
         if not chunks:
             return 0
         
@@ -48,9 +94,314 @@ class ChunkModel(BaseDataModel):
             for chunk in chunks:
                 chunk["file_index"] = file_index
         
-        # Validate and normalize via pydantic model
-        docs = [Chunk(**doc).model_dump() for doc in chunks]
-        result = await self.collection.insert_many(docs)
-        return len(result.inserted_ids)
+        inserted_count, _ = await self.bulk_insert_chunks(chunks, fast_validation=fast_validation)
+        return inserted_count
+
+    def to_document(self, chunk: Dict[str, Any], fast_validation: bool = False) -> Dict[str, Any]:
+        """
+        Chunk dict -> stored document. The fast mode, for chunks built by our own
+        chunker, only checks required fields instead of a full pydantic round-trip.
+        """
+        if not fast_validation:
+            doc = Chunk(**chunk).model_dump()
+        else:
+            missing = CHUNK_REQUIRED_FIELDS.difference(chunk)
+            if missing:
+                raise ValueError(f"Chunk is missing fields: {sorted(missing)}")
+            if not chunk["content"]:
+                raise ValueError("Chunk content is empty")
+            doc = {field: chunk.get(field) for field in CHUNK_FIELDS}
+
+        if self.lexical_enabled:
+            self.add_lexical_fields(doc, chunk)
+        # set once its vector is stored; chunks written before the flag count as indexed
+        doc["indexed"] = False
+        return doc
+
+    def add_lexical_fields(self, doc: Dict[str, Any], chunk: Dict[str, Any]):
+        # linked chunk sets carry the terms of their source, the content is the same
+        if all(field in chunk for field in LEXICAL_FIELDS):
+            doc.update({field: chunk[field] for field in LEXICAL_FIELDS})
+            return
+        term_freqs, term_count = get_term_frequencies(doc["content"])
+        doc.update(terms=list(term_freqs), term_freqs=term_freqs, term_count=term_count)
+
+    def iter_batches(self, chunks: List[Dict[str, Any]], fast_validation: bool,
+                     batch_size: int, batch_bytes: int):
+        """Yields (documents, approximate bytes, invalid chunk count), cut by count and size"""
+        batch, size, invalid = [], 0, 0
+        for chunk in chunks:
+            try:
+                doc = self.to_document(chunk, fast_validation=fast_validation)
+            except ValueError:
+                invalid += 1
+                continue
+
+            doc_bytes = len(doc["content"].encode("utf-8")) + CHUNK_DOCUMENT_OVERHEAD
+            if batch and (len(batch) >= batch_size or size + doc_bytes > batch_bytes):
+                yield batch, size, invalid
+                batch, size, invalid = [], 0, 0
+            batch.append(doc)
+            size += doc_bytes
+
+        if batch or invalid:
+            yield batch, size, invalid
+
+    async def bulk_insert_chunks(self, chunks: List[Dict[str, Any]], fast_validation: bool = False,
+                                 batch_size: int = None, batch_bytes: int = None, concurrency: int = None):
+        """
+        Insert chunks in unordered batches, several batches in flight at once.
+        Invalid chunks and rejected documents are counted and skipped, they never
+        stop the rest of the write. Returns (inserted count, per-batch stats).
+        """
+        batch_size = batch_size or self.app_settings.CHUNK_WRITE_BATCH_SIZE
+        batch_bytes = batch_bytes or self.app_settings.CHUNK_WRITE_BATCH_BYTES
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.app_settings.CHUNK_WRITE_CONCURRENCY))
+
+        async def write_batch(index: int, docs: list, size: int, invalid: int):
+            try:
+                start = time.perf_counter()
+                inserted, errors = len(docs), 0
+                written = docs
+                if docs:
+                    try:
+                        await self.collection.insert_many(docs, ordered=False)
+                    except BulkWriteError as e:
+                        inserted = e.details.get("nInserted", 0)
+                        errors = len(e.details.get("writeErrors", []))
+                        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                        written = [doc for i, doc in enumerate(docs) if i not in failed]
+                if self.lexical_enabled:
+                    await self.add_lexical_stats(written)
+                return {
+                    "batch": index,
+                    "documents": len(docs),
+                    "bytes": size,
+                    "inserted": inserted,
+                    "write_errors": errors,
+                    "invalid": invalid,
+                    "seconds": round(time.perf_counter() - start, 4),
+                }
+            finally:
+                semaphore.release()
+
+        # validating the next batch overlaps with the writes in flight
+        tasks = []
+        for index, (docs, size, invalid) in enumerate(
+                self.iter_batches(chunks, fast_validation, batch_size, batch_bytes)):
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(write_batch(index, docs, size, invalid)))
+
+        batch_stats = await asyncio.gather(*tasks)
+        return sum(stats["inserted"] for stats in batch_stats), list(batch_stats)
+
+    async def add_lexical_stats(self, docs: List[Dict[str, Any]]):
+        # the chunks are stored either way, rebuild the stats if they drift (migrations.lexical_index)
+        try:
+            await self.lexical_stats_model.add_chunks(docs)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Could not update lexical stats of {len(docs)} chunks: {e}")
+
+    async def delete_chunks(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Delete the matching chunks and take their terms out of the lexical stats.
+        Returns the deleted chunks (project_id, filename, file_id, content_hash),
+        so their vectors can be deleted by what was actually removed.
+        """
+        projection = {"project_id": 1, "filename": 1, "file_id": 1, "content_hash": 1}
+        if self.lexical_enabled:
+            projection.update(terms=1, term_count=1)
+        removed = await self.collection.find(query, projection).to_list(None)
+        if not removed:
+            return []
+
+        # by _id, a chunk written after the find is not deleted unseen
+        await self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in removed]}})
+        if self.lexical_enabled:
+            try:
+                await self.lexical_stats_model.remove_chunks(removed)
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Could not update lexical stats of {len(removed)} chunks: {e}")
+        return removed
+
+    async def count_file_chunks(self, project_id: str, file_id: str) -> int:
+        return await self.collection.count_documents({"project_id": project_id, "file_id": file_id})
+
+    async def get_linked_chunks(self, source_project_id: str, source_file_id: str,
+                                project_id: str, file_id: str, filename: str) -> List[Dict[str, Any]]:
+        """Existing chunk set of a blob, rewritten for another project so it needs no re-chunking"""
+        cursor = self.collection.find(
+            {"project_id": source_project_id, "file_id": source_file_id},
+            {"_id": 0, "file_index": 0}
+        ).sort("chunk_id", ASCENDING)
+        chunks = await cursor.to_list(length=None)
+
+        for chunk in chunks:
+            chunk["project_id"] = project_id
+            chunk["file_id"] = file_id
+            chunk["filename"] = filename
+            if chunk.get("metadata"):
+                chunk["metadata"]["project_id"] = project_id
+                chunk["metadata"]["filename"] = filename
+
+        return chunks
+
+    async def sync_file_chunks(self, chunks: List[Dict[str, Any]], project_id: str, filename: str,
+                               fast_validation: bool = False):
+        """
+        Make the stored chunk set of a file match `chunks`, diffing by content hash.
+        Only chunks with a new hash are inserted, kept chunks are moved to their new
+        position, chunks whose hash disappeared are deleted.
+        Returns (inserted chunk dicts, removed content hashes, moved chunk dicts).
+        """
+        cursor = self.collection.find(
+            {"project_id": project_id, "filename": filename},
+            {"content_hash": 1, "file_index": 1, "file_id": 1, "chunk_id": 1, "total_chunks": 1}
+        )
+        stored = {}
+        unhashed_ids = []
+        file_index = None
+        async for doc in cursor:
+            file_index = doc.get("file_index", file_index)
+            if doc.get("content_hash"):
+                stored[doc["content_hash"]] = doc
+            else:
+                unhashed_ids.append(doc["_id"])
+
+        new_hashes = {chunk["content_hash"] for chunk in chunks}
+        inserted = [chunk for chunk in chunks if chunk["content_hash"] not in stored]
+        removed = [content_hash for content_hash in stored if content_hash not in new_hashes]
+
+        # kept chunks only need writing when their position or blob changed
+        moves, moved = [], []
+        for chunk in chunks:
+            doc = stored.get(chunk["content_hash"])
+            if doc is None:
+                continue
+            if (doc.get("chunk_id"), doc.get("total_chunks"), doc.get("file_id")) != \
+                    (chunk["chunk_id"], chunk["total_chunks"], chunk.get("file_id")):
+                chunk["file_index"] = doc.get("file_index", file_index)
+                moved.append(chunk)
+                moves.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+                    "chunk_id": chunk["chunk_id"],
+                    "total_chunks": chunk["total_chunks"],
+                    "file_id": chunk.get("file_id"),
+                    "metadata": chunk.get("metadata"),
+                }}))
+        if moves:
+            await self.collection.bulk_write(moves, ordered=False)
+
+        # chunks stored before content hashing can't be matched, replace them
+        removed_ids = [stored[content_hash]["_id"] for content_hash in removed] + unhashed_ids
+        if removed_ids:
+            await self.delete_chunks({"_id": {"$in": removed_ids}})
+
+        if inserted:
+            # a new version of a file keeps the file_index of the previous one
+            if file_index is None:
+                await self.insert_chunks(inserted, project_id, fast_validation=fast_validation)
+            else:
+                for chunk in inserted:
+                    chunk["file_index"] = file_index
+                await self.insert_chunks(inserted, fast_validation=fast_validation)
+
+        return inserted, removed, moved
+
+    async def get_unindexed_chunks(self, project_id: str, file_id: str) -> List[Dict[str, Any]]:
+        """Chunks of the file whose vectors were never stored: new ones and ones a previous run failed to index"""
+        cursor = self.collection.find(
+            {"project_id": project_id, "file_id": file_id, "indexed": False},
+            {"_id": 0, "indexed": 0, **{field: 0 for field in LEXICAL_FIELDS}}
+        ).sort("chunk_id", ASCENDING)
+        return await cursor.to_list(length=None)
+
+    async def mark_indexed(self, project_id: str, filename: str, content_hashes: List[str]):
+        if not content_hashes:
+            return
+        await self.collection.update_many(
+            {"project_id": project_id, "filename": filename, "content_hash": {"$in": content_hashes}},
+            {"$set": {"indexed": True}}
+        )
+
+    async def get_file_chunks(self, project_id: str, file_id: str) -> List[Dict[str, Any]]:
+        cursor = self.collection.find(
+            {"project_id": project_id, "file_id": file_id},
+            {"_id": 0}
+        ).sort("chunk_id", ASCENDING)
+        return await cursor.to_list(length=None)
+
+    async def delete_file_chunks(self, project_id: str, file_id: str) -> List[Dict[str, Any]]:
+        """
+        Chunks still pointing at the file. A newer version of the file took over
+        the chunks it kept (sync_file_chunks), those stay.
+        """
+        return await self.delete_chunks({"project_id": project_id, "file_id": file_id})
+
+    def get_chunk_filter(self, project_id: str, metadata_filter: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Mongo query of a vector search metadata filter: every key must match, a list matches any item"""
+        query = {}
+        for key, value in (metadata_filter or {}).items():
+            field = key if key in CHUNK_FILTER_FIELDS else f"metadata.{key}"
+            query[field] = {"$in": value} if isinstance(value, list) else value
+        query["project_id"] = project_id
+        return query
+
+    def get_result_metadata(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        # the payload metadata NLPController stores with the vector of the chunk
+        return {
+            **(doc.get("metadata") or {}),
+            **{field: doc.get(field) for field in CHUNK_FILTER_FIELDS},
+        }
+
+    async def search_chunks(self, project_id: str, text: str, limit: int,
+                            metadata_filter: Dict[str, Any] = None) -> List[RetrievedDocument]:
+        """
+        Top chunks of a project by BM25 against `text`. Candidates are the chunks
+        holding the rarest query terms, up to LEXICAL_MAX_CANDIDATES: rare terms
+        decide the ranking, frequent ones only add to the candidates' scores.
+        """
+        query_terms = list(dict.fromkeys(tokenize(text)))
+        if not query_terms:
+            return []
+
+        chunks, length, dfs = await self.lexical_stats_model.get_stats(project_id, query_terms)
+        dfs = {term: df for term, df in dfs.items() if df > 0}
+        if chunks <= 0 or not dfs:
+            return []
+
+        max_candidates = self.app_settings.LEXICAL_MAX_CANDIDATES
+        candidate_terms, expected = [], 0
+        for term in sorted(dfs, key=dfs.get):
+            if candidate_terms and expected + dfs[term] > max_candidates:
+                break
+            candidate_terms.append(term)
+            expected += dfs[term]
+
+        projection = {
+            "_id": 0, "content": 1, "metadata": 1, "term_count": 1,
+            **{field: 1 for field in CHUNK_FILTER_FIELDS},
+            **{f"term_freqs.{term}": 1 for term in dfs},
+        }
+        docs = await self.collection.find(
+            {**self.get_chunk_filter(project_id, metadata_filter), "terms": {"$in": candidate_terms}},
+            projection
+        ).limit(max_candidates).to_list(None)
+
+        k1, b = self.app_settings.LEXICAL_BM25_K1, self.app_settings.LEXICAL_BM25_B
+        idfs = {term: bm25_idf(chunks, df) for term, df in dfs.items()}
+        average_length = max(length / chunks, 1.0)
+
+        def score(doc: Dict[str, Any]) -> float:
+            term_freqs = doc.get("term_freqs") or {}
+            return sum(
+                bm25_term_score(term_freqs[term], idf, doc.get("term_count", 0), average_length, k1, b)
+                for term, idf in idfs.items() if term in term_freqs
+            )
+
+        top = heapq.nlargest(limit, ((score(doc), i, doc) for i, doc in enumerate(docs)))
+        return [
+            RetrievedDocument(text=doc["content"], score=doc_score, metadata=self.get_result_metadata(doc))
+            for doc_score, _, doc in top
+        ]
 
 
@@ -0,0 +1,60 @@
+from .BaseDataModel import BaseDataModel
+from .enums.DataBaseEnum import DataBaseEnum
+from pymongo import ReturnDocument
+import asyncio
+
+
+class CounterModel(BaseDataModel):
+    """
+    Atomic sequences kept in the counters collection, one document per name:
+    {"_id": name, "seq": <number of values handed out>}.
+    """
+
+    def __init__(self, db_client: object):
+        super().__init__(db_client=db_client)
+        self.collection = self.db_client[DataBaseEnum.COLLECTION_COUNTER_NAME.value]
+
+    async def reserve(self, name: str, count: int = 1) -> int:
+        """Reserve `count` consecutive values in one round-trip, returns the first one"""
+        record = await self.collection.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return record["seq"] - count
+
+    async def next_value(self, name: str) -> int:
+        return await self.reserve(name, 1)
+
+    async def seed(self, name: str, seq: int):
+        """Move a sequence forward to at least `seq`, never backwards"""
+        await self.collection.update_one({"_id": name}, {"$max": {"seq": seq}}, upsert=True)
+
+    async def is_empty(self) -> bool:
+        return await self.collection.find_one({}, {"_id": 1}) is None
+
+
+class SequenceBlock:
+    """
+    Hands out values of one sequence from blocks reserved `block_size` at a time,
+    so a busy worker needs one round-trip per block instead of one per value.
+    Values left in a block when the worker stops are skipped, not reused.
+    """
+
+    def __init__(self, counter_model: CounterModel, name: str, block_size: int = 1):
+        self.counter_model = counter_model
+        self.name = name
+        self.block_size = max(1, block_size)
+        self.next = 0
+        self.end = 0
+        self.lock = asyncio.Lock()
+
+    async def next_value(self) -> int:
+        async with self.lock:
+            if self.next >= self.end:
+                self.next = await self.counter_model.reserve(self.name, self.block_size)
+                self.end = self.next + self.block_size
+            value = self.next
+            self.next += 1
+            return value
@@ -0,0 +1,159 @@
+from .BaseDataModel import BaseDataModel
+from .enums.DataBaseEnum import DataBaseEnum
+from .enums.JobEnum import JobStatusEnum
+from .db_schemes.job import Job
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument, ASCENDING
+from typing import Dict, Any
+import uuid
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobModel(BaseDataModel):
+    def __init__(self, db_client: object):
+        super().__init__(db_client=db_client)
+        self.collection = self.db_client[DataBaseEnum.COLLECTION_JOB_NAME.value]
+
+    async def create_indexes(self):
+        """Create database indexes for the jobs collection"""
+        indexes = Job.get_indexes()
+        for index in indexes:
+            try:
+                await self.collection.create_index(
+                    index["key"],
+                    name=index["name"],
+                    unique=index.get("unique", False),
+                    background=True
+                )
+            except Exception as e:
+                print(f"Warning: Could not create index {index['name']}: {e}")
+
+    async def create_job(self, job_type: str, project_id: str, params: Dict[str, Any]) -> Job:
+        now = utc_now()
+        job = Job(
+            job_id=uuid.uuid4().hex,
+            job_type=job_type,
+            project_id=project_id,
+            status=JobStatusEnum.QUEUED.value,
+            params=params,
+            created_at=now,
+            updated_at=now
+        )
+        await self.collection.insert_one(job.model_dump())
+        return job
+
+    async def get_job(self, job_id: str):
+        record = await self.collection.find_one({"job_id": job_id})
+        if record is None:
+            return None
+        return Job(**record)
+
+    async def count_queued_jobs(self) -> int:
+        return await self.collection.count_documents({"status": JobStatusEnum.QUEUED.value})
+
+    async def claim_next_job(self, worker_id: str, lease_seconds: int, max_attempts: int):
+        """
+        Atomically take the oldest queued job, or a running job whose worker
+        stopped renewing its lease (crashed or restarted).
+        """
+        now = utc_now()
+        record = await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": JobStatusEnum.QUEUED.value},
+                    {"status": JobStatusEnum.RUNNING.value, "lease_expires_at": {"$lt": now}},
+                ],
+                "attempts": {"$lt": max_attempts},
+            },
+            {
+                "$set": {
+                    "status": JobStatusEnum.RUNNING.value,
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if record is None:
+            return None
+        return Job(**record)
+
+    async def renew_lease(self, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+        now = utc_now()
+        result = await self.collection.update_one(
+            {"job_id": job_id, "worker_id": worker_id, "status": JobStatusEnum.RUNNING.value},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=lease_seconds), "updated_at": now}}
+        )
+        return result.matched_count == 1
+
+    async def update_progress(self, job_id: str, worker_id: str, stage: str,
+                              progress: float, timings: Dict[str, float]):
+        await self.collection.update_one(
+            {"job_id": job_id, "worker_id": worker_id, "status": JobStatusEnum.RUNNING.value},
+            {"$set": {"stage": stage, "progress": progress, "timings": timings, "updated_at": utc_now()}}
+        )
+
+    async def complete_job(self, job_id: str, worker_id: str, result: Dict[str, Any], timings: Dict[str, float]):
+        await self.collection.update_one(
+            {"job_id": job_id, "worker_id": worker_id},
+            {"$set": {
+                "status": JobStatusEnum.DONE.value,
+                "stage": None,
+                "progress": 1.0,
+                "result": result,
+                "timings": timings,
+                "lease_expires_at": None,
+                "updated_at": utc_now(),
+            }}
+        )
+
+    async def fail_job(self, job_id: str, worker_id: str, error: str, timings: Dict[str, float] = None):
+        update = {
+            "status": JobStatusEnum.FAILED.value,
+            "error": error,
+            "lease_expires_at": None,
+            "updated_at": utc_now(),
+        }
+        if timings is not None:
+            update["timings"] = timings
+        await self.collection.update_one({"job_id": job_id, "worker_id": worker_id}, {"$set": update})
+
+    async def requeue_job(self, job_id: str, worker_id: str):
+        """Hand a job back to the queue, e.g. when its worker shuts down mid-run"""
+        await self.collection.update_one(
+            {"job_id": job_id, "worker_id": worker_id, "status": JobStatusEnum.RUNNING.value},
+            {
+                "$set": {
+                    "status": JobStatusEnum.QUEUED.value,
+                    "stage": None,
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "updated_at": utc_now(),
+                },
+                "$inc": {"attempts": -1},
+            }
+        )
+
+    async def fail_abandoned_jobs(self, max_attempts: int) -> int:
+        """Fail jobs whose lease expired on their last allowed attempt"""
+        now = utc_now()
+        result = await self.collection.update_many(
+            {
+                "status": JobStatusEnum.RUNNING.value,
+                "lease_expires_at": {"$lt": now},
+                "attempts": {"$gte": max_attempts},
+            },
+            {"$set": {
+                "status": JobStatusEnum.FAILED.value,
+                "error": f"Worker lost after {max_attempts} attempts",
+                "lease_expires_at": None,
+                "updated_at": now,
+            }}
+        )
+        return result.modified_count
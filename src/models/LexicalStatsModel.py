@@ -0,0 +1,113 @@
+from .BaseDataModel import BaseDataModel
+from .enums.DataBaseEnum import DataBaseEnum
+from collections import Counter
+from typing import Dict, List, Any, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class LexicalStatsModel(BaseDataModel):
+    """
+    BM25 statistics of each project in the lexical_stats collection: one
+    document per term, {"project_id", "term", "df"}, and one with term None
+    holding {"chunks", "length"}: the chunk count and total term count.
+    The terms themselves are stored with the chunks, see ChunkModel.
+    """
+
+    def __init__(self, db_client: object):
+        super().__init__(db_client=db_client)
+        self.collection = self.db_client[DataBaseEnum.COLLECTION_LEXICAL_STATS_NAME.value]
+
+    async def create_indexes(self):
+        await self.collection.create_index(
+            [("project_id", 1), ("term", 1)],
+            name="project_term_1",
+            unique=True,
+            background=True
+        )
+
+    def get_updates(self, chunks: List[Dict[str, Any]], sign: int) -> List[UpdateOne]:
+        """One $inc per project and term of the chunks, however many chunks share it"""
+        dfs = Counter()
+        totals: Dict[str, Counter] = {}
+        for chunk in chunks:
+            if "term_count" not in chunk:
+                continue  # stored before the lexical index, not counted
+            project_id = chunk["project_id"]
+            dfs.update((project_id, term) for term in chunk["terms"])
+            totals.setdefault(project_id, Counter()).update(chunks=1, length=chunk["term_count"])
+
+        updates = [
+            UpdateOne({"project_id": project_id, "term": term}, {"$inc": {"df": sign * df}}, upsert=True)
+            for (project_id, term), df in dfs.items()
+        ]
+        updates.extend(
+            UpdateOne(
+                {"project_id": project_id, "term": None},
+                {"$inc": {"chunks": sign * total["chunks"], "length": sign * total["length"]}},
+                upsert=True
+            )
+            for project_id, total in totals.items()
+        )
+        return updates
+
+    async def apply(self, updates: List[UpdateOne]):
+        if not updates:
+            return
+        try:
+            await self.collection.bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            # two writers upserting the same new term: the loser's $inc is retried once
+            retry = [updates[error["index"]] for error in e.details.get("writeErrors", [])
+                     if error.get("code") == DUPLICATE_KEY_ERROR]
+            if len(retry) < len(e.details.get("writeErrors", [])):
+                raise
+            await self.collection.bulk_write(retry, ordered=False)
+
+    async def add_chunks(self, chunks: List[Dict[str, Any]]):
+        await self.apply(self.get_updates(chunks, 1))
+
+    async def remove_chunks(self, chunks: List[Dict[str, Any]]):
+        await self.apply(self.get_updates(chunks, -1))
+
+    async def get_stats(self, project_id: str, terms: List[str]) -> Tuple[int, int, Dict[str, int]]:
+        """(chunk count, total term count, term -> document frequency) of a project"""
+        cursor = self.collection.find(
+            {"project_id": project_id, "term": {"$in": [*terms, None]}},
+            {"_id": 0, "term": 1, "df": 1, "chunks": 1, "length": 1}
+        )
+        chunks, length, dfs = 0, 0, {}
+        async for record in cursor:
+            if record.get("term") is None:
+                chunks, length = record.get("chunks", 0), record.get("length", 0)
+            else:
+                dfs[record["term"]] = record.get("df", 0)
+        return chunks, length, dfs
+
+    async def rebuild(self, chunks_collection, project_id: str):
+        """Recount a project from its stored chunks, replacing counts that drifted"""
+        match = {"project_id": project_id, "term_count": {"$exists": True}}
+        totals = await chunks_collection.aggregate([
+            {"$match": match},
+            {"$group": {"_id": None, "chunks": {"$sum": 1}, "length": {"$sum": "$term_count"}}}
+        ]).to_list(None)
+        dfs = chunks_collection.aggregate([
+            {"$match": match},
+            {"$unwind": "$terms"},
+            {"$group": {"_id": "$terms", "df": {"$sum": 1}}}
+        ], allowDiskUse=True)
+
+        await self.collection.delete_many({"project_id": project_id})
+        batch = []
+        async for record in dfs:
+            batch.append({"project_id": project_id, "term": record["_id"], "df": record["df"]})
+            if len(batch) >= 10000:
+                await self.collection.insert_many(batch, ordered=False)
+                batch = []
+        if totals:
+            batch.append({"project_id": project_id, "term": None,
+                          "chunks": totals[0]["chunks"], "length": totals[0]["length"]})
+        if batch:
+            await self.collection.insert_many(batch, ordered=False)
@@ -1,23 +1,57 @@
 from .BaseDataModel import BaseDataModel
 from .enums.DataBaseEnum import DataBaseEnum
+from .enums.CounterEnum import CounterEnum
 from .db_schemes.project import Project
+from .CounterModel import CounterModel
+from pymongo import ASCENDING
+import base64
+import json
 import math
+import time
+
+# Only the fields the project listing returns
+PROJECT_LIST_PROJECTION={"_id":0,"project_id":1,"project_index":1}
+
+# Per-process cache of the estimated project count
+_project_count_cache={"count":0,"at":float("-inf")}
+
+
+def encode_page_token(project_index:int)->str:
+    """Opaque continuation token holding the last project_index of a page"""
+    payload=json.dumps({"after":project_index}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_page_token(page_token:str)->int:
+    try:
+        padded=page_token+"="*(-len(page_token)%4)
+        project_index=json.loads(base64.urlsafe_b64decode(padded))["after"]
+    except Exception:
+        raise ValueError("Invalid page token")
+    if not isinstance(project_index,int):
+        raise ValueError("Invalid page token")
+    return project_index
+
 class ProjectModel(BaseDataModel):
     def __init__(self,db_client:object):
         super().__init__(db_client=db_client)
         self.collection=self.db_client[DataBaseEnum.COLLECTION_PROJECT_NAME.value]
+        self.counter_model=CounterModel(db_client=db_client)
     
     async def get_next_project_index(self) -> int:
         """Get the next project index"""
-        # Find the highest project_index
+        return await self.counter_model.next_value(CounterEnum.PROJECT_INDEX.value)
+
+    async def get_max_project_index(self):
+        """Highest stored project index, used to seed the counter"""
         pipeline = [
             {"$group": {"_id": None, "max_project_index": {"$max": "$project_index"}}}
         ]
         result = await self.collection.aggregate(pipeline).to_list(1)
-        
+
         if result and result[0].get("max_project_index") is not None:
-            return result[0]["max_project_index"] + 1
-        return 0  # First project gets index 0
+            return result[0]["max_project_index"]
+        return None
     
     async def create_indexes(self):
         """Create database indexes for the projects collection"""
@@ -42,6 +76,12 @@ class ProjectModel(BaseDataModel):
         project=Project(project_id=project_id, project_index=project_index)
         await self.collection.insert_one(project.model_dump())
         return project
+    async def get_project(self,project_id:str):
+        record=await self.collection.find_one({"project_id":project_id})
+        if record is None:
+            return None
+        return Project(**record)
+
     async def get_project_or_create_one(self,project_id:str):
         record=await self.collection.find_one(
             {"project_id":project_id})
@@ -52,18 +92,43 @@ class ProjectModel(BaseDataModel):
             return record
     
     async def get_all_project(self,page:int=1,page_size:int=10):
-        # count total number of documents 
-        total_documents=await self.collection.count_documents({})
+        """Offset pagination, kept for clients still sending ?page=; prefer get_projects_page"""
+        total_documents=await self.get_project_count()
         # calculate total pages
         total_pages=math.ceil(total_documents/page_size)
 
-        cursor=self.collection.find().skip((page-1)*page_size).limit(page_size)
+        cursor=self.collection.find({},PROJECT_LIST_PROJECTION).sort("project_index",ASCENDING) \
+            .skip((page-1)*page_size).limit(page_size)
         projects=[]
         async for document in cursor:
             projects.append(Project(**document))
         return projects,total_pages
-        
 
+    async def get_projects_page(self,page_token:str=None,page_size:int=10):
+        """
+        Keyset pagination on project_index: every page is one index range scan,
+        however deep it is. Returns (projects, next_page_token); the token is None
+        on the last page.
+        """
+        query={}
+        if page_token:
+            query["project_index"]={"$gt":decode_page_token(page_token)}
+
+        # one extra document tells whether another page follows
+        cursor=self.collection.find(query,PROJECT_LIST_PROJECTION) \
+            .sort("project_index",ASCENDING).limit(page_size+1)
+        projects=[Project(**document) async for document in cursor]
 
+        next_page_token=None
+        if len(projects)>page_size:
+            projects=projects[:page_size]
+            next_page_token=encode_page_token(projects[-1].project_index)
+        return projects,next_page_token
 
-    
\ No newline at end of file
+    async def get_project_count(self)->int:
+        """Estimated from collection metadata and cached briefly, never a collection scan"""
+        now=time.monotonic()
+        if now-_project_count_cache["at"]>self.app_settings.PROJECT_COUNT_CACHE_SECONDS:
+            _project_count_cache["count"]=await self.collection.estimated_document_count()
+            _project_count_cache["at"]=now
+        return _project_count_cache["count"]
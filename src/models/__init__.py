@@ -0,0 +1,2 @@
+from .enums.ProcessingEnum import ProcessingEnum
+from .enums.JobEnum import JobStatusEnum, JobTypeEnum, JobStageEnum
@@ -1 +1,4 @@
 from .project import Project
+from .asset import Asset
+from .job import Job
+from .retrieved_document import RetrievedDocument
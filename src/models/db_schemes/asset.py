@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from bson.objectid import ObjectId
+
+
+class Asset(BaseModel):
+    _id: Optional[ObjectId]
+    project_id: str = Field(..., min_length=1)
+    file_id: str = Field(..., min_length=1)  # sha256 of the content + original extension
+    sha256: str = Field(..., min_length=64, max_length=64)
+    asset_name: str = Field(..., min_length=1)  # original upload filename
+    asset_size: int = Field(..., ge=0)
+    content_type: str
+    ref_count: int = Field(default=1, ge=0)  # uploads of this content into the project
+    chunk_config: Optional[Dict[str, Any]] = None  # chunking params of the stored chunk set
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @classmethod
+    def get_indexes(cls):
+        return [
+            {
+                "key": [("project_id", 1), ("file_id", 1)],
+                "name": "project_file_id_1",
+                "unique": True,
+            },
+            {
+                "key": [("sha256", 1)],
+                "name": "sha256_1",
+                "unique": False,
+            }
+        ]
@@ -13,6 +13,8 @@ class Chunk(BaseModel):
     chunk_size: int = Field(..., ge=1)
     content: str = Field(..., min_length=1)
     metadata: Optional[Dict[str, Any]] = None
+    file_id: Optional[str] = None  # content-addressed id of the source blob
+    content_hash: Optional[str] = None  # sha256 of content, ":n" suffix on the n-th repeat in a file
 
     class Config:
         arbitrary_types_allowed = True
@@ -34,6 +36,22 @@ class Chunk(BaseModel):
                 "key": [("file_index", 1)],
                 "name": "file_index_1",
                 "unique": False,
+            },
+            {
+                "key": [("project_id", 1), ("filename", 1), ("content_hash", 1)],
+                "name": "project_filename_content_hash_1",
+                "unique": False,
+            },
+            {
+                "key": [("file_id", 1), ("project_id", 1)],
+                "name": "file_id_project_1",
+                "unique": False,
+            },
+            {
+                # inverted index of the lexical search: one key per distinct term of a chunk
+                "key": [("project_id", 1), ("terms", 1)],
+                "name": "project_terms_1",
+                "unique": False,
             }
         ]
 
@@ -0,0 +1,46 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+from bson.objectid import ObjectId
+
+
+class Job(BaseModel):
+    _id: Optional[ObjectId]
+    job_id: str = Field(..., min_length=1)
+    job_type: str
+    project_id: str = Field(..., min_length=1)
+    status: str
+    stage: Optional[str] = None  # pipeline stage currently running
+    progress: float = Field(default=0.0, ge=0.0, le=1.0)
+    params: Dict[str, Any] = Field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    timings: Dict[str, float] = Field(default_factory=dict)  # seconds per stage
+    error: Optional[str] = None
+    attempts: int = Field(default=0, ge=0)
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None  # a running job past its lease is reclaimed
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @classmethod
+    def get_indexes(cls):
+        return [
+            {
+                "key": [("job_id", 1)],
+                "name": "job_id_1",
+                "unique": True,
+            },
+            {
+                "key": [("status", 1), ("created_at", 1)],
+                "name": "status_created_at_1",
+                "unique": False,
+            },
+            {
+                "key": [("status", 1), ("lease_expires_at", 1)],
+                "name": "status_lease_expires_at_1",
+                "unique": False,
+            }
+        ]
@@ -27,6 +27,12 @@ class Project(BaseModel):
                 "key": [("project_index",1)],
                 "name": "project_index_1",
                 "unique": True,
+            },
+            {
+                # covers the project listing: no document fetch per listed project
+                "key": [("project_index",1),("project_id",1)],
+                "name": "project_index_project_id_1",
+                "unique": False,
             }
         ]
     
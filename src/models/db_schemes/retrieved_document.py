@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+
+
+class RetrievedDocument(BaseModel):
+    text: str
+    score: float
+    metadata: Optional[Dict[str, Any]] = None
@@ -0,0 +1,5 @@
+from enum import Enum
+
+class CounterEnum(Enum):
+    PROJECT_INDEX="project_index"
+    FILE_INDEX="file_index"  # one sequence per project: "file_index:<project_id>"
@@ -3,4 +3,8 @@ from enum import Enum
 class DataBaseEnum(Enum):
     COLLECTION_PROJECT_NAME="projects"
     COLLECTION_CHUNKS_NAME="chunks"
-    
\ No newline at end of file
+    COLLECTION_ASSET_NAME="assets"
+    COLLECTION_JOB_NAME="jobs"
+    COLLECTION_COUNTER_NAME="counters"
+    COLLECTION_LEXICAL_STATS_NAME="lexical_stats"
+    
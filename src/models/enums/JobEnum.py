@@ -0,0 +1,18 @@
+from enum import Enum
+
+class JobStatusEnum(Enum):
+    QUEUED="queued"
+    RUNNING="running"
+    DONE="done"
+    FAILED="failed"
+
+class JobTypeEnum(Enum):
+    INGEST="ingest"
+    BULK_INGEST="bulk_ingest"
+
+class JobStageEnum(Enum):
+    PARSE="parse"  # extract and chunk, in the process pool
+    STORE="store"
+    EMBED="embed"
+    UPSERT="upsert"
+    PIPELINE="pipeline"  # bulk jobs run all stages overlapped
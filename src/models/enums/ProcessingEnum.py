@@ -0,0 +1,5 @@
+from enum import Enum
+
+class ProcessingEnum(Enum):
+    TXT=".txt"
+    PDF=".pdf"
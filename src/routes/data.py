@@ -1,69 +1,171 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Depends, Form
 from helpers.config import get_settings
 from helpers.logger import logger
-import uuid
+from helpers.job_queue import QueueFullError
+import asyncio
 import os
 from models.ProjectModel import ProjectModel
 from models.ChunkModel import ChunkModel
-from utils.files.chunck import FileChunker
+from models.AssetModel import AssetModel
+from utils.files.chunck import FileChunker, CHUNK_UNIT_CHAR
+from utils.files.file_types import ARCHIVE_CONTENT_TYPES
 from fastapi import FastAPI
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, List
+from controllers import DataController
+from controllers.DataController import UploadedFile
+from controllers.NLPController import NLPController
+from models.enums.JobEnum import JobTypeEnum
+from enums.ResponseEnum import ResponseEnum
 
 data_router = APIRouter(prefix="/api/data", tags=["data"])
 settings = get_settings()
 
+# Suggested wait for clients refused by a full job queue
+JOB_RETRY_AFTER_SECONDS = 5
+
+UPLOAD_ERROR_MESSAGES = {
+    ResponseEnum.FILE_TYPE_NOT_SUPPORTED: "File type not supported",
+    ResponseEnum.FILE_SIZE_EXCEEDED: "File too large",
+    ResponseEnum.FILE_EMPTY: "File is empty",
+}
+
 class ProcessChunkRequest(BaseModel):
     filename: str
     chunk_size: Optional[int] = 1000
     chunk_overlap: Optional[int] = 200
+    chunk_unit: Optional[str] = CHUNK_UNIT_CHAR  # "char" or "token"
 
 class FileUploadResponse(BaseModel):
     message: str
     filename: str
     project_id: str
     file_path: str
+    is_duplicate: bool = False
 
-class ChunkProcessResponse(BaseModel):
+class JobQueuedResponse(BaseModel):
     message: str
-    chunks_created: int
+    job_id: str
+    status: str
     project_id: str
     filename: str
 
+class BulkJobQueuedResponse(BaseModel):
+    message: str
+    job_id: str
+    status: str
+    project_id: str
+    files: int
+    rejected: Dict[str, str] = {}
+
+def validate_chunk_params(chunk_size: int, chunk_overlap: int, chunk_unit: str):
+    # Validate chunking params before a job is queued
+    try:
+        FileChunker(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_unit=chunk_unit
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+async def enqueue_job(request: Request, job_type: str, project_id: str, params: dict):
+    job_queue = getattr(request.app, "job_queue", None)
+    if job_queue is None:
+        raise HTTPException(503, "Job queue is not available")
+
+    try:
+        return await job_queue.enqueue(job_type=job_type, project_id=project_id, params=params)
+    except QueueFullError as e:
+        logger.warning(f"{job_type} job refused for project {project_id}: {e}")
+        raise HTTPException(429, str(e), headers={"Retry-After": str(JOB_RETRY_AFTER_SECONDS)})
+
+async def enqueue_ingest_job(request: Request, project_id: str, file_id: str,
+                             chunk_size: int, chunk_overlap: int, chunk_unit: str = CHUNK_UNIT_CHAR):
+    """Queue parse -> chunk -> embed -> upsert of a stored file, returns the job"""
+    validate_chunk_params(chunk_size, chunk_overlap, chunk_unit)
+
+    return await enqueue_job(
+        request=request,
+        job_type=JobTypeEnum.INGEST.value,
+        project_id=project_id,
+        params={
+            "file_id": file_id,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "chunk_unit": chunk_unit
+        }
+    )
+
+async def store_referenced_blob(request: Request, data_controller: DataController, uploaded: UploadedFile, project_id: str,
+                                file_id: str, filename: str):
+    """Record the project's reference, then store the blob: a concurrent release can't remove it in between"""
+    asset_model = AssetModel(db_client=request.app.mongodb_client)
+    await asset_model.add_reference(
+        project_id=project_id,
+        file_id=file_id,
+        sha256=uploaded.sha256,
+        asset_name=filename,
+        asset_size=uploaded.size,
+        content_type=uploaded.content_type
+    )
+    try:
+        return data_controller.store_blob(uploaded)
+    except Exception:
+        await asset_model.release_reference(project_id, file_id)
+        data_controller.remove_temp_file(uploaded.temp_path)
+        raise
+
+
+async def release_blob(asset_model: AssetModel, sha256: str) -> bool:
+    """Remove a blob no project holds any more, unless an upload referenced it meanwhile"""
+    data_controller = DataController()
+    detached_path = data_controller.detach_blob(sha256)
+    if detached_path is None:
+        return False
+    # counted after the blob left the store, see DataController.detach_blob
+    if await asset_model.count_blob_projects(sha256):
+        data_controller.restore_blob(sha256, detached_path)
+        return False
+    data_controller.remove_temp_file(detached_path)
+    return True
+
+
 @data_router.post("/uploadfile", response_model=FileUploadResponse)
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...), 
     project_id: str = Form(...)
 ):
     """Upload file with project ID association"""
     try:
-        # Validate file type
-        if file.content_type not in settings.FILE_ALLOWED_TYPES:
-            logger.error(f"Invalid file type: {file.filename} - {file.content_type}")
-            raise HTTPException(400, "File type not supported")
-        
-        # Validate file size
-        content = await file.read()
-        if len(content) > settings.MAX_FILE_SIZE * 1048576:
-            logger.error(f"File too large: {file.filename} - {len(content)} bytes")
-            raise HTTPException(400, "File too large")
-        
-        # Generate random filename with project prefix
-        random_name = f"{project_id}_{uuid.uuid4().hex}{os.path.splitext(file.filename)[1]}"
-        file_location = f"uploads/{random_name}"
-        
-        # Save file
-        os.makedirs("uploads", exist_ok=True)
-        with open(file_location, "wb") as f:
-            f.write(content)
-        
-        logger.info(f"Upload success: {file.filename} -> {random_name} for project {project_id}")
+        data_controller = DataController()
+
+        # Validate declared file type and size
+        is_valid, signal = await data_controller.validate_upload(file)
+        if not is_valid:
+            logger.error(f"Upload rejected: {file.filename} - {file.content_type} - {signal.value}")
+            raise HTTPException(400, UPLOAD_ERROR_MESSAGES.get(signal, "Upload failed"))
+
+        # Stream the body to a temp file, enforcing the real size and type
+        uploaded, signal = await data_controller.stream_upload(file, temp_dir=data_controller.temp_dir)
+        if uploaded is None:
+            logger.error(f"Upload rejected: {file.filename} - {signal.value}")
+            raise HTTPException(400, UPLOAD_ERROR_MESSAGES.get(signal, "Upload failed"))
+
+        # Keep one copy per content, identical uploads reuse the stored blob
+        file_id = data_controller.get_file_id(uploaded, file.filename)
+        blob_path, is_duplicate = await store_referenced_blob(request, data_controller, uploaded, project_id,
+                                                              file_id, file.filename)
+
+        logger.info(f"Upload success: {file.filename} -> {file_id} for project {project_id} (duplicate={is_duplicate})")
         
         return FileUploadResponse(
             message="File uploaded successfully",
-            filename=random_name,
+            filename=file_id,
             project_id=project_id,
-            file_path=file_location
+            file_path=blob_path,
+            is_duplicate=is_duplicate
         )
         
     except HTTPException:
@@ -73,43 +175,32 @@ async def upload_file(
         raise HTTPException(500, "Upload failed")
 
 
-@data_router.post("/process-chunks/{project_id}", response_model=ChunkProcessResponse)
+@data_router.post("/process-chunks/{project_id}", response_model=JobQueuedResponse, status_code=202)
 async def process_chunks(project_id: str, request: Request, chunk_request: ProcessChunkRequest):
-    """Process uploaded file into chunks and store in database"""
+    """Queue an uploaded file for chunking, poll /api/jobs/{job_id} for the result"""
     try:
-        # Check if file exists
-        file_path = f"uploads/{chunk_request.filename}"
-        if not os.path.exists(file_path):
+        # blobs are shared between projects: only a file this project uploaded can be ingested into it
+        asset = await AssetModel(db_client=request.app.mongodb_client).get_asset(project_id, chunk_request.filename)
+        data_controller = DataController()
+        file_path = data_controller.resolve_file_path(chunk_request.filename)
+        if asset is None or not os.path.exists(file_path):
             raise HTTPException(404, f"File not found: {chunk_request.filename}")
-        
-        # Read file content
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
-        
-        if not text.strip():
-            raise HTTPException(400, "File is empty or contains no readable text")
-        
-        # Chunk the text
-        chunker = FileChunker(
-            chunk_size=chunk_request.chunk_size, 
-            chunk_overlap=chunk_request.chunk_overlap
+
+        job = await enqueue_ingest_job(
+            request=request,
+            project_id=project_id,
+            file_id=chunk_request.filename,
+            chunk_size=chunk_request.chunk_size,
+            chunk_overlap=chunk_request.chunk_overlap,
+            chunk_unit=chunk_request.chunk_unit
         )
-        metadata = {
-            "project_id": project_id, 
-            "filename": chunk_request.filename
-        }
-        chunk_dicts = chunker.chunk_text(text=text, metadata=metadata)
 
-        # Save to MongoDB using app client
-        mongodb_client = request.app.mongodb_client
-        chunk_model = ChunkModel(db_client=mongodb_client)
-        inserted_count = await chunk_model.insert_chunks(chunk_dicts, project_id)
+        logger.info(f"Queued ingest job {job.job_id} for file {chunk_request.filename} in project {project_id}")
 
-        logger.info(f"Processed {inserted_count} chunks for file {chunk_request.filename} in project {project_id}")
-        
-        return ChunkProcessResponse(
-            message="Chunks processed and stored successfully",
-            chunks_created=inserted_count,
+        return JobQueuedResponse(
+            message="Chunk processing queued",
+            job_id=job.job_id,
+            status=job.status,
             project_id=project_id,
             filename=chunk_request.filename
         )
@@ -120,36 +211,165 @@ async def process_chunks(project_id: str, request: Request, chunk_request: Proce
         logger.error(f"Chunk processing failed: {chunk_request.filename} - {str(e)}", exc_info=True)
         raise HTTPException(500, f"Chunk processing failed: {str(e)}")
 
-@data_router.post("/upload-and-chunk")
+@data_router.post("/upload-and-chunk", response_model=JobQueuedResponse, status_code=202)
 async def upload_and_chunk(request: Request, file: UploadFile = File(...), project_id: str = Form("default")):
-    """Legacy endpoint - upload and chunk in one step"""
+    """Legacy endpoint - upload and queue chunking in one step"""
     try:
-        # Validate file type
-        if file.content_type not in settings.FILE_ALLOWED_TYPES:
-            logger.error(f"Invalid file type: {file.filename} - {file.content_type}")
-            raise HTTPException(400, "File type not supported")
+        data_controller = DataController()
 
-        # Read content in memory (bounded by MAX_FILE_SIZE)
-        content = await file.read()
-        if len(content) > settings.MAX_FILE_SIZE * 1048576:
-            logger.error(f"File too large: {file.filename} - {len(content)} bytes")
-            raise HTTPException(400, "File too large")
+        # Validate declared file type and size
+        is_valid, signal = await data_controller.validate_upload(file)
+        if not is_valid:
+            logger.error(f"Upload rejected: {file.filename} - {file.content_type} - {signal.value}")
+            raise HTTPException(400, UPLOAD_ERROR_MESSAGES.get(signal, "Upload failed"))
 
-        text = content.decode("utf-8", errors="ignore")
+        # Stream to a temp file instead of holding the whole body in memory
+        uploaded, signal = await data_controller.stream_upload(file, temp_dir=data_controller.temp_dir)
+        if uploaded is None:
+            logger.error(f"Upload rejected: {file.filename} - {signal.value}")
+            raise HTTPException(400, UPLOAD_ERROR_MESSAGES.get(signal, "Upload failed"))
 
-        # Chunk the text
-        chunker = FileChunker(chunk_size=1000, chunk_overlap=200)
-        metadata = {"project_id": project_id, "filename": file.filename}
-        chunk_dicts = chunker.chunk_text(text=text, metadata=metadata)
+        file_id = data_controller.get_file_id(uploaded, file.filename)
+        await store_referenced_blob(request, data_controller, uploaded, project_id, file_id, file.filename)
 
-        # Save to MongoDB using app client
-        mongodb_client = request.app.mongodb_client
-        chunk_model = ChunkModel(db_client=mongodb_client)
-        inserted_count = await chunk_model.insert_chunks(chunk_dicts, project_id)
+        job = await enqueue_ingest_job(
+            request=request,
+            project_id=project_id,
+            file_id=file_id,
+            chunk_size=1000,
+            chunk_overlap=200
+        )
 
-        return {"message": "Chunks stored", "chunks": inserted_count}
+        return JobQueuedResponse(
+            message="Chunk processing queued",
+            job_id=job.job_id,
+            status=job.status,
+            project_id=project_id,
+            filename=file_id
+        )
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Upload-and-chunk failed: {file.filename} - {str(e)}", exc_info=True)
-        raise HTTPException(500, "Upload and chunk failed")
\ No newline at end of file
+        raise HTTPException(500, "Upload and chunk failed")
+
+@data_router.post("/bulk-upload/{project_id}", response_model=BulkJobQueuedResponse, status_code=202)
+async def bulk_upload(
+    project_id: str,
+    request: Request,
+    files: List[UploadFile] = File(...),
+    chunk_size: int = Form(1000),
+    chunk_overlap: int = Form(200),
+    chunk_unit: str = Form(CHUNK_UNIT_CHAR)
+):
+    """Upload many files or zip/tar archives and queue them as one ingestion job"""
+    staged = []
+    try:
+        validate_chunk_params(chunk_size, chunk_overlap, chunk_unit)
+
+        data_controller = DataController()
+        rejected = {}
+
+        # Stage every upload on disk, archives are expanded by the job
+        for file in files:
+            uploaded, signal = await data_controller.stream_upload(
+                file,
+                temp_dir=data_controller.temp_dir,
+                max_size=settings.BULK_MAX_UPLOAD_SIZE * data_controller.size_scale,
+                allowed_types=settings.FILE_ALLOWED_TYPES + ARCHIVE_CONTENT_TYPES
+            )
+            if uploaded is None:
+                logger.error(f"Bulk upload rejected: {file.filename} - {signal.value}")
+                rejected[file.filename] = UPLOAD_ERROR_MESSAGES.get(signal, "Upload failed")
+                continue
+
+            staged.append({
+                "path": uploaded.temp_path,
+                "filename": file.filename,
+                "sha256": uploaded.sha256,
+                "size": uploaded.size,
+                "content_type": uploaded.content_type
+            })
+
+        if not staged:
+            raise HTTPException(400, "No valid files in the upload")
+
+        job = await enqueue_job(
+            request=request,
+            job_type=JobTypeEnum.BULK_INGEST.value,
+            project_id=project_id,
+            params={
+                "sources": staged,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "chunk_unit": chunk_unit
+            }
+        )
+
+        logger.info(f"Queued bulk job {job.job_id} with {len(staged)} uploads for project {project_id}")
+
+        return BulkJobQueuedResponse(
+            message="Bulk ingestion queued",
+            job_id=job.job_id,
+            status=job.status,
+            project_id=project_id,
+            files=len(staged),
+            rejected=rejected
+        )
+
+    except HTTPException:
+        for source in staged:
+            DataController().remove_temp_file(source["path"])
+        raise
+    except Exception as e:
+        for source in staged:
+            DataController().remove_temp_file(source["path"])
+        logger.error(f"Bulk upload failed for project {project_id}: {str(e)}", exc_info=True)
+        raise HTTPException(500, "Bulk upload failed")
+
+@data_router.delete("/asset/{project_id}/{file_id}")
+async def delete_asset(request: Request, project_id: str, file_id: str):
+    """Drop one reference of a project to an uploaded file"""
+    try:
+        mongodb_client = request.app.mongodb_client
+        asset_model = AssetModel(db_client=mongodb_client)
+
+        asset = await asset_model.get_asset(project_id, file_id)
+        refs = await asset_model.release_reference(project_id, file_id)
+        if asset is None or refs is None:
+            raise HTTPException(404, f"File not found: {file_id}")
+
+        project_refs, projects_left = refs
+        deleted_chunks = 0
+        if project_refs == 0:
+            chunk_model = ChunkModel(db_client=mongodb_client)
+            removed_chunks = await chunk_model.delete_file_chunks(project_id, file_id)
+            deleted_chunks = len(removed_chunks)
+
+            vectordb_client = getattr(request.app, "vectordb_client", None)
+            project = await ProjectModel(db_client=mongodb_client).get_project(project_id)
+            if vectordb_client is not None and project is not None and removed_chunks:
+                nlp_controller = NLPController(
+                    vectordb_client=vectordb_client,
+                    generation_client=None,
+                    embedding_client=None
+                )
+                # not by file_id: chunks a newer version kept still carry it in their payloads
+                await asyncio.to_thread(nlp_controller.delete_removed_chunk_vectors, project, removed_chunks)
+
+        # The blob goes away with the last project holding it
+        if projects_left == 0:
+            await release_blob(asset_model, asset.sha256)
+
+        logger.info(f"Released {file_id} for project {project_id} ({project_refs} refs left, {projects_left} projects hold the blob)")
+
+        return {
+            "message": "File reference released",
+            "ref_count": project_refs,
+            "chunks_deleted": deleted_chunks
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Delete asset failed: {file_id} - {str(e)}", exc_info=True)
+        raise HTTPException(500, "Delete asset failed")
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from datetime import datetime
+from models.JobModel import JobModel
+from helpers.logger import logger
+
+job_router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    job_type: str
+    project_id: str
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    timings: Dict[str, float]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+
+@job_router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(request: Request, job_id: str):
+    """Get status, progress and per-stage timings of a queued job"""
+    try:
+        job_model = JobModel(db_client=request.app.mongodb_client)
+        job = await job_model.get_job(job_id)
+        if job is None:
+            raise HTTPException(404, f"Job not found: {job_id}")
+
+        return JobStatusResponse(**job.model_dump())
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get job {job_id}: {str(e)}", exc_info=True)
+        raise HTTPException(500, f"Failed to get job: {str(e)}")
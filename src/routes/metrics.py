@@ -1,5 +1,4 @@
-from crypt import methods
-from promrtheus_client import Counter,Histogram,generate_latest,CONTENT_TYPE_LATEST
+from prometheus_client import Counter,Histogram,generate_latest,CONTENT_TYPE_LATEST
 from fastapi import FastAPI,Request,Response, responses
 from starlette.middleware.base import BaseHTTPMiddleware
 import time
@@ -8,11 +7,17 @@ REQUEST_COUNT=Counter("http_requests_total","Total HTTP Requests",['method','end
 
 REQUEST_LATENCY=Histogram('http_request_duration_seconds','HTTP Request Latency',['method','endpoint'])
 
+SEARCH_LEG_LATENCY=Histogram('search_leg_duration_seconds','Search Latency per Leg (dense, lexical, fusion)',['leg'])
+
+def observe_search_timings(timings:dict):
+    for leg,seconds in timings.items():
+        SEARCH_LEG_LATENCY.labels(leg=leg).observe(seconds)
+
 class PrometheusMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         start_time=time.time()
 
-        response=await call_next(requests)
+        response=await call_next(request)
 
         duration=time.time()-start_time
         endpoint=request.url.path
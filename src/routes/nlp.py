@@ -1,82 +1,96 @@
-from fastapi import APIRouter, Response, UploadFile, File, HTTPException, Request, Depends, Form, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request
 from helpers.config import get_settings
 from helpers.logger import logger
-import uuid
-import os
-from models.ProjectModel import ProjectModel
 from models.ChunkModel import ChunkModel
-from utils.files import chunck
-from utils.files.chunck import FileChunker
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import Optional
-from controllers import NLPController
-from enums import ResponseEnum
-
-nlp_router=APIRouter(
-    prefix="/api/v1/nlp",
-    tags=["api_v1","nlp"]
-)
-
-@nlp_router.post("/index/push/{project_id}")
-async def index_project(request:Request,project_id:str,push_request:PushRequest):
-
-    project_model=await ProjectModel.create_instance(
-        db_client=request.app.db_client
-    )
-    chunk_model=await ProjectModel.create_project(
+from models.ProjectModel import ProjectModel
+from controllers.NLPController import NLPController
+from routes.metrics import observe_search_timings
+from routes.schemes.nlp import SearchRequest, BatchSearchRequest, BatchSearchResponse, QueryResults, FusionWeights
 
-    )
+nlp_router = APIRouter(prefix="/api/nlp", tags=["nlp"])
 
-    project=project_model.get_project_or_create_one(
-        project_id=project_id
-    )
 
-    if not project:
-        return JSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={
-                "signal":ResponseEnum.PROJECT_NOT_FOUND_ERROR.value
-                
-            }
-        )
-    nlp_controller=NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client
-    )
+async def get_search_controller(request: Request, project_id: str):
+    vectordb_client = getattr(request.app, "vectordb_client", None)
+    embedding_client = getattr(request.app, "embedding_client", None)
+    if vectordb_client is None or embedding_client is None:
+        raise HTTPException(503, "Vector search is not configured")
 
-@nlp_router.post(f"/index/answer/{project_id}")
-async def answer_rag(request:Request,project_id:str):
-    project_model=await ProjectModel.create_instance(
-        db_client=request.app.db_client
+    project = await ProjectModel(db_client=request.app.mongodb_client).get_project(project_id)
+    if project is None:
+        raise HTTPException(404, f"Project not found: {project_id}")
 
+    nlp_controller = NLPController(
+        vectordb_client=vectordb_client,
+        generation_client=None,
+        embedding_client=embedding_client,
+        chunk_model=ChunkModel(db_client=request.app.mongodb_client)
     )
-    project=await project_model.get_project_or_create_one(
-        project_id=project_id
-    )
-    nlp_controller=NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        templete_parser=request.app.templete_parser,
-    )
-    answer,full_prompt,chat_history=nlp_controller.answer_rag_question(
+    return nlp_controller, project
+
+
+async def search_hybrid(nlp_controller: NLPController, project, texts, limit: int, metadata_filter: dict,
+                        fusion: FusionWeights = None):
+    fusion = fusion or FusionWeights()
+    if fusion.dense == 0 and fusion.lexical == 0:
+        raise HTTPException(400, "At least one of the dense and lexical fusion weights must be positive")
+
+    results, timings = await nlp_controller.search_hybrid_many(
         project=project,
-        query=SearchRequest.text,
-        limit=SearchRequest.limit,
+        texts=texts,
+        limit=limit,
+        metadata_filter=metadata_filter,
+        dense_weight=fusion.dense,
+        lexical_weight=fusion.lexical,
+        rrf_k=fusion.rrf_k
     )
+    observe_search_timings(timings)
+    return results, timings
 
-    if not answer:
-        return JSONResponse(
-            
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={
-            "signal":ResponseEnum.ERROR.value,
-            }
 
+@nlp_router.post("/index/search/{project_id}", response_model=QueryResults)
+async def search_index(request: Request, project_id: str, search_request: SearchRequest):
+    """Chunks closest to one query, vector and BM25 results fused"""
+    try:
+        nlp_controller, project = await get_search_controller(request, project_id)
+        results, timings = await search_hybrid(
+            nlp_controller, project, [search_request.text], search_request.limit,
+            search_request.metadata_filter, search_request.fusion
         )
+        return QueryResults(query=search_request.text, documents=results[0], timings=timings)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search failed for project {project_id}: {str(e)}", exc_info=True)
+        raise HTTPException(500, f"Search failed: {str(e)}")
 
 
+@nlp_router.post("/index/search-batch/{project_id}", response_model=BatchSearchResponse)
+async def search_index_batch(request: Request, project_id: str, search_request: BatchSearchRequest):
+    """Chunks closest to each of many queries: one embedding call and one vector DB round-trip"""
+    max_queries = get_settings().NLP_MAX_BATCH_QUERIES
+    if len(search_request.queries) > max_queries:
+        raise HTTPException(400, f"At most {max_queries} queries per batch")
+
+    try:
+        nlp_controller, project = await get_search_controller(request, project_id)
+        results, timings = await search_hybrid(
+            nlp_controller, project, search_request.queries, search_request.limit,
+            search_request.metadata_filter, search_request.fusion
+        )
+
+        return BatchSearchResponse(
+            project_id=project_id,
+            results=[
+                QueryResults(query=query, documents=documents)
+                for query, documents in zip(search_request.queries, results)
+            ],
+            timings=timings
+        )
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch search failed for project {project_id}: {str(e)}", exc_info=True)
+        raise HTTPException(500, f"Batch search failed: {str(e)}")
@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from typing import Optional
 from models.ProjectModel import ProjectModel
 from helpers.logger import logger
+import math
 
 project_router = APIRouter(prefix="/api/projects", tags=["projects"])
 
@@ -63,13 +64,26 @@ async def get_or_create_project(request: Request, project_data: CreateProjectReq
         raise HTTPException(500, f"Project get-or-create failed: {str(e)}")
 
 @project_router.get("/list")
-async def list_projects(request: Request, page: int = 1, page_size: int = 10):
-    """List all projects with pagination"""
+async def list_projects(request: Request, page_token: Optional[str] = None,
+                        page: Optional[int] = None, page_size: int = 10):
+    """
+    List projects ordered by index. Pass the returned next_page_token to get the
+    following page; ?page= offset pagination still works but slows down on deep pages.
+    """
+    if page_size < 1 or page_size > 100:
+        raise HTTPException(400, "page_size must be between 1 and 100")
+
     try:
         mongodb_client = request.app.mongodb_client
         project_model = ProjectModel(db_client=mongodb_client)
-        
-        projects, total_pages = await project_model.get_all_project(page, page_size)
+
+        next_page_token = None
+        if page is not None and page_token is None:
+            projects, _ = await project_model.get_all_project(max(1, page), page_size)
+        else:
+            projects, next_page_token = await project_model.get_projects_page(page_token, page_size)
+
+        total_projects = await project_model.get_project_count()
         
         return {
             "projects": [
@@ -78,10 +92,14 @@ async def list_projects(request: Request, page: int = 1, page_size: int = 10):
                     "project_index": project.project_index
                 } for project in projects
             ],
-            "total_pages": total_pages,
+            "next_page_token": next_page_token,
+            "total_projects": total_projects,
+            "total_pages": math.ceil(total_projects / page_size),
             "current_page": page
         }
         
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         logger.error(f"Failed to list projects: {str(e)}", exc_info=True)
         raise HTTPException(500, f"Failed to list projects: {str(e)}")
@@ -0,0 +1,32 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from models.db_schemes import RetrievedDocument
+
+class FusionWeights(BaseModel):
+    # reciprocal-rank fusion of the vector and BM25 results, unset values come from the HYBRID_* settings
+    dense: Optional[float] = Field(None, ge=0)  # 0 skips the vector search
+    lexical: Optional[float] = Field(None, ge=0)  # 0 skips the BM25 search
+    rrf_k: Optional[int] = Field(None, ge=1)
+
+class SearchRequest(BaseModel):
+    text: str = Field(..., min_length=1)
+    limit: Optional[int] = Field(5, ge=1, le=100)
+    # e.g. {"filename": ["a.pdf", "b.pdf"]}: every key must match, a list matches any of its items
+    metadata_filter: Optional[Dict[str, Any]] = None
+    fusion: Optional[FusionWeights] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    limit: Optional[int] = Field(5, ge=1, le=100)
+    metadata_filter: Optional[Dict[str, Any]] = None  # applies to every query
+    fusion: Optional[FusionWeights] = None
+
+class QueryResults(BaseModel):
+    query: str
+    documents: Optional[List[RetrievedDocument]] = None  # None: the query could not be embedded
+    timings: Optional[Dict[str, float]] = None  # seconds per search leg: dense, lexical, fusion
+
+class BatchSearchResponse(BaseModel):
+    project_id: str
+    results: List[QueryResults]
+    timings: Optional[Dict[str, float]] = None  # seconds per search leg, for the whole batch
@@ -0,0 +1,325 @@
+from .MmapVectorDB import MmapVectorDB, MmapCollection, write_npy_header, iter_blocks, NPY_HEADER_SIZE, SCAN_BLOCK_ROWS
+from typing import List, Optional
+import numpy as np
+
+# Vectors assigned per matrix product, bounds the (rows, centroids) score matrix
+ASSIGN_BLOCK_ROWS = 8192
+
+# Centroids of each product quantizer, so one code is one byte
+PQ_CENTROIDS = 256
+# k-means gets unstable below this many training points per centroid, and gains little above the max
+MIN_POINTS_PER_CENTROID = 39
+MAX_POINTS_PER_CENTROID = 64
+KMEANS_ITERATIONS = 12
+# iterations when training starts from the previous generation's centroids
+KMEANS_WARM_ITERATIONS = 4
+# The index is trained again once the collection grew to this multiple of the rows it was trained on
+RETRAIN_GROWTH = 4
+
+
+def assign_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (L2) of every vector: argmax of x.c - |c|^2 / 2"""
+    half_norms = 0.5 * np.einsum("kd,kd->k", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = vectors[start:start + ASSIGN_BLOCK_ROWS]
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+def train_kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator,
+                 init: Optional[np.ndarray] = None) -> np.ndarray:
+    if init is not None and init.shape == (k, data.shape[1]):
+        centroids = init.astype(np.float32)
+    else:
+        centroids = data[rng.choice(len(data), k, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        labels = assign_centroids(data, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[filled, None]
+        # an empty cluster starts over at a random point
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+def get_subvectors(dim: int, wanted: int) -> int:
+    """The largest count of equal sub-vectors of a dim-vector that is at most wanted"""
+    for count in range(min(wanted, dim), 0, -1):
+        if dim % count == 0:
+            return count
+    return 1
+
+
+class IvfPqCollection(MmapCollection):
+    """
+    Mapped state of an IVF-PQ collection. Besides the vectors it maps each
+    row's coarse list and its PQ code, and keeps the inverted lists in memory,
+    extended with the rows other workers added since the last refresh.
+    """
+
+    file_names = MmapCollection.file_names + ("lists.npy", "codes.npy", "coarse.npy", "codebooks.npy")
+
+    def __init__(self, path: str, meta: dict):
+        super().__init__(path, meta)
+        self.subvectors = meta["pq_subvectors"]
+        self.labels = np.empty((0, 1), dtype=np.int32)
+        self.codes = np.empty((0, self.subvectors), dtype=np.uint8)
+        self.coarse = None
+        self.codebooks = None
+        self.lists: List[np.ndarray] = []
+        self.pending: List[list] = []
+        self.indexed_rows = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.meta.get("trained_rows", 0) > 0
+
+    @property
+    def count(self) -> int:
+        count = super().count
+        if self.trained:
+            count = min(count, self.labels.shape[0], self.codes.shape[0])
+        return count
+
+    def refresh(self):
+        super().refresh()
+        if not self.trained:
+            return
+
+        if self.coarse is None:
+            self.coarse = np.load(self.get_file("coarse.npy"))
+            self.codebooks = np.load(self.get_file("codebooks.npy"))
+            self.lists = [np.empty(0, dtype=np.int64) for _ in range(len(self.coarse))]
+            self.pending = [[] for _ in range(len(self.coarse))]
+        self.labels = self.map_rows("lists.npy", self.labels)
+        self.codes = self.map_rows("codes.npy", self.codes)
+        self.index_rows()
+
+    def index_rows(self):
+        """Queues the rows added since the last refresh on their inverted lists"""
+        count = self.count
+        if count <= self.indexed_rows:
+            return
+        labels = np.asarray(self.labels[self.indexed_rows:count, 0])
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(len(self.coarse) + 1))
+        for label in np.flatnonzero(np.diff(bounds)):
+            self.pending[label].append(order[bounds[label]:bounds[label + 1]] + self.indexed_rows)
+        self.indexed_rows = count
+
+    def get_list(self, label: int) -> np.ndarray:
+        if self.pending[label]:
+            self.lists[label] = np.concatenate([self.lists[label], *self.pending[label]])
+            self.pending[label] = []
+        return self.lists[label]
+
+
+class IvfPqVectorDB(MmapVectorDB):
+    """
+    Approximate vector store without a server, for collections too large to scan.
+
+    A k-means coarse quantizer splits the vectors into nlist inverted lists and
+    each vector's residual to its centroid is product-quantized to one byte per
+    sub-vector. A search scores the nprobe closest lists from PQ lookup tables,
+    then rescores the best limit * refine candidates with the full vectors, which
+    stay on disk in the mapped matrix and are only paged in for those rows.
+
+    Collections are exact until they hold train_rows vectors, then trained as a
+    new generation by the background compaction, searched exactly meanwhile.
+    Later inserts are assigned and encoded with the trained
+    quantizers; once the collection grew RETRAIN_GROWTH times it is retrained,
+    starting from the current centroids. Lists, codes and codebooks are files of
+    the generation, mapped like the vectors, so workers share them.
+    """
+
+    collection_class = IvfPqCollection
+
+    def __init__(self, db_path: str, distance_method: str, dtype: str = "float32",
+                 nlist: int = 1024, pq_subvectors: int = 48, nprobe: int = 16,
+                 refine: int = 16, train_rows: int = 50000):
+        super().__init__(db_path=db_path, distance_method=distance_method, dtype=dtype)
+        self.nlist = nlist
+        self.pq_subvectors = pq_subvectors
+        self.nprobe = nprobe
+        self.refine = refine
+        # the product quantizers need enough points for their 256 centroids too
+        self.train_rows = max(train_rows, PQ_CENTROIDS * MIN_POINTS_PER_CENTROID)
+
+    def get_new_meta(self, embedding_size: int) -> dict:
+        return {
+            **super().get_new_meta(embedding_size),
+            "nlist": self.nlist,
+            "pq_subvectors": get_subvectors(embedding_size, self.pq_subvectors),
+            "trained_rows": 0,
+        }
+
+    def get_collection_info(self, collection_name: str) -> dict:
+        info = super().get_collection_info(collection_name)
+        if info is None:
+            return None
+        collection = self.collections[collection_name]
+        return {
+            **info,
+            "trained_rows": collection.meta["trained_rows"],
+            "nlist": len(collection.coarse) if collection.trained else 0,
+            "pq_subvectors": collection.subvectors,
+        }
+
+    def needs_compaction(self, collection: IvfPqCollection) -> bool:
+        live = collection.count - len(collection.payloads.deleted)
+        if collection.trained:
+            grown = live >= RETRAIN_GROWTH * collection.meta["trained_rows"]
+        else:
+            grown = live >= self.train_rows
+        return grown or super().needs_compaction(collection)
+
+    def create_generation(self, collection_name: str, meta: dict, vectors: np.ndarray = None,
+                          rows: np.ndarray = None, entries: List[dict] = None) -> np.ndarray:
+        if rows is None or len(rows) < self.train_rows:
+            # small collections are searched exactly
+            meta["trained_rows"] = 0
+            return super().create_generation(collection_name, meta, vectors, rows, entries)
+
+        previous = self.collections.get(collection_name)
+        coarse, codebooks = self.train(vectors, rows, meta, previous if previous is not None and previous.trained else None)
+        labels = np.concatenate([assign_centroids(block, coarse) for block in iter_blocks(vectors, rows)])
+
+        # rows of one list are written next to each other, a probed list is one sequential read
+        order = np.argsort(labels, kind="stable")
+        rows, labels = rows[order], labels[order]
+        entries = [{**entries[row], "row": new_row} for new_row, row in enumerate(order)]
+        meta["trained_rows"] = len(rows)
+
+        collection = self.collection_class(self.get_collection_path(collection_name), meta)
+        np.save(collection.get_file("coarse.npy"), coarse)
+        np.save(collection.get_file("codebooks.npy"), codebooks)
+        with open(collection.get_file("lists.npy"), "wb") as f:
+            write_npy_header(f, len(labels), 1, "int32")
+            f.write(labels.tobytes())
+        with open(collection.get_file("codes.npy"), "wb") as f:
+            write_npy_header(f, len(rows), codebooks.shape[0], "uint8")
+            start = 0
+            for block in iter_blocks(vectors, rows):
+                f.write(self.encode(block, labels[start:start + len(block)], coarse, codebooks).tobytes())
+                start += len(block)
+        super().create_generation(collection_name, meta, vectors, rows, entries)
+        self.logger.info(f"Trained {collection_name}: {len(coarse)} lists, {codebooks.shape[0]} sub-vectors, {len(rows)} rows")
+
+        new_rows = np.empty(len(order), dtype=np.int64)
+        new_rows[order] = np.arange(len(order))
+        return new_rows
+
+    def train(self, vectors: np.ndarray, rows: np.ndarray, meta: dict, previous: Optional[IvfPqCollection]):
+        """Coarse centroids and PQ codebooks from a sample of vectors[rows]"""
+        rng = np.random.default_rng(meta["generation"])
+        nlist = max(1, min(meta["nlist"], len(rows) // MIN_POINTS_PER_CENTROID))
+        sample_size = min(len(rows), max(nlist, PQ_CENTROIDS) * MAX_POINTS_PER_CENTROID)
+        sample_rows = np.sort(rng.choice(rows, sample_size, replace=False))
+        sample = np.concatenate(list(iter_blocks(vectors, sample_rows)))
+
+        iterations = KMEANS_WARM_ITERATIONS if previous is not None else KMEANS_ITERATIONS
+        coarse = train_kmeans(sample, nlist, iterations, rng, init=previous.coarse if previous is not None else None)
+        residuals = sample - coarse[assign_centroids(sample, coarse)]
+
+        subvectors = meta["pq_subvectors"]
+        width = meta["dim"] // subvectors
+        codebooks = np.stack([
+            train_kmeans(
+                np.ascontiguousarray(residuals[:, part * width:(part + 1) * width]), PQ_CENTROIDS, iterations, rng,
+                init=previous.codebooks[part] if previous is not None else None
+            )
+            for part in range(subvectors)
+        ])
+        return coarse, codebooks
+
+    def encode(self, vectors: np.ndarray, labels: np.ndarray, coarse: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+        """PQ code of each vector's residual to its list centroid"""
+        residuals = vectors - coarse[labels]
+        width = residuals.shape[1] // len(codebooks)
+        codes = np.empty((len(vectors), len(codebooks)), dtype=np.uint8)
+        for part, codebook in enumerate(codebooks):
+            codes[:, part] = assign_centroids(np.ascontiguousarray(residuals[:, part * width:(part + 1) * width]), codebook)
+        return codes
+
+    def append_index(self, collection: IvfPqCollection, vectors: np.ndarray, start: int):
+        if not collection.trained:
+            return
+        labels = assign_centroids(vectors, collection.coarse)
+        codes = self.encode(vectors, labels, collection.coarse, collection.codebooks)
+        for name, values in (("lists.npy", labels[:, None]), ("codes.npy", codes)):
+            with open(collection.get_file(name), "r+b") as f:
+                f.seek(NPY_HEADER_SIZE + start * values.shape[1] * values.itemsize)
+                f.write(values.tobytes())
+                f.truncate()
+                write_npy_header(f, start + len(values), values.shape[1], values.dtype.name)
+
+    def search_ivf(self, collection: IvfPqCollection, queries: np.ndarray, limit: int, nprobe: int,
+                   rows: np.ndarray = None):
+        """Top-limit (rows, scores) per query from the nprobe closest lists, out of rows if given"""
+        nprobe = max(1, min(nprobe, len(collection.coarse)))
+        coarse_scores = queries @ collection.coarse.T
+        probes = np.argpartition(-coarse_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        # a vector scores q.c + q.residual, and q.residual is a sum of one table entry per sub-vector
+        subvectors, centroids, width = collection.codebooks.shape
+        tables = np.einsum("qmd,mkd->qmk", queries.reshape(len(queries), subvectors, width), collection.codebooks)
+        table_offsets = np.arange(subvectors) * centroids
+        excluded = collection.get_deleted_mask()
+        if rows is not None:
+            excluded = np.ones_like(excluded)
+            excluded[rows] = False
+
+        results = []
+        for query, query_scores, probe, table in zip(queries, coarse_scores, probes, tables):
+            lists = [collection.get_list(label) for label in probe]
+            candidates = np.concatenate(lists)
+            if len(candidates):
+                keep = ~excluded[candidates]
+                candidates = candidates[keep]
+                scores = np.repeat(query_scores[probe], [len(items) for items in lists])[keep]
+                scores += table.ravel()[collection.codes[candidates] + table_offsets].sum(axis=1)
+            if len(candidates) == 0:
+                results.append(([], []))
+                continue
+
+            k = min(len(candidates), limit * self.refine if self.refine else limit)
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+            if self.refine:
+                candidates = np.sort(candidates)
+                scores = np.asarray(collection.vectors[candidates], dtype=np.float32) @ query
+            ranks = np.argsort(-scores)[:limit]
+            results.append((candidates[ranks], scores[ranks]))
+        return results
+
+    def search_many(self, collection_name: str, vectors: list, limit: int, metadata_filter: dict = None,
+                    nprobe: int = None):
+        """nprobe lists are searched per query, more is slower and closer to exact"""
+        collection = self.get_collection(collection_name)
+        if collection is None or not collection.trained or len(vectors) == 0:
+            return super().search_many(collection_name, vectors, limit, metadata_filter=metadata_filter)
+
+        queries = self.prepare_vectors(vectors, collection.meta["distance"])
+        rows = collection.get_filtered_rows(metadata_filter) if metadata_filter else None
+        if rows is not None and len(rows) <= SCAN_BLOCK_ROWS:
+            # a selective filter leaves few enough rows to score them all, exactly
+            found = self.scan(collection, queries, limit, rows)
+        else:
+            found = self.search_ivf(collection, queries, limit, nprobe or self.nprobe, rows)
+        return [
+            self.to_retrieved_documents(collection, found_rows, scores)
+            for found_rows, scores in found
+        ]
+
+    def search_by_vector(self, collection_name: str, vector: list, limit: int, metadata_filter: dict = None,
+                         nprobe: int = None):
+        results = self.search_many(collection_name, [vector], limit, metadata_filter=metadata_filter, nprobe=nprobe)
+        if not results or len(results[0]) == 0:
+            return None
+        return results[0]
@@ -0,0 +1,690 @@
+from ..VectorDBInterface import VectorDBInterface
+from ..VectorDBEnum import DistanceMethodEnums, QuantizationEnums, PayloadKeyEnums
+from models.db_schemes import RetrievedDocument
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# Fixed header size, so the row count can be rewritten in place as rows are appended
+NPY_HEADER_SIZE = 128
+# Rows scored per matrix product, bounds the temporary float32 copy of float16 rows
+SCAN_BLOCK_ROWS = 65536
+# A collection is rewritten without its deleted rows once they are this share of all rows
+COMPACT_DELETED_RATIO = 0.3
+# Metadata keys every worker keeps a value -> rows index of, filters on them skip the other rows
+INDEXED_KEYS = [key.value for key in PayloadKeyEnums]
+
+
+def write_npy_header(file, count: int, dim: int, dtype: str):
+    header = repr({
+        "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        "fortran_order": False,
+        "shape": (count, dim),
+    }).encode("latin1")
+    header += b" " * (NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1) + b"\n"
+    file.seek(0)
+    file.write(NPY_MAGIC + struct.pack("<H", len(header)) + header)
+
+
+def iter_blocks(vectors: np.ndarray, rows: np.ndarray = None):
+    """vectors[rows] as float32 blocks of SCAN_BLOCK_ROWS, without copying the whole selection"""
+    if rows is None:
+        return
+    for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+        yield np.asarray(vectors[rows[start:start + SCAN_BLOCK_ROWS]], dtype=np.float32)
+
+
+def matches_metadata(metadata: Optional[dict], metadata_filter: dict) -> bool:
+    """Every key must match; a list value matches any of its items"""
+    metadata = metadata or {}
+    for key, value in metadata_filter.items():
+        if isinstance(value, list):
+            if metadata.get(key) not in value:
+                return False
+        elif metadata.get(key) != value:
+            return False
+    return True
+
+
+class PayloadLog:
+    """
+    Append-only JSON lines next to the vectors: one line per added row
+    ({"row", "id", "text", "metadata"}) and one per batch of deleted rows
+    ({"deleted": [rows]}). Each worker replays only the lines added since
+    its last read, and keeps of a row only its id, the byte span of its line
+    and the values of the indexed keys. Text and metadata are read back from
+    the mapped file for the rows a search returns, so they live once in the
+    page cache rather than in every worker's heap.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.ids: Dict[str, int] = {}
+        self.row_ids: List[Optional[str]] = []
+        # (offset, length) of each row's line
+        self.spans = np.zeros((0, 2), dtype=np.int64)
+        self.map = None
+        self.map_lock = threading.Lock()
+        self.deleted = set()
+        # rows below this have their payload; rows are numbered without gaps
+        self.row_count = 0
+        # key -> value -> rows, deleted and overwritten rows included
+        self.index: Dict[str, Dict] = {key: {} for key in INDEXED_KEYS}
+
+    def refresh(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == self.offset:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                # a line still being written by another worker is read next time
+                if not line.endswith(b"\n"):
+                    break
+                self.apply(json.loads(line), self.offset, len(line))
+                self.offset += len(line)
+        return True
+
+    def get_id(self, row: int) -> Optional[str]:
+        return self.row_ids[row] if row < len(self.row_ids) else None
+
+    def apply(self, entry: dict, offset: int, length: int):
+        if "deleted" in entry:
+            for row in entry["deleted"]:
+                self.deleted.add(row)
+                point_id = self.get_id(row)
+                if point_id is not None and self.ids.get(point_id) == row:
+                    del self.ids[point_id]
+            return
+
+        row = entry["row"]
+        # a row left by a writer that died before raising the row count is written again
+        previous = self.get_id(row)
+        if previous is not None and self.ids.get(previous) == row:
+            del self.ids[previous]
+        if row >= len(self.row_ids):
+            self.row_ids.extend([None] * (row + 1 - len(self.row_ids)))
+        if row >= len(self.spans):
+            spans = np.zeros((max(row + 1, 2 * len(self.spans), 1024), 2), dtype=np.int64)
+            spans[:len(self.spans)] = self.spans
+            self.spans = spans
+        self.row_ids[row] = entry["id"]
+        self.spans[row] = (offset, length)
+        self.ids[entry["id"]] = row
+        self.row_count = max(self.row_count, row + 1)
+
+        metadata = entry.get("metadata") or {}
+        for key in INDEXED_KEYS:
+            value = metadata.get(key)
+            if isinstance(value, (str, int, float, bool)):
+                self.index[key].setdefault(value, set()).add(row)
+
+    def read(self, row: int) -> dict:
+        """The {"row", "id", "text", "metadata"} entry of a row, from the mapped file"""
+        offset, length = self.spans[row].tolist()
+        payloads = self.map
+        if payloads is None or len(payloads) < offset + length:
+            with self.map_lock:
+                if self.map is None or len(self.map) < offset + length:
+                    # remapped once the file grew; searches holding the old map keep it alive
+                    with open(self.path, "rb") as f:
+                        self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                payloads = self.map
+        return json.loads(payloads[offset:offset + length])
+
+    def get_indexed_rows(self, key: str, value) -> set:
+        """Rows whose metadata key is value, or one of the values of a list"""
+        values = value if isinstance(value, list) else [value]
+        return set().union(*(self.index[key].get(item, ()) for item in values))
+
+    def append(self, entries: List[dict]):
+        with open(self.path, "ab") as f:
+            f.write(b"".join(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n" for entry in entries))
+        self.refresh()
+
+
+class MmapCollection:
+    """Read state of one collection as mapped by this worker"""
+
+    # files of one generation, removed once the next one is written
+    file_names = ("vectors.npy", "payloads.jsonl")
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.dim = meta["dim"]
+        self.dtype = meta["dtype"]
+        self.generation = meta["generation"]
+        self.vectors = np.empty((0, self.dim), dtype=self.dtype)
+        self.stats = {}
+        self.payloads = PayloadLog(self.get_file("payloads.jsonl"))
+        self.deleted_rows = None
+        self.deleted_mask = None
+        # deleted rows the mask was built from; the deleted set only grows within a generation
+        self.deleted_mask_size = 0
+
+    def get_file(self, name: str) -> str:
+        return os.path.join(self.path, f"{self.generation}.{name}")
+
+    @property
+    def vectors_path(self) -> str:
+        return self.get_file("vectors.npy")
+
+    @property
+    def count(self) -> int:
+        # rows are searchable once both their vector and their payload are visible
+        return min(self.vectors.shape[0], self.payloads.row_count)
+
+    def refresh(self):
+        self.vectors = self.map_rows("vectors.npy", self.vectors)
+        self.payloads.refresh()
+
+    def map_rows(self, name: str, current: np.ndarray) -> np.ndarray:
+        """Maps a row file again once another writer changed it"""
+        path = self.get_file(name)
+        stat = os.stat(path)
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if key == self.stats.get(name):
+            return current
+        self.stats[name] = key
+        # read-only shared mapping: every worker uses the same page cache copy
+        # (an empty matrix can't be mapped)
+        if stat.st_size > NPY_HEADER_SIZE:
+            return np.load(path, mmap_mode="r")
+        return np.empty((0,) + current.shape[1:], dtype=current.dtype)
+
+    def get_deleted_rows(self) -> np.ndarray:
+        if self.deleted_rows is None or len(self.deleted_rows) != len(self.payloads.deleted):
+            self.deleted_rows = np.fromiter(self.payloads.deleted, dtype=np.int64, count=len(self.payloads.deleted))
+        return self.deleted_rows
+
+    def get_deleted_mask(self) -> np.ndarray:
+        count = self.count
+        stale = self.deleted_mask is None or self.deleted_mask_size != len(self.payloads.deleted)
+        if stale or len(self.deleted_mask) < count:
+            deleted_rows = self.get_deleted_rows()
+            self.deleted_mask = np.zeros(count, dtype=bool)
+            self.deleted_mask[deleted_rows[deleted_rows < count]] = True
+            self.deleted_mask_size = len(deleted_rows)
+        return self.deleted_mask
+
+    def get_filtered_rows(self, metadata_filter: dict) -> np.ndarray:
+        """Live rows matching metadata_filter, narrowed by the indexed keys first"""
+        indexed = [key for key in metadata_filter if key in INDEXED_KEYS]
+        if indexed:
+            rows = set.intersection(*(self.payloads.get_indexed_rows(key, metadata_filter[key]) for key in indexed))
+        else:
+            rows = range(self.count)
+
+        rest = {key: value for key, value in metadata_filter.items() if key not in INDEXED_KEYS}
+        if rest:
+            rows = [row for row in rows if row < self.count and matches_metadata(self.payloads.read(row).get("metadata"), rest)]
+
+        rows = np.fromiter(rows, dtype=np.int64)
+        rows = np.sort(rows[rows < self.count])
+        return rows[~self.get_deleted_mask()[rows]]
+
+
+class MmapVectorDB(VectorDBInterface):
+    """
+    Exact vector store without a server. Each collection is a directory holding
+    an append-only .npy matrix (float32 or float16) and a payload log.
+
+    Every uvicorn worker maps the same matrix read-only, so the vectors live
+    once in the page cache. Writers take an flock on the collection; rows are
+    written before the header's row count is raised, so readers never see a
+    partial row. Deletes and overwrites leave tombstones; a collection is
+    rewritten as a new generation once too many rows are dead, by a background
+    thread that holds no lock while it writes (see compact).
+    Search is a blocked NumPy matrix product with an argpartition top-k.
+    """
+
+    collection_class = MmapCollection
+
+    def __init__(self, db_path: str, distance_method: str, dtype: str = "float32"):
+        self.db_path = db_path
+        self.distance_method = distance_method
+        self.dtype = dtype
+        self.collections: Dict[str, MmapCollection] = {}
+        self.lock = threading.RLock()
+        self.compactions: Dict[str, threading.Thread] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def connect(self):
+        os.makedirs(self.db_path, exist_ok=True)
+
+    def disconnect(self):
+        self.collections = {}
+
+    async def disconnect_async(self):
+        self.disconnect()
+
+    def get_collection_path(self, collection_name: str) -> str:
+        return os.path.join(self.db_path, collection_name)
+
+    def get_meta_path(self, collection_name: str) -> str:
+        return os.path.join(self.get_collection_path(collection_name), "meta.json")
+
+    def read_meta(self, collection_name: str) -> Optional[dict]:
+        try:
+            with open(self.get_meta_path(collection_name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_meta(self, collection_name: str, meta: dict):
+        # replaced atomically: a reader sees the old generation or the new one
+        path = self.get_meta_path(collection_name)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.tmp", path)
+
+    @contextmanager
+    def file_lock(self, collection_name: str, name: str):
+        with open(os.path.join(self.get_collection_path(collection_name), name), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def write_lock(self, collection_name: str):
+        # taken before self.lock: a compaction holds it while it refreshes the collection
+        return self.file_lock(collection_name, ".lock")
+
+    def compaction_lock(self, collection_name: str):
+        # one compaction of a collection at a time, across workers; writers don't wait for it
+        return self.file_lock(collection_name, ".compact.lock")
+
+    def get_collection(self, collection_name: str) -> Optional[MmapCollection]:
+        with self.lock:
+            meta = self.read_meta(collection_name)
+            if meta is None:
+                self.collections.pop(collection_name, None)
+                return None
+
+            collection = self.collections.get(collection_name)
+            if collection is None or collection.generation != meta["generation"]:
+                collection = self.collection_class(self.get_collection_path(collection_name), meta)
+                self.collections[collection_name] = collection
+            collection.refresh()
+            return collection
+
+    def is_collection_existed(self, collection_name: str) -> bool:
+        return os.path.exists(self.get_meta_path(collection_name))
+
+    def list_all_collection(self) -> List:
+        if not os.path.isdir(self.db_path):
+            return []
+        return sorted(name for name in os.listdir(self.db_path) if self.is_collection_existed(name))
+
+    def get_collection_info(self, collection_name: str) -> dict:
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return None
+        return {
+            "dim": collection.dim,
+            "dtype": collection.dtype,
+            "distance": collection.meta["distance"],
+            "vectors_count": collection.count - len(collection.payloads.deleted),
+            "deleted_count": len(collection.payloads.deleted),
+        }
+
+    def delete_collection(self, collection_name: str):
+        if self.is_collection_existed(collection_name):
+            # a running compaction finishes first, it would write into a recreated collection
+            with self.compaction_lock(collection_name), self.lock:
+                self.collections.pop(collection_name, None)
+                shutil.rmtree(self.get_collection_path(collection_name), ignore_errors=True)
+            return True
+
+    def create_collection(self, collection_name: str, embedding_size: int, do_reset: bool = False,
+                          quantization: str = None, shared: bool = False):
+        # shared collections need nothing more: project_id is an indexed key,
+        # so a project's search only scores that project's rows
+        if do_reset:
+            _ = self.delete_collection(collection_name=collection_name)
+
+        if self.is_collection_existed(collection_name):
+            return False
+
+        if quantization and quantization != QuantizationEnums.NONE.value:
+            self.logger.warning(f"{collection_name}: quantization is not supported by the mmap store, use dtype float16")
+
+        os.makedirs(self.get_collection_path(collection_name), exist_ok=True)
+        with self.write_lock(collection_name):
+            if self.is_collection_existed(collection_name):
+                return False
+            meta = self.get_new_meta(embedding_size)
+            self.create_generation(collection_name, meta)
+            self.write_meta(collection_name, meta)
+        return True
+
+    def get_new_meta(self, embedding_size: int) -> dict:
+        return {"dim": embedding_size, "dtype": self.dtype, "distance": self.distance_method, "generation": 0}
+
+    def create_generation(self, collection_name: str, meta: dict, vectors: np.ndarray = None,
+                          rows: np.ndarray = None, entries: List[dict] = None) -> np.ndarray:
+        """Writes vectors[rows] and their entries as the files of meta's generation; returns the new row of each"""
+        collection = self.collection_class(self.get_collection_path(collection_name), meta)
+        count = 0 if rows is None else len(rows)
+        with open(collection.vectors_path, "wb") as f:
+            write_npy_header(f, count, meta["dim"], meta["dtype"])
+            for block in iter_blocks(vectors, rows):
+                f.write(block.astype(meta["dtype"]).tobytes())
+        with open(collection.payloads.path, "wb") as f:
+            f.write(b"".join(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n" for entry in entries or []))
+        return np.arange(count, dtype=np.int64)
+
+    def prepare_vectors(self, vectors, distance: str) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if distance == DistanceMethodEnums.COSINE.value:
+            # stored normalized, cosine becomes a plain dot product
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def insert_one(self, collection_name: str, text: str, vector: list, metadata: dict = None, record_id: str = None):
+        return self.insert_many(collection_name, [text], [vector], [metadata], [record_id])
+
+    def insert_many(self, collection_name: str, text: list, vector: list, metadata: list = None,
+                    record_id: list = None, batch_size: int = None):
+        if not self.is_collection_existed(collection_name):
+            self.logger.error("cant insert collection not exists")
+            return False
+        if not text:
+            return True
+
+        if metadata is None:
+            metadata = [None] * len(text)
+        if record_id is None:
+            record_id = [None] * len(text)
+
+        with self.write_lock(collection_name), self.lock:
+            collection = self.get_collection(collection_name)
+            vectors = self.prepare_vectors(vector, collection.meta["distance"])
+            if vectors.shape[1] != collection.dim:
+                self.logger.error(f"Vector size {vectors.shape[1]} does not match collection size {collection.dim}")
+                return False
+
+            entries, replaced = [], []
+            for chunk_text, chunk_metadata, chunk_id in zip(text, metadata, record_id):
+                point_id = str(chunk_id or uuid.uuid4().hex)
+                # an existing id is overwritten: its old row becomes a tombstone
+                if point_id in collection.payloads.ids:
+                    replaced.append(collection.payloads.ids[point_id])
+                entries.append({"id": point_id, "text": chunk_text, "metadata": chunk_metadata})
+            self.append_rows(collection, vectors, entries, replaced)
+            compact = self.needs_compaction(collection)
+
+        if compact:
+            self.compact_in_background(collection_name)
+        return True
+
+    def append_rows(self, collection: MmapCollection, vectors: np.ndarray, entries: List[dict], replaced: list = None):
+        """Appends vectors and their payload entries at the end of the collection; under the write lock"""
+        start = collection.vectors.shape[0]
+        entries = [{"row": start + offset, **entry} for offset, entry in enumerate(entries)]
+        if replaced:
+            entries.append({"deleted": replaced})
+
+        row_bytes = collection.dim * np.dtype(collection.dtype).itemsize
+        with open(collection.vectors_path, "r+b") as f:
+            # rows first, the header count last: readers never map a partial row
+            f.seek(NPY_HEADER_SIZE + start * row_bytes)
+            f.write(vectors.astype(collection.dtype).tobytes())
+            f.truncate()
+            self.append_index(collection, vectors, start)
+            collection.payloads.append(entries)
+            write_npy_header(f, start + len(vectors), collection.dim, collection.dtype)
+        collection.refresh()
+
+    def append_index(self, collection: MmapCollection, vectors: np.ndarray, start: int):
+        """Extra per-row files written after the vectors and before the payloads; none here"""
+        pass
+
+    def update_metadata(self, collection_name: str, record_ids: list, metadata: list):
+        if not record_ids or not self.is_collection_existed(collection_name):
+            return False
+
+        with self.write_lock(collection_name), self.lock:
+            collection = self.get_collection(collection_name)
+            ids = collection.payloads.ids
+            rows, entries = [], []
+            for point_id, point_metadata in zip(record_ids, metadata):
+                row = ids.get(str(point_id))
+                if row is None:
+                    continue
+                rows.append(row)
+                entries.append({"id": str(point_id), "text": collection.payloads.read(row)["text"],
+                                "metadata": point_metadata})
+            if rows:
+                # the log is append-only: the new payload goes on a copy of the row, the old row becomes a tombstone
+                self.append_rows(collection, np.asarray(collection.vectors[rows], dtype=np.float32), entries, rows)
+            compact = self.needs_compaction(collection)
+
+        if compact:
+            self.compact_in_background(collection_name)
+        return True
+
+    def delete_by_metadata(self, collection_name: str, metadata_filter: dict):
+        if not self.is_collection_existed(collection_name):
+            return False
+
+        with self.write_lock(collection_name), self.lock:
+            collection = self.get_collection(collection_name)
+            rows = collection.get_filtered_rows(metadata_filter).tolist()
+            if rows:
+                collection.payloads.append([{"deleted": rows}])
+            compact = self.needs_compaction(collection)
+
+        if compact:
+            self.compact_in_background(collection_name)
+        return True
+
+    def delete_points(self, collection_name: str, record_ids: list):
+        if not record_ids or not self.is_collection_existed(collection_name):
+            return False
+
+        with self.write_lock(collection_name), self.lock:
+            collection = self.get_collection(collection_name)
+            ids = collection.payloads.ids
+            rows = [ids[str(point_id)] for point_id in record_ids if str(point_id) in ids]
+            if rows:
+                collection.payloads.append([{"deleted": rows}])
+            compact = self.needs_compaction(collection)
+
+        if compact:
+            self.compact_in_background(collection_name)
+        return True
+
+    def scroll_points(self, collection_name: str, batch_size: int = 256, metadata_filter: dict = None,
+                      with_vectors: bool = True):
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return
+        if metadata_filter:
+            rows = collection.get_filtered_rows(metadata_filter)
+        else:
+            rows = np.flatnonzero(~collection.get_deleted_mask())
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            vectors = np.asarray(collection.vectors[batch], dtype=np.float32) if with_vectors else [None] * len(batch)
+            entries = [collection.payloads.read(row) for row in batch.tolist()]
+            yield [
+                {
+                    "id": entry["id"],
+                    "text": entry["text"],
+                    "metadata": entry.get("metadata"),
+                    "vector": vector.tolist() if with_vectors else None,
+                }
+                for entry, vector in zip(entries, vectors)
+            ]
+
+    def compact_in_background(self, collection_name: str) -> threading.Thread:
+        """Starts a compaction of the collection unless this worker already runs one"""
+        with self.lock:
+            thread = self.compactions.get(collection_name)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(
+                    target=self.run_compaction, args=(collection_name,), name=f"compact-{collection_name}", daemon=True
+                )
+                self.compactions[collection_name] = thread
+                thread.start()
+            return thread
+
+    def run_compaction(self, collection_name: str):
+        try:
+            self.compact(collection_name)
+        except Exception as e:
+            # the current generation stays in use, the next write tries again
+            self.logger.error(f"Compaction of {collection_name} failed: {e}", exc_info=True)
+
+    def compact(self, collection_name: str) -> bool:
+        """
+        Rewrites the live rows as the next generation, if the collection needs it.
+        The new files are written without any lock held: searches keep using the
+        current generation and writers keep appending to it. Rows and deletes that
+        arrived meanwhile are replayed onto the new generation under the write
+        lock, then meta.json is swapped. Returns whether a generation was written.
+        """
+        if not self.is_collection_existed(collection_name):
+            return False
+
+        with self.compaction_lock(collection_name):
+            with self.write_lock(collection_name):
+                collection = self.get_collection(collection_name)
+                if collection is None or not self.needs_compaction(collection):
+                    return False
+                snapshot_count = collection.count
+                snapshot_deleted = set(collection.payloads.deleted)
+                live_rows = sorted(row for row in collection.payloads.ids.values() if row < snapshot_count)
+                entries = [
+                    {**collection.payloads.read(row), "row": new_row}
+                    for new_row, row in enumerate(live_rows)
+                ]
+
+            meta = {**collection.meta, "generation": collection.generation + 1}
+            rows = np.asarray(live_rows, dtype=np.int64)
+            new_rows = self.create_generation(collection_name, meta, collection.vectors, rows, entries)
+
+            with self.write_lock(collection_name):
+                collection = self.get_collection(collection_name)
+                if collection is None:
+                    return False
+                target = self.collection_class(self.get_collection_path(collection_name), meta)
+                target.refresh()
+
+                payloads = collection.payloads
+                added = [
+                    row for row in range(snapshot_count, collection.count)
+                    if payloads.ids.get(payloads.get_id(row)) == row
+                ]
+                if added:
+                    self.append_rows(
+                        target,
+                        np.asarray(collection.vectors[added], dtype=np.float32),
+                        [{key: value for key, value in payloads.read(row).items() if key != "row"} for row in added]
+                    )
+                moved = dict(zip(live_rows, new_rows.tolist()))
+                deleted = [moved[row] for row in payloads.deleted - snapshot_deleted if row in moved]
+                if deleted:
+                    target.payloads.append([{"deleted": deleted}])
+                self.write_meta(collection_name, meta)
+
+            for name in collection.file_names:
+                try:
+                    os.remove(collection.get_file(name))
+                except FileNotFoundError:
+                    pass
+        self.logger.info(f"Compacted {collection_name} into generation {meta['generation']}: "
+                         f"{len(live_rows) + len(added) - len(deleted)} rows kept")
+        return True
+
+    def needs_compaction(self, collection: MmapCollection) -> bool:
+        deleted = len(collection.payloads.deleted)
+        return deleted > 0 and deleted >= COMPACT_DELETED_RATIO * collection.count
+
+    def scan(self, collection: MmapCollection, queries: np.ndarray, limit: int, rows: np.ndarray = None):
+        """Top-limit (rows, scores) per query by exact scoring of every live row, or of the given rows only"""
+        if rows is None:
+            count = collection.count
+            scores = np.empty((len(queries), count), dtype=np.float32)
+            for start in range(0, count, SCAN_BLOCK_ROWS):
+                block = np.asarray(collection.vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+                scores[:, start:start + len(block)] = queries @ block.T
+
+            deleted_rows = collection.get_deleted_rows()
+            deleted_rows = deleted_rows[deleted_rows < count]
+            if len(deleted_rows):
+                scores[:, deleted_rows] = -np.inf
+            k = min(limit, count - len(deleted_rows))
+        else:
+            scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+            start = 0
+            for block in iter_blocks(collection.vectors, rows):
+                scores[:, start:start + len(block)] = queries @ block.T
+                start += len(block)
+            k = min(limit, len(rows))
+
+        if k <= 0:
+            return [([], []) for _ in queries]
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        if rows is not None:
+            top = rows[top]
+        return [
+            (np.take_along_axis(top_rows, ranks, axis=0), np.take_along_axis(row_scores, ranks, axis=0))
+            for top_rows, row_scores, ranks in zip(top, top_scores, order)
+        ]
+
+    def to_retrieved_documents(self, collection: MmapCollection, rows, scores) -> List[RetrievedDocument]:
+        documents = []
+        for row, score in zip(rows, scores):
+            entry = collection.payloads.read(int(row))
+            documents.append(RetrievedDocument(**{
+                "score": float(score),
+                "text": entry["text"],
+                "metadata": entry.get("metadata"),
+            }))
+        return documents
+
+    def search_many(self, collection_name: str, vectors: list, limit: int, metadata_filter: dict = None):
+        if len(vectors) == 0:
+            return []
+        collection = self.get_collection(collection_name)
+        if collection is None or collection.count == 0:
+            return [[] for _ in vectors]
+
+        queries = self.prepare_vectors(vectors, collection.meta["distance"])
+        rows = collection.get_filtered_rows(metadata_filter) if metadata_filter else None
+        return [
+            self.to_retrieved_documents(collection, found_rows, scores)
+            for found_rows, scores in self.scan(collection, queries, limit, rows)
+        ]
+
+    async def search_many_async(self, collection_name: str, vectors: list, limit: int, metadata_filter: dict = None):
+        # the scan is NumPy work that releases the GIL, run it off the event loop
+        return await asyncio.to_thread(self.search_many, collection_name, vectors, limit, metadata_filter)
+
+    def search_by_vector(self, collection_name: str, vector: list, limit: int, metadata_filter: dict = None):
+        results = self.search_many(collection_name, [vector], limit, metadata_filter=metadata_filter)
+        if not results or len(results[0]) == 0:
+            return None
+        return results[0]
@@ -1,18 +1,50 @@
-from multiprocessing.connection import Client
-from pickle import TRUE
-from re import T
-from turtle import distance
-from qdrant_client import models,QdrantClient
+from qdrant_client import models,QdrantClient,AsyncQdrantClient
 from ..VectorDBInterface import VectorDBInterface
-from ..VectorDBEnum import DistanceMethodEnums
+from ..VectorDBEnum import DistanceMethodEnums, QuantizationEnums, PayloadKeyEnums
+from models.db_schemes import RetrievedDocument
+import asyncio
 import logging
+import uuid
 from typing import List
 
+# Payload index of each flattened key, filters on these keys don't scan payloads
+PAYLOAD_INDEX_SCHEMAS={
+    PayloadKeyEnums.PROJECT_ID.value:models.PayloadSchemaType.KEYWORD,
+    PayloadKeyEnums.FILE_ID.value:models.PayloadSchemaType.KEYWORD,
+    PayloadKeyEnums.FILENAME.value:models.PayloadSchemaType.KEYWORD,
+    PayloadKeyEnums.FILE_INDEX.value:models.PayloadSchemaType.INTEGER,
+    PayloadKeyEnums.CHUNK_ID.value:models.PayloadSchemaType.INTEGER,
+}
+# Per-tenant HNSW links of a shared collection: graphs are built per project_id, not across projects
+SHARED_PAYLOAD_M=16
+
 class QdrantDB(VectorDBInterface):
-    def __init__(self,db_path:str,distance_method:str):
+    def __init__(self,db_path:str,distance_method:str,
+                 quantization:str=QuantizationEnums.NONE.value,
+                 oversampling:float=2.0,rescore:bool=True,
+                 upload_batch_size:int=256,upload_parallel:int=1,upload_max_retries:int=3,
+                 url:str=None,api_key:str=None,prefer_grpc:bool=False,grpc_port:int=6334,timeout:int=30):
         self.client=None
+        self.async_client=None
         self.db_path=db_path
+        self.url=url
+        self.api_key=api_key
+        self.prefer_grpc=prefer_grpc
+        self.grpc_port=grpc_port
+        self.timeout=timeout
+        self.upload_batch_size=upload_batch_size
+        self.upload_parallel=upload_parallel
+        self.upload_max_retries=upload_max_retries
         self.distance_method=None
+        self.quantization=quantization
+        # quantized search fetches limit*oversampling candidates and rescores them with the originals
+        self.search_params=models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                ignore=False,
+                rescore=rescore,
+                oversampling=oversampling
+            )
+        )
 
         if distance_method == DistanceMethodEnums.COSINE.value:
             self.distance_method=models.Distance.COSINE
@@ -21,16 +53,38 @@ class QdrantDB(VectorDBInterface):
 
         self.logger=logging.getLogger(__name__)
     def connect(self):
-        self.client=QdrantClient(path=self.db_path)
+        if not self.url:
+            # embedded storage takes one client per path, async searches run the sync client in a thread
+            self.client=QdrantClient(path=self.db_path)
+            return
+
+        # one client pair per worker process, they keep their HTTP connections or gRPC channel open
+        client_args={
+            "url":self.url,
+            "api_key":self.api_key,
+            "prefer_grpc":self.prefer_grpc,
+            "grpc_port":self.grpc_port,
+            "timeout":self.timeout
+        }
+        self.client=QdrantClient(**client_args)
+        self.async_client=AsyncQdrantClient(**client_args)
 
     def disconnect(self):
+        if self.client is not None:
+            self.client.close()
         self.client=None
 
+    async def disconnect_async(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+        self.async_client=None
+        self.disconnect()
+
     def is_collection_existed(self, collection_name: str) -> bool:
         return self.client.collection_exists(collection_name=collection_name)
 
     def list_all_collection(self)->List:
-        return self.client.get_collection()
+        return [collection.name for collection in self.client.get_collections().collections]
     
     def get_collection_info(self,collection_name:str)->dict:
         return self.client.get_collection(collection_name=collection_name)
@@ -39,19 +93,73 @@ class QdrantDB(VectorDBInterface):
         if self.is_collection_existed(collection_name):
             return self.client.delete_collection(collection_name=collection_name)
         
-    def create_collection(self,collection_name:str,embedding_size:int,do_reset:bool=False):
+    def get_quantization_config(self,quantization:str):
+        # the quantized copy stays in RAM, it is what the index is searched with
+        if quantization==QuantizationEnums.INT8.value:
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        if quantization==QuantizationEnums.BINARY.value:
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True)
+            )
+        return None
+
+    def create_collection(self,collection_name:str,embedding_size:int,do_reset:bool=False,
+    quantization:str=None,shared:bool=False):
         if do_reset:
             _=self.delete_collection(collection_name=collection_name)
         
         if not self.is_collection_existed(collection_name):
-            _=self.Client.create_collection(
+            quantization_config=self.get_quantization_config(quantization or self.quantization)
+            _=self.client.create_collection(
                 collection_name=collection_name,
                 vectors_config=models.VectorParams(
                     size=embedding_size,
-                    distance=self.distance_method
-                ) )
+                    distance=self.distance_method,
+                    # full precision originals only serve rescoring, keep them on disk
+                    on_disk=quantization_config is not None
+                ),
+                quantization_config=quantization_config,
+                # no global graph in a shared collection: every search is filtered to one project
+                hnsw_config=models.HnswConfigDiff(m=0,payload_m=SHARED_PAYLOAD_M) if shared else None
+            )
+            for key,schema in PAYLOAD_INDEX_SCHEMAS.items():
+                if shared and key==PayloadKeyEnums.PROJECT_ID.value:
+                    # tenant index: each project's points are stored together
+                    schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD,is_tenant=True)
+                _=self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=key,
+                    field_schema=schema
+                )
             return True
         return False
+
+    def get_payload(self,text:str,metadata:dict=None):
+        # key fields are copied to the top level, where they are indexed
+        payload={"text":text,"metadata":metadata}
+        for key in PAYLOAD_INDEX_SCHEMAS:
+            if metadata and metadata.get(key) is not None:
+                payload[key]=metadata[key]
+        return payload
+
+    def get_filter(self,metadata_filter:dict=None,indexed_keys=PAYLOAD_INDEX_SCHEMAS):
+        """Every key must match, a list matches any of its items; indexed keys use the flattened payload"""
+        if not metadata_filter:
+            return None
+        conditions=[
+            models.FieldCondition(
+                key=key if key in indexed_keys else f"metadata.{key}",
+                match=models.MatchAny(any=value) if isinstance(value,list) else models.MatchValue(value=value)
+            )
+            for key,value in metadata_filter.items()
+        ]
+        return models.Filter(must=conditions)
     
     def insert_one(self,collection_name:str,text:str,
     vector:list,metadata:dict=None,record_id:str=None):
@@ -59,78 +167,216 @@ class QdrantDB(VectorDBInterface):
             self.logger.error("cant insert collection not exists")
             return False
 
-        _=self.client.upload_records(
+        _=self.client.upload_points(
             collection_name=collection_name,
-            records=[
-                models.Record(
+            points=[
+                models.PointStruct(
+                    id=record_id or uuid.uuid4().hex,
                     vector=vector,
-                    payload={
-                        "text":text,"metadata":metadata
-                    }
-
+                    payload=self.get_payload(text,metadata)
                 )
             ]
         )
         return True
 
     def insert_many(self,collection_name:str,text:list,vector:list,metadata:list=None,
-    record_id:list=None,batch_size:int=50):
+    record_id:list=None,batch_size:int=None):
         if metadata is None:
             metadata=[None]*len(text)
 
         if record_id is None:
             record_id=[None]* len(text)
-        
-        for i in range(0,len(text),batch_size):
-            batch_end=i+batch_size
-            batch_text=text[i:batch_end]
-            batch_vector=vector[i:batch_end]
-            batch_metadata=metadata[i:batch_end]
-
-            batch_records=[
-                models.Record(
-                    vector=batch_vector[x],
-                    payload={
-                        "text":batch_text[x],"metadata":batch_metadata[x]
-                    }
 
-                )
-                for x in range(len(batch_text))
-            ]
-            try:
-                _=self.client.upload_records(
+        points=(
+            models.PointStruct(
+                # without a stable id a re-run adds the point again instead of overwriting it
+                id=record_id[x] or uuid.uuid4().hex,
+                vector=vector[x],
+                payload=self.get_payload(text[x],metadata[x])
+            )
+            for x in range(len(text))
+        )
+        batch_size=batch_size or self.upload_batch_size
+        # parallel uploads start a process pool per call, only worth it when every worker gets batches
+        parallel=self.upload_parallel if len(text) > batch_size*self.upload_parallel else 1
+        try:
+            # a failed batch is retried on its own
+            self.client.upload_points(
+                collection_name=collection_name,
+                points=points,
+                batch_size=batch_size,
+                parallel=parallel,
+                max_retries=self.upload_max_retries,
+                wait=True
+            )
+        except Exception as e :
+            # retries are spent: the caller keeps the chunks unindexed instead of assuming they were stored
+            self.logger.error(f"Error while inserting points :{e}")
+            raise
+
+        return True
+
+    def update_metadata(self,collection_name:str,record_ids:list,metadata:list,batch_size:int=None):
+        # the text is left out: only the given keys of a payload are overwritten
+        operations=[
+            models.SetPayloadOperation(set_payload=models.SetPayload(
+                payload={key:value for key,value in self.get_payload(None,point_metadata).items() if key!="text"},
+                points=[record_id]
+            ))
+            for record_id,point_metadata in zip(record_ids,metadata)
+        ]
+        batch_size=batch_size or self.upload_batch_size
+        for start in range(0,len(operations),batch_size):
+            _=self.client.batch_update_points(
                 collection_name=collection_name,
-                records=batch_records
-                 )
-            except Exception as e :
-                self.looger.error(f"Error while inserting batch :{e}")
-                return False
+                update_operations=operations[start:start+batch_size],
+                wait=True
+            )
+        return True
 
+    def delete_by_metadata(self,collection_name:str,metadata_filter:dict):
+        # the nested metadata also matches points written before keys were flattened,
+        # only project_id, which those points never had, goes through its index
+        _=self.client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(
+                filter=self.get_filter(metadata_filter,indexed_keys=[PayloadKeyEnums.PROJECT_ID.value])
+            )
+        )
         return True
 
-    def search_by_vector(self,collection_name:str,vector:list,limit:int):
-        results= self.client.search(
+    def delete_points(self,collection_name:str,record_ids:list):
+        if not record_ids:
+            return False
+        _=self.client.delete(
             collection_name=collection_name,
-            query_vector=vector,
-            limit=limit
+            points_selector=models.PointIdsList(points=record_ids)
         )
+        return True
+
+    def scroll_points(self,collection_name:str,batch_size:int=256,metadata_filter:dict=None,
+    with_vectors:bool=True):
+        offset=None
+        while True:
+            points,offset=self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=self.get_filter(metadata_filter),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors
+            )
+            if points:
+                yield [
+                    {
+                        "id":point.id,
+                        "text":point.payload.get("text"),
+                        "metadata":point.payload.get("metadata"),
+                        "vector":point.vector
+                    }
+                    for point in points
+                ]
+            if offset is None:
+                return
+
+    def backfill_payload_keys(self,collection_name:str,batch_size:int=256):
+        """
+        Flattens the key fields of points written before they were copied to the top level,
+        and indexes them in collections created before then. Returns how many points were updated.
+        """
+        payload_schema=self.client.get_collection(collection_name=collection_name).payload_schema or {}
+        for key,schema in PAYLOAD_INDEX_SCHEMAS.items():
+            if key not in payload_schema:
+                _=self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=key,
+                    field_schema=schema
+                )
+
+        # points missing any flattened key; some never had the key in their metadata either
+        missing=models.Filter(should=[
+            models.IsEmptyCondition(is_empty=models.PayloadField(key=key))
+            for key in PAYLOAD_INDEX_SCHEMAS
+        ])
+        updated,offset=0,None
+        while True:
+            points,offset=self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=missing,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            operations=[]
+            for point in points:
+                payload=self.get_payload(point.payload.get("text"),point.payload.get("metadata"))
+                keys={key:value for key,value in payload.items() if key in PAYLOAD_INDEX_SCHEMAS and key not in point.payload}
+                if keys:
+                    operations.append(models.SetPayloadOperation(
+                        set_payload=models.SetPayload(payload=keys,points=[point.id])
+                    ))
+            if operations:
+                _=self.client.batch_update_points(collection_name=collection_name,update_operations=operations,wait=True)
+                updated+=len(operations)
+            if offset is None:
+                return updated
+
+    def search_by_vector(self,collection_name:str,vector:list,limit:int,metadata_filter:dict=None):
+        # collections without quantization ignore the quantization search params
+        results= self.client.query_points(
+            collection_name=collection_name,
+            query=vector,
+            query_filter=self.get_filter(metadata_filter),
+            limit=limit,
+            search_params=self.search_params,
+            with_payload=True
+        ).points
         if not results or len(results)==0:
             return None
-        return [
-            RetrievedDocument(**{
-                "score":result.score,
-                "text":result.payload["text"],
-            })
-            for result in results
-        ]
+        return self.to_retrieved_documents(results)
 
-        
+    def search_many(self,collection_name:str,vectors:list,limit:int,metadata_filter:dict=None):
+        if not vectors:
+            return []
 
-        
-
-        
-            
+        responses=self.client.query_batch_points(
+            collection_name=collection_name,
+            requests=self.get_query_requests(vectors,limit,metadata_filter)
+        )
+        return [self.to_retrieved_documents(response.points) for response in responses]
 
+    async def search_many_async(self,collection_name:str,vectors:list,limit:int,metadata_filter:dict=None):
+        if self.async_client is None:
+            return await asyncio.to_thread(self.search_many,collection_name,vectors,limit,metadata_filter)
+        if not vectors:
+            return []
 
+        responses=await self.async_client.query_batch_points(
+            collection_name=collection_name,
+            requests=self.get_query_requests(vectors,limit,metadata_filter)
+        )
+        return [self.to_retrieved_documents(response.points) for response in responses]
 
+    def get_query_requests(self,vectors:list,limit:int,metadata_filter:dict=None):
+        query_filter=self.get_filter(metadata_filter)
+        return [
+            models.QueryRequest(
+                query=vector,
+                filter=query_filter,
+                limit=limit,
+                params=self.search_params,
+                with_payload=True
+            )
+            for vector in vectors
+        ]
 
+    def to_retrieved_documents(self,points:list)->List[RetrievedDocument]:
+        return [
+            RetrievedDocument(**{
+                "score":point.score,
+                "text":point.payload["text"],
+                "metadata":point.payload.get("metadata"),
+            })
+            for point in points
+        ]
@@ -1,3 +1,3 @@
-from QdrantDB import QdrantDB
-
-    
+from .QdrantDB import QdrantDB
+from .MmapVectorDB import MmapVectorDB
+from .IvfPqVectorDB import IvfPqVectorDB
@@ -2,7 +2,27 @@ from enum import Enum
 
 class VectorDBEnum(Enum):
     QDRANT="QDRANT"
+    MMAP="MMAP"
+    IVF_PQ="IVF_PQ"
+
+class TenancyEnums(Enum):
+    COLLECTION="collection"  # one collection per project
+    MIGRATING="migrating"  # writes go to both layouts, searches read the per-project collections
+    SHARED="shared"  # projects share a few collections, partitioned by project_id
 
 class DistanceMethodEnums(Enum):
     COSINE="cosine"
-    DOT="dot"
\ No newline at end of file
+    DOT="dot"
+
+class QuantizationEnums(Enum):
+    NONE="none"
+    INT8="int8"
+    BINARY="binary"
+
+class PayloadKeyEnums(Enum):
+    # chunk fields kept as top-level, indexed payload keys next to the full metadata
+    PROJECT_ID="project_id"
+    FILE_ID="file_id"
+    FILENAME="filename"
+    FILE_INDEX="file_index"
+    CHUNK_ID="chunk_id"
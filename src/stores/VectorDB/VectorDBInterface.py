@@ -11,6 +11,11 @@ class VectorDBInterface(ABC):
     def disconnect(self):
         pass
 
+    @abstractmethod
+    async def disconnect_async(self):
+        """disconnect, closing async clients too"""
+        pass
+
     @abstractmethod
     def is_collection_existed(self,collection_name:str)->bool:
         pass
@@ -28,7 +33,12 @@ class VectorDBInterface(ABC):
         pass
 
     @abstractmethod
-    def create_collection(self,collection_name:str,embedding_size:int,do_reset:bool=False):
+    def create_collection(self,collection_name:str,embedding_size:int,do_reset:bool=False,
+    quantization:str=None,shared:bool=False):
+        """
+        quantization overrides the provider's default for this collection (QuantizationEnums);
+        a shared collection holds many projects, partitioned by the project_id payload key
+        """
         pass
     
     @abstractmethod
@@ -37,9 +47,40 @@ class VectorDBInterface(ABC):
 
     @abstractmethod
     def insert_many(self,collection_name:str,text:list,vector:list,metadata:list=None,
-    record_id:list=None,batch_size:int=50):
+    record_id:list=None,batch_size:int=None):
+        """Upsert points; an existing record_id is overwritten, so re-running an insert is idempotent"""
+        pass
+
+    @abstractmethod
+    def update_metadata(self,collection_name:str,record_ids:list,metadata:list):
+        """Replace the metadata of existing points, their text and vectors stay; unknown ids are skipped"""
+        pass
+
+    @abstractmethod
+    def delete_by_metadata(self,collection_name:str,metadata_filter:dict):
+        """Delete points whose metadata matches every key; a list value matches any of its items"""
+        pass
+
+    @abstractmethod
+    def delete_points(self,collection_name:str,record_ids:list):
+        pass
+
+    @abstractmethod
+    def scroll_points(self,collection_name:str,batch_size:int=256,metadata_filter:dict=None,
+    with_vectors:bool=True):
+        """Yields every point as batches of {"id", "text", "metadata", "vector"} dicts"""
+        pass
+
+    @abstractmethod
+    def search_by_vector(self,collection_name:str,vector:list,limit:int,metadata_filter:dict=None):
+        """Only points matching metadata_filter, like delete_by_metadata; PayloadKeyEnums keys are indexed"""
+        pass
+
+    @abstractmethod
+    def search_many(self,collection_name:str,vectors:list,limit:int,metadata_filter:dict=None):
+        """One round-trip for many query vectors; a list of results per vector, in input order"""
         pass
 
     @abstractmethod
-    def search_by_vector(self,collection_name:str,vector:list,limit:int):
+    async def search_many_async(self,collection_name:str,vectors:list,limit:int,metadata_filter:dict=None):
         pass
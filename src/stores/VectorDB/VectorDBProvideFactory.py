@@ -1,5 +1,5 @@
 from stores.VectorDB import VectorDBEnum
-from .Providers import QdrantDB
+from .Providers import QdrantDB, MmapVectorDB, IvfPqVectorDB
 from controllers.BaseController import BaseController
 
 class VectorDBProviderFactory:
@@ -9,11 +9,48 @@ class VectorDBProviderFactory:
     
     def create(self,provider:str):
         if provider==VectorDBEnum.VectorDBEnum.QDRANT.value:
+            self.check_qdrant_tenancy()
             db_path=self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
             return QdrantDB(
                 db_path=db_path,
-                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD
-
+                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+                quantization=self.config.VECTOR_DB_QUANTIZATION,
+                oversampling=self.config.VECTOR_DB_QUANTIZATION_OVERSAMPLING,
+                rescore=self.config.VECTOR_DB_QUANTIZATION_RESCORE,
+                upload_batch_size=self.config.VECTOR_DB_UPLOAD_BATCH_SIZE,
+                upload_parallel=self.config.VECTOR_DB_UPLOAD_PARALLEL,
+                upload_max_retries=self.config.VECTOR_DB_UPLOAD_MAX_RETRIES,
+                url=self.config.VECTOR_DB_URL,
+                api_key=self.config.VECTOR_DB_API_KEY,
+                prefer_grpc=self.config.VECTOR_DB_PREFER_GRPC,
+                grpc_port=self.config.VECTOR_DB_GRPC_PORT,
+                timeout=self.config.VECTOR_DB_TIMEOUT
+            )
+        if provider==VectorDBEnum.VectorDBEnum.MMAP.value:
+            return MmapVectorDB(
+                db_path=self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH),
+                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+                dtype=self.config.VECTOR_DB_MMAP_DTYPE
+            )
+        if provider==VectorDBEnum.VectorDBEnum.IVF_PQ.value:
+            return IvfPqVectorDB(
+                db_path=self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH),
+                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+                dtype=self.config.VECTOR_DB_MMAP_DTYPE,
+                nlist=self.config.VECTOR_DB_IVF_NLIST,
+                pq_subvectors=self.config.VECTOR_DB_IVF_PQ_SUBVECTORS,
+                nprobe=self.config.VECTOR_DB_IVF_NPROBE,
+                refine=self.config.VECTOR_DB_IVF_REFINE,
+                train_rows=self.config.VECTOR_DB_IVF_TRAIN_ROWS
             )
         return None
-    
+
+    def check_qdrant_tenancy(self):
+        # the embedded store has no payload indexes nor per-tenant graphs: every search of a
+        # shared collection would score all projects' points in Python, behind one lock
+        if self.config.VECTOR_DB_URL or self.config.VECTOR_DB_TENANCY==VectorDBEnum.TenancyEnums.COLLECTION.value:
+            return
+        raise ValueError(
+            f"VECTOR_DB_TENANCY={self.config.VECTOR_DB_TENANCY} needs a Qdrant server (VECTOR_DB_URL), "
+            f"the embedded store only supports VECTOR_DB_TENANCY=collection"
+        )
@@ -0,0 +1,30 @@
+import httpx
+
+
+class AsyncHttpPool:
+    """
+    One httpx.AsyncClient per worker process, shared by the async clients of
+    every provider so they reuse keep-alive connections instead of each
+    opening their own pool.
+    """
+
+    client = None
+
+    @classmethod
+    def get_client(cls, max_connections: int = 100, max_keepalive_connections: int = 20,
+                   timeout: float = 60.0) -> httpx.AsyncClient:
+        if cls.client is None or cls.client.is_closed:
+            cls.client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections
+                ),
+                timeout=timeout
+            )
+        return cls.client
+
+    @classmethod
+    async def close(cls):
+        if cls.client is not None:
+            await cls.client.aclose()
+            cls.client = None
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, List, Optional
+from .RateScheduler import RateScheduler, PRIORITY_BULK, estimate_tokens, get_throttle, is_input_error
+
+
+class EmbeddingBatcher:
+    """
+    Splits texts into batches bounded by item count and total characters,
+    sends each batch in one embedding call and returns vectors in input order.
+
+    A batch the provider rejects for its inputs (a 400, e.g. a text over the
+    token limit), or answers without some of its vectors, is split in half, so
+    one bad input can't sink its neighbours; texts that still can't be embedded
+    come back as None. Other failures (transport, auth, 5xx) are retried with
+    exponential backoff and then raised: smaller batches would not fare better,
+    and the caller keeps the texts for a later run instead of losing them.
+
+    With a scheduler, every call waits for the model's rate budget, 429s are
+    retried by the scheduler, and batches follow its adaptive batch size.
+
+    embed() takes a blocking embed_batch, embed_async() a coroutine function.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], List[list]],
+                 max_batch_items: int = 96, max_batch_chars: int = 100000,
+                 max_retries: int = 3, backoff_seconds: float = 1.0,
+                 scheduler: RateScheduler = None, model_id: str = None,
+                 priority: int = PRIORITY_BULK):
+        self.embed_batch = embed_batch
+        self.max_batch_items = max(1, max_batch_items)
+        self.max_batch_chars = max(1, max_batch_chars)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.scheduler = scheduler
+        self.model_id = model_id
+        self.priority = priority
+        self.logger = logging.getLogger(__name__)
+
+    def get_max_batch_items(self) -> int:
+        if self.scheduler is None:
+            return self.max_batch_items
+        return self.scheduler.get_batch_size(self.model_id, self.max_batch_items)
+
+    def iter_batches(self, texts: List[str]):
+        """Yields lists of input positions; the item limit is read again for every batch"""
+        batch, chars = [], 0
+        for position, text in enumerate(texts):
+            if batch and (len(batch) >= self.get_max_batch_items() or chars + len(text) > self.max_batch_chars):
+                yield batch
+                batch, chars = [], 0
+            batch.append(position)
+            chars += len(text)
+        if batch:
+            yield batch
+
+    def embed(self, texts: List[str]) -> List[Optional[list]]:
+        vectors: List[Optional[list]] = [None] * len(texts)
+        for batch in self.iter_batches(texts):
+            self.embed_positions(texts, batch, vectors, self.max_retries)
+        return vectors
+
+    def embed_positions(self, texts: List[str], positions: List[int],
+                        vectors: List[Optional[list]], retries: int):
+        pending = positions
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(self.get_backoff(attempt))
+
+            try:
+                results = self.send([texts[position] for position in pending])
+            except Exception as e:
+                if self.should_split(e, pending, attempt, retries):
+                    break
+                continue
+
+            pending = self.record_results(pending, results, vectors)
+            if not pending:
+                return
+
+        for half in self.split_pending(pending):
+            self.embed_positions(texts, half, vectors, 0)
+
+    async def embed_async(self, texts: List[str]) -> List[Optional[list]]:
+        vectors: List[Optional[list]] = [None] * len(texts)
+        for batch in self.iter_batches(texts):
+            await self.embed_positions_async(texts, batch, vectors, self.max_retries)
+        return vectors
+
+    async def embed_positions_async(self, texts: List[str], positions: List[int],
+                                    vectors: List[Optional[list]], retries: int):
+        pending = positions
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(self.get_backoff(attempt))
+
+            try:
+                results = await self.send_async([texts[position] for position in pending])
+            except Exception as e:
+                if self.should_split(e, pending, attempt, retries):
+                    break
+                continue
+
+            pending = self.record_results(pending, results, vectors)
+            if not pending:
+                return
+
+        for half in self.split_pending(pending):
+            await self.embed_positions_async(texts, half, vectors, 0)
+
+    def send(self, batch: List[str]):
+        if self.scheduler is None:
+            return self.embed_batch(batch)
+        return self.scheduler.call(
+            self.embed_batch, batch,
+            model_id=self.model_id, tokens=estimate_tokens(batch), priority=self.priority
+        )
+
+    async def send_async(self, batch: List[str]):
+        if self.scheduler is None:
+            return await self.embed_batch(batch)
+        return await self.scheduler.call_async(
+            self.embed_batch, batch,
+            model_id=self.model_id, tokens=estimate_tokens(batch), priority=self.priority
+        )
+
+    def should_split(self, error: Exception, pending: List[int], attempt: int, retries: int) -> bool:
+        """True to split a batch the provider rejected for its inputs, False to retry it; raises otherwise"""
+        if is_input_error(error):
+            self.logger.warning(f"Embedding batch of {len(pending)} rejected: {error}")
+            return True
+        # a 429 that reaches here already outlasted the scheduler's retries
+        if attempt == retries or (self.scheduler is not None and get_throttle(error)[0]):
+            raise error
+        self.logger.warning(f"Embedding batch of {len(pending)} failed (attempt {attempt + 1}): {error}")
+        return False
+
+    def get_backoff(self, attempt: int) -> float:
+        # jitter spreads the retries of batches that failed together
+        return self.backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+    def record_results(self, pending: List[int], results, vectors: List[Optional[list]]) -> List[int]:
+        """Stores a batch's vectors, returns the positions still missing one"""
+        # a short or partly empty answer only leaves the missing texts pending
+        results = list(results or [])
+        results += [None] * (len(pending) - len(results))
+        for position, vector in zip(pending, results):
+            vectors[position] = vector or None
+        return [position for position in pending if vectors[position] is None]
+
+    def split_pending(self, pending: List[int]) -> List[List[int]]:
+        # halves get a single attempt each, a bad input is isolated in log2(n) calls
+        if len(pending) > 1:
+            middle = len(pending) // 2
+            return [pending[:middle], pending[middle:]]
+        self.logger.error(f"Could not embed text at position {pending[0]}")
+        return []
@@ -0,0 +1,296 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from prometheus_client import Counter
+from .LLMInterface import LLMInterface
+
+EMBEDDING_CACHE_HITS = Counter(
+    "embedding_cache_hits_total", "Embedding cache hits", ["tier"]
+)
+EMBEDDING_CACHE_MISSES = Counter(
+    "embedding_cache_misses_total", "Embeddings not found in any cache tier"
+)
+EMBEDDING_CACHE_EVICTIONS = Counter(
+    "embedding_cache_evictions_total", "Embeddings evicted from a cache tier", ["tier"]
+)
+
+MEMORY_TIER = "memory"
+DISK_TIER = "disk"
+
+# Disk entries pruned past the limit are checked once every this many writes
+DISK_PRUNE_INTERVAL = 1000
+
+
+def get_cache_key(provider: str, model_id: str, embedding_size: int, document_type: str, text: str) -> str:
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{provider}:{model_id}:{embedding_size}:{document_type}:{text_hash}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    The memory tier is an LRU bounded by the bytes of the vectors it holds.
+    The disk tier is a SQLite file in WAL mode, so every worker process on
+    the host reads and fills the same cache. Vectors are stored as float32.
+    """
+
+    def __init__(self, db_path: str, memory_max_bytes: int = 67108864, disk_max_entries: int = 1000000):
+        self.db_path = db_path
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_entries = disk_max_entries
+
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.writes = 0
+        self.logger = logging.getLogger(__name__)
+
+        with self.connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+
+    def connect(self) -> sqlite3.Connection:
+        # sqlite connections can't be shared between threads, keep one per thread
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def to_blob(vector: list) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def from_blob(blob: bytes) -> list:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get_many(self, keys: List[str]) -> Dict[str, list]:
+        found = {}
+        with self.lock:
+            for key in keys:
+                blob = self.memory.get(key)
+                if blob is not None:
+                    self.memory.move_to_end(key)
+                    found[key] = self.from_blob(blob)
+        if found:
+            EMBEDDING_CACHE_HITS.labels(tier=MEMORY_TIER).inc(len(found))
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            disk_found = self.get_from_disk(missing)
+            if disk_found:
+                EMBEDDING_CACHE_HITS.labels(tier=DISK_TIER).inc(len(disk_found))
+                self.put_in_memory(disk_found)
+                found.update({key: self.from_blob(blob) for key, blob in disk_found.items()})
+            if len(missing) > len(disk_found):
+                EMBEDDING_CACHE_MISSES.inc(len(missing) - len(disk_found))
+
+        return found
+
+    def put_many(self, vectors: Dict[str, list]):
+        blobs = {key: self.to_blob(vector) for key, vector in vectors.items() if vector}
+        if not blobs:
+            return
+        self.put_in_memory(blobs)
+        self.put_on_disk(blobs)
+
+    def put_in_memory(self, blobs: Dict[str, bytes]):
+        evicted = 0
+        with self.lock:
+            for key, blob in blobs.items():
+                previous = self.memory.pop(key, None)
+                if previous is not None:
+                    self.memory_bytes -= len(previous)
+                self.memory[key] = blob
+                self.memory_bytes += len(blob)
+
+            while self.memory_bytes > self.memory_max_bytes and self.memory:
+                _, blob = self.memory.popitem(last=False)
+                self.memory_bytes -= len(blob)
+                evicted += 1
+
+        if evicted:
+            EMBEDDING_CACHE_EVICTIONS.labels(tier=MEMORY_TIER).inc(evicted)
+
+    def get_from_disk(self, keys: List[str]) -> Dict[str, bytes]:
+        found = {}
+        try:
+            connection = self.connect()
+            # stay under sqlite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                with connection:
+                    connection.executemany(
+                        "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                        [(time.time(), key) for key in found]
+                    )
+        except sqlite3.Error as e:
+            # the disk tier is an optimization, a locked or broken file only costs misses
+            self.logger.warning(f"Embedding cache read failed: {e}")
+        return found
+
+    def put_on_disk(self, blobs: Dict[str, bytes]):
+        try:
+            connection = self.connect()
+            now = time.time()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)",
+                    [(key, blob, now) for key, blob in blobs.items()]
+                )
+
+            self.writes += len(blobs)
+            if self.writes >= DISK_PRUNE_INTERVAL:
+                self.writes = 0
+                self.prune_disk(connection)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache write failed: {e}")
+
+    def prune_disk(self, connection: sqlite3.Connection):
+        """Drop the least recently used entries past disk_max_entries"""
+        with connection:
+            count = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            excess = count - self.disk_max_entries
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                    (excess,)
+                )
+                EMBEDDING_CACHE_EVICTIONS.labels(tier=DISK_TIER).inc(excess)
+
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+
+class CachedEmbeddingProvider(LLMInterface):
+    """
+    Puts an EmbeddingCache in front of any provider. Generation is passed
+    through untouched; only texts missing from the cache reach the provider.
+    """
+
+    def __init__(self, provider: LLMInterface, provider_name: str, cache: EmbeddingCache):
+        self.provider = provider
+        self.provider_name = provider_name
+        self.cache = cache
+
+    @property
+    def embedding_model_id(self):
+        return self.provider.embedding_model_id
+
+    @property
+    def embedding_size(self):
+        return self.provider.embedding_size
+
+    @property
+    def generation_model_id(self):
+        return self.provider.generation_model_id
+
+    def set_generation_model(self, model_id: str):
+        return self.provider.set_generation_model(model_id=model_id)
+
+    def set_embedding_model(self, model_id: str, embedding_size: int | None = None):
+        return self.provider.set_embedding_model(model_id=model_id, embedding_size=embedding_size)
+
+    def generate_text(self, prompt: str, chat_history: list | None = None,
+                      max_output_token: int | None = None, temperature: float | None = None):
+        return self.provider.generate_text(
+            prompt=prompt,
+            chat_history=chat_history,
+            max_output_token=max_output_token,
+            temperature=temperature
+        )
+
+    async def generate_text_async(self, prompt: str, chat_history: list | None = None,
+                                  max_output_token: int | None = None, temperature: float | None = None):
+        return await self.provider.generate_text_async(
+            prompt=prompt,
+            chat_history=chat_history,
+            max_output_token=max_output_token,
+            temperature=temperature
+        )
+
+    def construct_prompt(self, prompt: str, role: str):
+        return self.provider.construct_prompt(prompt=prompt, role=role)
+
+    def embd_text(self, text: str, document_type: str = None):
+        vectors = self.embed_texts([text], document_type=document_type)
+        return vectors[0] if vectors else None
+
+    def get_keys(self, texts: list, document_type: str = None) -> List[str]:
+        return [
+            get_cache_key(self.provider_name, self.embedding_model_id, self.embedding_size, document_type, text)
+            for text in texts
+        ]
+
+    @staticmethod
+    def get_missing(keys: List[str], texts: list, cached: Dict[str, list]) -> Dict[str, str]:
+        # each distinct missing text is embedded once, even if repeated in the input
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        return missing
+
+    @staticmethod
+    def get_embedded(missing: Dict[str, str], vectors: Optional[list]) -> Dict[str, list]:
+        if vectors is None:
+            vectors = [None] * len(missing)
+        return {key: vector for key, vector in zip(missing, vectors) if vector}
+
+    def embed_texts(self, texts: list, document_type: str = None):
+        keys = self.get_keys(texts, document_type)
+        cached = self.cache.get_many(keys)
+
+        missing = self.get_missing(keys, texts, cached)
+        if missing:
+            vectors = self.provider.embed_texts(list(missing.values()), document_type=document_type)
+            embedded = self.get_embedded(missing, vectors)
+            self.cache.put_many(embedded)
+            cached.update(embedded)
+
+        return [cached.get(key) for key in keys]
+
+    async def embd_text_async(self, text: str, document_type: str = None):
+        vectors = await self.embed_texts_async([text], document_type=document_type)
+        return vectors[0] if vectors else None
+
+    async def embed_texts_async(self, texts: list, document_type: str = None):
+        keys = self.get_keys(texts, document_type)
+        # sqlite reads and writes are blocking, run them off the event loop
+        cached = await asyncio.to_thread(self.cache.get_many, keys)
+
+        missing = self.get_missing(keys, texts, cached)
+        if missing:
+            vectors = await self.provider.embed_texts_async(list(missing.values()), document_type=document_type)
+            embedded = self.get_embedded(missing, vectors)
+            await asyncio.to_thread(self.cache.put_many, embedded)
+            cached.update(embedded)
+
+        return [cached.get(key) for key in keys]
@@ -4,6 +4,7 @@ class LLMEnum(Enum):
     OPENAI="OPENAI"
     COHERE="COHERE"
     OLLAMA="OLLAMA"
+    LOCAL="LOCAL"
 
 class OpenAIEnum(Enum):
     SYSTEM="system"
@@ -18,6 +19,10 @@ class CohereEnum(Enum):
     Query="search_query"
 
 
+class LocalEnum(Enum):
+    HASHING="hashing"
+
+
 class DocumentEnum(Enum):
     DOCUMENT="document"
     QUERY="query"
\ No newline at end of file
@@ -1,26 +1,74 @@
-from httpx._transports import default
+import os
 from .LLMEnum import LLMEnum
+from .providers import OpenaiProvider, CohereProvider, LocalProvider
+from .AsyncHttpPool import AsyncHttpPool
+from .RateScheduler import RateScheduler
+from controllers.BaseController import BaseController
+
 class LLMFactory:
     def __init__(self,config:dict):
         self.config=config
+        # one scheduler per backend: clients of the same vendor share its rate limits
+        self.schedulers={}
+
+    def get_scheduler(self,provider:str):
+        if provider not in self.schedulers:
+            self.schedulers[provider]=RateScheduler(
+                requests_per_minute=self.config.LLM_REQUESTS_PER_MINUTE,
+                tokens_per_minute=self.config.LLM_TOKENS_PER_MINUTE,
+                model_limits=self.config.LLM_MODEL_RATE_LIMITS,
+                max_throttle_retries=self.config.LLM_MAX_THROTTLE_RETRIES,
+                shared_path=self.get_rate_limit_path()
+            )
+        return self.schedulers[provider]
+
+    def get_rate_limit_path(self):
+        # the uvicorn workers of a host share one budget file, else each would spend the full rate
+        if not self.config.LLM_RATE_LIMIT_PATH:
+            return None
+        return os.path.join(
+            BaseController().get_database_path(db_name=self.config.LLM_RATE_LIMIT_PATH),
+            "rate_limits.sqlite3"
+        )
+
+    def get_http_client(self):
+        return AsyncHttpPool.get_client(
+            max_connections=self.config.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            timeout=self.config.LLM_HTTP_TIMEOUT
+        )
 
     def create(self,provider:str):
         if provider == LLMEnum.OPENAI.value:
-            return(
+            return OpenaiProvider(
                 api_key=self.config.OPENAI_API_KEY,
                 api_url=self.config.OPENAI_API_URL,
-                default_input_max_char=self.config.INPUT_DEFAULT_MAX_CHAR,
-                default_generation_max_output_token=self.config.GENERATION_DEFAULT_MAX_TOKEN,
-                default_generation_temperature=self.config.GENERATION_DEFAULT_TEMPERATURE
+                defualt_input_max_char=self.config.INPUT_DEFAULT_MAX_CHAR,
+                defualt_output_max_token=self.config.GENERATION_DEFAULT_MAX_TOKEN,
+                defualt_gen_temp=self.config.GENERATION_DEFAULT_TEMPERATURE,
+                embedding_batch_size=self.config.EMBEDDING_BATCH_SIZE,
+                embedding_batch_max_chars=self.config.EMBEDDING_BATCH_MAX_CHARS,
+                max_concurrency=self.config.LLM_MAX_CONCURRENCY,
+                http_client=self.get_http_client(),
+                scheduler=self.get_scheduler(provider)
             )
         if provider == LLMEnum.COHERE.value:
-             return(
+            return CohereProvider(
                 api_key=self.config.COHERE_API_KEY,
-                api_url=self.config.OPENAI_API_URL,
-                default_input_max_char=self.config.INPUT_DEFAULT_MAX_CHAR,
-                default_generation_max_output_token=self.config.GENERATION_DEFAULT_MAX_TOKEN,
-                default_generation_temperature=self.config.GENERATION_DEFAULT_TEMPERATURE
+                defualt_input_max_char=self.config.INPUT_DEFAULT_MAX_CHAR,
+                defualt_output_max_token=self.config.GENERATION_DEFAULT_MAX_TOKEN,
+                defualt_gen_temp=self.config.GENERATION_DEFAULT_TEMPERATURE,
+                embedding_batch_size=self.config.EMBEDDING_BATCH_SIZE,
+                embedding_batch_max_chars=self.config.EMBEDDING_BATCH_MAX_CHARS,
+                max_concurrency=self.config.LLM_MAX_CONCURRENCY,
+                http_client=self.get_http_client(),
+                scheduler=self.get_scheduler(provider)
+            )
+        if provider == LLMEnum.LOCAL.value:
+            return LocalProvider(
+                model_cache_dir=self.config.LOCAL_MODEL_CACHE_DIR,
+                embedding_batch_size=self.config.LOCAL_EMBEDDING_BATCH_SIZE,
+                num_threads=self.config.LOCAL_EMBEDDING_THREADS or None
             )
 
-            
         return None
@@ -14,10 +14,29 @@ class LLMInterface(ABC):
     max_output_token:int|None=None,temperature:float|None=None):
         pass
 
+    @abstractmethod
+    async def generate_text_async(self,prompt:str,chat_history:list|None=None,
+    max_output_token:int|None=None,temperature:float|None=None):
+        """generate_text without blocking the event loop"""
+        pass
+
     @abstractmethod
     def embd_text(self,text:str,document_type:str=None):
         pass
 
+    @abstractmethod
+    async def embd_text_async(self,text:str,document_type:str=None):
+        pass
+
+    @abstractmethod
+    def embed_texts(self,texts:list,document_type:str=None):
+        """Embed many texts in batched requests; vectors keep the input order, None where embedding failed"""
+        pass
+
+    @abstractmethod
+    async def embed_texts_async(self,texts:list,document_type:str=None):
+        pass
+
     @abstractmethod
     def construct_prompt(self,prompt:str,role:str):
         pass
\ No newline at end of file
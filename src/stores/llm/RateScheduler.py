@@ -0,0 +1,343 @@
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from .LLMEnum import DocumentEnum
+
+# Lower runs first: query embeddings and generation go ahead of bulk indexing
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Longest single sleep of a waiting caller, it re-checks its budget after that
+MAX_WAIT_STEP = 1.0
+# How often bulk callers look again while interactive ones are waiting
+BULK_YIELD_SECONDS = 0.05
+# Statuses of a request refused for its inputs (too long, empty, malformed), not for the call
+INPUT_ERROR_STATUSES = (400, 413, 422)
+
+
+def get_priority(document_type: str = None) -> int:
+    return PRIORITY_INTERACTIVE if document_type == DocumentEnum.QUERY.value else PRIORITY_BULK
+
+
+def estimate_tokens(texts) -> int:
+    # about four characters per token for the vendor tokenizers, good enough for budgeting
+    return sum(len(text) for text in texts) // 4 + len(texts)
+
+
+def get_status(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(error, "status_code", None) or getattr(response, "status_code", None)
+
+
+def is_input_error(error: Exception) -> bool:
+    """Whether a provider SDK exception rejects the request's inputs, so other inputs may pass"""
+    return get_status(error) in INPUT_ERROR_STATUSES or type(error).__name__ in ("BadRequestError", "UnprocessableEntityError")
+
+
+def get_throttle(error: Exception) -> Tuple[bool, Optional[float]]:
+    """(throttled, retry_after seconds) for an exception raised by a provider SDK"""
+    response = getattr(error, "response", None)
+    status = get_status(error)
+    throttled = status == 429 or type(error).__name__ in ("RateLimitError", "TooManyRequestsError")
+    if not throttled:
+        return False, None
+
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return True, float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return True, float(retry_after)
+        except ValueError:
+            try:
+                return True, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return True, None
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 units a second, holds at most burst_seconds of budget"""
+
+    def __init__(self, per_minute: int, burst_seconds: float = 10.0, now: float = None):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_wait(self, amount: float, now: float) -> float:
+        self.refill(now)
+        # a request larger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class ModelBudget:
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, now: float = None):
+        self.requests = TokenBucket(requests_per_minute, now=now) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, now=now) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self.throttles = 0
+        self.batch_size = None
+        self.max_batch_size = None
+        self.interactive_waiting = 0
+        # set by a caller that took budget or paused the model, only then is shared state written back
+        self.changed = False
+
+
+class SharedBudgets:
+    """
+    Bucket levels and throttle pauses of each model in a SQLite file in WAL
+    mode, so the worker processes of a host spend one budget between them
+    instead of one each. Times are wall-clock seconds, shared by the processes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.connect().execute(
+            "CREATE TABLE IF NOT EXISTS budgets (model_id TEXT PRIMARY KEY, requests REAL, requests_updated REAL, "
+            "tokens REAL, tokens_updated REAL, blocked_until REAL NOT NULL)"
+        )
+
+    def connect(self) -> sqlite3.Connection:
+        # sqlite connections can't be shared between threads, keep one per thread
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def load(bucket: Optional[TokenBucket], level: Optional[float], updated: Optional[float]):
+        if bucket is not None and level is not None:
+            bucket.level, bucket.updated = level, updated
+
+    @staticmethod
+    def dump(bucket: Optional[TokenBucket]) -> Tuple[Optional[float], Optional[float]]:
+        return (None, None) if bucket is None else (bucket.level, bucket.updated)
+
+    @contextmanager
+    def transaction(self, model_id: str, budget: ModelBudget):
+        """
+        Loads the model's shared state into budget and, if the caller changed it,
+        writes it back, in one write transaction
+        """
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # other threads of the process use the same budget, only inside their own transaction
+            budget.changed = False
+            row = connection.execute(
+                "SELECT requests, requests_updated, tokens, tokens_updated, blocked_until FROM budgets WHERE model_id = ?",
+                (model_id,)
+            ).fetchone()
+            if row is not None:
+                self.load(budget.requests, row[0], row[1])
+                self.load(budget.tokens, row[2], row[3])
+                budget.blocked_until = row[4]
+            yield
+            if budget.changed:
+                connection.execute(
+                    "INSERT OR REPLACE INTO budgets VALUES (?, ?, ?, ?, ?, ?)",
+                    (model_id, *self.dump(budget.requests), *self.dump(budget.tokens), budget.blocked_until)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+
+class RateScheduler:
+    """
+    Paces provider calls against per-model request and token budgets.
+
+    Callers wait for both buckets and for any pause a 429 imposed, honoring
+    Retry-After or else backing off exponentially with full jitter. Bulk callers
+    yield while interactive ones are waiting on the same model. The suggested
+    embedding batch size shrinks by half on every 429 and grows back by
+    batch_size_step per successful call.
+    Budgets are per process unless shared_path names a SQLite file, which
+    the worker processes of a host then spend their budgets and pauses from.
+    Usable from threads and from the event loop; async callers reach the
+    SQLite file from a thread, its locks can be held by other workers.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 model_limits: Dict[str, dict] = None, max_throttle_retries: int = 8,
+                 backoff_seconds: float = 1.0, max_backoff_seconds: float = 60.0,
+                 min_batch_size: int = 1, batch_size_step: int = 4, shared_path: str = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = model_limits or {}
+        self.max_throttle_retries = max_throttle_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.min_batch_size = max(1, min_batch_size)
+        self.batch_size_step = max(1, batch_size_step)
+
+        self.shared = SharedBudgets(shared_path) if shared_path else None
+        # bucket times must mean the same in every process sharing them
+        self.clock = time.time if self.shared is not None else time.monotonic
+
+        self.budgets: Dict[str, ModelBudget] = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def get_budget(self, model_id: str) -> ModelBudget:
+        budget = self.budgets.get(model_id)
+        if budget is None:
+            limits = self.model_limits.get(model_id, {})
+            budget = ModelBudget(
+                requests_per_minute=limits.get("requests_per_minute", self.requests_per_minute),
+                tokens_per_minute=limits.get("tokens_per_minute", self.tokens_per_minute),
+                now=self.clock()
+            )
+            self.budgets[model_id] = budget
+        return budget
+
+    def lock_buckets(self, model_id: str, budget: ModelBudget):
+        """
+        Exclusive use of the model's buckets and pause: the SQLite write transaction when
+        shared, which serializes this process's threads too, else the process lock
+        """
+        if self.shared is None:
+            return self.lock
+        return self.shared.transaction(model_id, budget)
+
+    async def run_locked(self, fn, *args):
+        # a shared transaction may wait up to the busy timeout for other workers, not on the event loop
+        if self.shared is None:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    def reserve(self, model_id: str, tokens: int, priority: int) -> float:
+        """Takes the budget of one call and returns 0, or returns how long to wait before asking again"""
+        with self.lock:
+            budget = self.get_budget(model_id)
+            if priority > PRIORITY_INTERACTIVE and budget.interactive_waiting:
+                return BULK_YIELD_SECONDS
+
+        with self.lock_buckets(model_id, budget):
+            now = self.clock()
+            wait = budget.blocked_until - now
+            if budget.requests is not None:
+                wait = max(wait, budget.requests.get_wait(1, now))
+            if budget.tokens is not None:
+                wait = max(wait, budget.tokens.get_wait(tokens, now))
+            if wait > 0:
+                return wait
+
+            if budget.requests is not None:
+                budget.requests.take(1)
+            if budget.tokens is not None:
+                budget.tokens.take(tokens)
+            budget.changed = True
+            return 0.0
+
+    def set_waiting(self, model_id: str, priority: int, delta: int):
+        if priority == PRIORITY_INTERACTIVE:
+            with self.lock:
+                self.get_budget(model_id).interactive_waiting += delta
+
+    def acquire(self, model_id: str, tokens: int = 0, priority: int = PRIORITY_BULK):
+        self.set_waiting(model_id, priority, 1)
+        try:
+            while (wait := self.reserve(model_id, tokens, priority)) > 0:
+                time.sleep(min(wait, MAX_WAIT_STEP))
+        finally:
+            self.set_waiting(model_id, priority, -1)
+
+    async def acquire_async(self, model_id: str, tokens: int = 0, priority: int = PRIORITY_BULK):
+        self.set_waiting(model_id, priority, 1)
+        try:
+            while (wait := await self.run_locked(self.reserve, model_id, tokens, priority)) > 0:
+                await asyncio.sleep(min(wait, MAX_WAIT_STEP))
+        finally:
+            self.set_waiting(model_id, priority, -1)
+
+    def on_throttled(self, model_id: str, retry_after: Optional[float] = None):
+        with self.lock:
+            budget = self.get_budget(model_id)
+            budget.throttles += 1
+            if retry_after is None:
+                # full jitter keeps workers that were throttled together from retrying together
+                ceiling = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (budget.throttles - 1))
+                retry_after = random.uniform(0, ceiling)
+            if budget.batch_size is not None:
+                budget.batch_size = max(self.min_batch_size, budget.batch_size // 2)
+
+        with self.lock_buckets(model_id, budget):
+            budget.blocked_until = max(budget.blocked_until, self.clock() + retry_after)
+            budget.changed = True
+        self.logger.warning(
+            f"{model_id} throttled, pausing {retry_after:.2f}s, batch size {budget.batch_size}"
+        )
+
+    def on_success(self, model_id: str):
+        with self.lock:
+            budget = self.get_budget(model_id)
+            budget.throttles = 0
+            if budget.batch_size is not None:
+                budget.batch_size = min(budget.max_batch_size, budget.batch_size + self.batch_size_step)
+
+    def get_batch_size(self, model_id: str, max_batch_size: int) -> int:
+        with self.lock:
+            budget = self.get_budget(model_id)
+            if budget.max_batch_size != max_batch_size:
+                budget.max_batch_size = max_batch_size
+                budget.batch_size = max_batch_size if budget.batch_size is None else min(budget.batch_size, max_batch_size)
+            return budget.batch_size
+
+    def call(self, fn, *args, model_id: str, tokens: int = 0, priority: int = PRIORITY_BULK, **kwargs):
+        """fn(*args, **kwargs) within the model's budget, retried while the vendor throttles it"""
+        for attempt in range(self.max_throttle_retries + 1):
+            self.acquire(model_id, tokens, priority)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                throttled, retry_after = get_throttle(e)
+                if not throttled or attempt == self.max_throttle_retries:
+                    raise
+                self.on_throttled(model_id, retry_after)
+                continue
+            self.on_success(model_id)
+            return result
+
+    async def call_async(self, fn, *args, model_id: str, tokens: int = 0, priority: int = PRIORITY_BULK, **kwargs):
+        for attempt in range(self.max_throttle_retries + 1):
+            await self.acquire_async(model_id, tokens, priority)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                throttled, retry_after = get_throttle(e)
+                if not throttled or attempt == self.max_throttle_retries:
+                    raise
+                await self.run_locked(self.on_throttled, model_id, retry_after)
+                continue
+            self.on_success(model_id)
+            return result
@@ -1,2 +1,4 @@
 from .providers.CohereProvider import CohereProvider
-from .providers.CohereProvider import OpenaiProvider
+from .providers.OpenaiProvider import OpenaiProvider
+from .providers.LocalProvider import LocalProvider
+from .EmbeddingCache import EmbeddingCache, CachedEmbeddingProvider
@@ -1,20 +1,34 @@
+import asyncio
 import logging
-from ...LLMInterface import LLMInterface
-from ...LLMEnum import CohereEnum, DocumentEnum
+from ..LLMInterface import LLMInterface
+from ..LLMEnum import CohereEnum, DocumentEnum
+from ..EmbeddingBatcher import EmbeddingBatcher
+from ..RateScheduler import RateScheduler, PRIORITY_INTERACTIVE, estimate_tokens, get_priority
+from functools import partial
 import cohere
 
+# Most texts the embed endpoint takes in one request
+COHERE_MAX_EMBEDDING_BATCH=96
+
 
 class CohereProvider(LLMInterface):
 
     def __init__(self,api_key:str,api_url:str|None=None,
                       defualt_input_max_char:int=50,
                       defualt_output_max_token:int=50,
-                      defualt_gen_temp:float=0.1):
+                      defualt_gen_temp:float=0.1,
+                      embedding_batch_size:int=96,
+                      embedding_batch_max_chars:int=200000,
+                      max_concurrency:int=8,
+                      http_client=None,
+                      scheduler:RateScheduler|None=None):
         self.api_key=api_key
         self.api_url=api_url
         self.defualt_input_max_char=defualt_input_max_char
         self.defualt_output_max_token=defualt_output_max_token
         self.defualt_gen_temp=defualt_gen_temp
+        self.embedding_batch_size=min(embedding_batch_size,COHERE_MAX_EMBEDDING_BATCH)
+        self.embedding_batch_max_chars=embedding_batch_max_chars
 
         self.generation_model_id=None
         self.embedding_model_id=None
@@ -24,93 +38,162 @@ class CohereProvider(LLMInterface):
             self.client=cohere.Client(api_key=self.api_key, base_url=self.api_url)
         else:
             self.client=cohere.Client(api_key=self.api_key)
-        
+
+        # async routes use the async client, its connections come from the shared pool
+        async_options={"base_url": self.api_url} if self.api_url else {}
+        self.async_client=cohere.AsyncClient(api_key=self.api_key, httpx_client=http_client, **async_options)
+
+        # caps this provider's in-flight async requests
+        self.semaphore=asyncio.Semaphore(max_concurrency)
+        # paces calls against the vendor's rate limits and retries its 429s
+        self.scheduler=scheduler or RateScheduler()
+
         self.logger=logging.getLogger(__name__)
 
     def set_generation_model(self,model_id:str):
         self.generation_model_id=model_id
-    
+
     def set_embedding_model(self,model_id:str,embedding_size:int):
         self.embedding_model_id=model_id
         self.embedding_size=embedding_size
 
     def process_text(self,text:str):
         return text[:self.defualt_input_max_char].strip()
-    
-    def generate_text(self,prompt:str,chat_history: list|None=None,
-    max_output_token:int|None=None,temperature:float|None=None):
+
+    def can_generate(self):
         if not self.client:
             self.logger.error("Cohere client was not set")
-            return None
-
+            return False
         if not self.generation_model_id:
             self.logger.error("Generation model for cohere was not set")
-            return None
+            return False
+        return True
 
+    def can_embed(self):
+        if not self.client:
+            self.logger.error("cohere client was not set")
+            return False
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for cohere was not set")
+            return False
+        return True
+
+    def get_chat_request(self,prompt:str,chat_history: list|None=None,
+    max_output_token:int|None=None,temperature:float|None=None):
         max_tokens = max_output_token if max_output_token is not None else self.defualt_output_max_token
         temperature = temperature if temperature is not None else self.defualt_gen_temp
 
-        history = list(chat_history) if chat_history else []
         # Cohere expects chat_history as list of {role, message}
-        response = self.client.chat(
-            model=self.generation_model_id,
-            messages=None, # not used in Cohere
-            chat_history=history,
-            message=self.process_text(prompt),
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-
+        return {
+            "model": self.generation_model_id,
+            "chat_history": list(chat_history) if chat_history else [],
+            "message": self.process_text(prompt),
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+    def get_chat_text(self,response):
         if not response or not getattr(response, 'text', None):
             self.logger.error("Error while generating text with Cohere")
             return None
         return response.text
 
-    def embd_text(self,text:str,document_type:str=None):
-        if not self.client:
-            self.logger.error("Cohere client was not set")
-            return None
-        if not self.embedding_model_id:
-            self.logger.error("Embedding model for Cohere was not set")
+    def generate_text(self,prompt:str,chat_history: list|None=None,
+    max_output_token:int|None=None,temperature:float|None=None):
+        if not self.can_generate():
             return None
 
-        resp = self.client.embed(
-            model=self.embedding_model_id,
-            input_type=document_type if document_type else None,
-            texts=[text]
+        request = self.get_chat_request(prompt,chat_history,max_output_token,temperature)
+        response = self.scheduler.call(
+            self.client.chat, **request,
+            model_id=self.generation_model_id,
+            tokens=self.get_chat_tokens(prompt,chat_history,request),
+            priority=PRIORITY_INTERACTIVE
         )
-        if not resp or not getattr(resp, 'embeddings', None) or len(resp.embeddings)==0:
-            self.logger.error("Error while embedding text with Cohere")
+        return self.get_chat_text(response)
+
+    async def generate_text_async(self,prompt:str,chat_history: list|None=None,
+    max_output_token:int|None=None,temperature:float|None=None):
+        if not self.can_generate():
             return None
-        return resp.text
+
+        request = self.get_chat_request(prompt,chat_history,max_output_token,temperature)
+        response = await self.scheduler.call_async(
+            self.send_chat_async, request,
+            model_id=self.generation_model_id,
+            tokens=self.get_chat_tokens(prompt,chat_history,request),
+            priority=PRIORITY_INTERACTIVE
+        )
+        return self.get_chat_text(response)
+
+    async def send_chat_async(self,request:dict):
+        async with self.semaphore:
+            return await self.async_client.chat(**request)
+
+    def get_chat_tokens(self,prompt:str,chat_history:list|None,request:dict):
+        # prompt and history count against the token budget, and so does the longest answer
+        return estimate_tokens([prompt]+[str(message) for message in chat_history or []])+request["max_tokens"]
 
     def embd_text(self,text:str,document_type:str=None):
-        if not self.client:
-            self.logger.error("cohere client was not set")
+        vectors=self.embed_texts([text],document_type=document_type)
+        return vectors[0] if vectors else None
+
+    async def embd_text_async(self,text:str,document_type:str=None):
+        vectors=await self.embed_texts_async([text],document_type=document_type)
+        return vectors[0] if vectors else None
+
+    def get_batcher(self,embed_batch,document_type:str=None):
+        return EmbeddingBatcher(
+            embed_batch=partial(embed_batch,document_type=document_type),
+            max_batch_items=self.embedding_batch_size,
+            max_batch_chars=self.embedding_batch_max_chars,
+            scheduler=self.scheduler,
+            model_id=self.embedding_model_id,
+            priority=get_priority(document_type)
+        )
+
+    def embed_texts(self,texts:list,document_type:str=None):
+        if not self.can_embed():
             return None
-        if not self.embedding_model_id:
-            self.logger.error("Embedding model for cohere was not set")
+        return self.get_batcher(self.embed_batch,document_type).embed(texts)
+
+    async def embed_texts_async(self,texts:list,document_type:str=None):
+        if not self.can_embed():
             return None
-        input_type=CohereEnum.Document
-        if document_type==DocumentEnum.QUERY:
-            input_type=CohereEnum.Query
-
-        response = self.client.embed(
-            model=self.embedding_model_id,
-            input_type=input_type,
-            texts=[self.process_text(text)],
-            embedding_types=['float']
-        )
+        return await self.get_batcher(self.embed_batch_async,document_type).embed_async(texts)
+
+    def get_input_type(self,document_type:str=None):
+        if document_type==DocumentEnum.QUERY.value:
+            return CohereEnum.Query.value
+        return CohereEnum.Document.value
 
+    def get_embed_request(self,texts:list,document_type:str=None):
+        return {
+            "model": self.embedding_model_id,
+            "input_type": self.get_input_type(document_type),
+            "texts": texts,
+            "embedding_types": ['float']
+        }
+
+    def get_vectors(self,response):
         if not response or not response.embeddings or not response.embeddings.float:
-            self.logger.error("Error while embedding text with cohere")
+            self.logger.error("Error while embedding texts with cohere")
             return None
+        return response.embeddings.float
+
+    def embed_batch(self,texts:list,document_type:str=None):
+        """One embed request for a whole batch"""
+        response = self.client.embed(**self.get_embed_request(texts,document_type))
+        return self.get_vectors(response)
 
-        return response.embeddings.float[0]
+    async def embed_batch_async(self,texts:list,document_type:str=None):
+        async with self.semaphore:
+            response = await self.async_client.embed(**self.get_embed_request(texts,document_type))
+        return self.get_vectors(response)
 
 
     def construct_prompt(self,prompt:str,role:str):
         return {
             "role": role,
             "content": self.process_text(prompt)
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ..LLMInterface import LLMInterface
+from ..LLMEnum import LocalEnum
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEncoder:
+    """
+    Dependency-free text encoder: word unigrams and bigrams are hashed into a
+    fixed number of signed buckets, scaled by log term frequency and L2
+    normalized. Hashes are crc32, stable across processes and restarts.
+    """
+
+    def __init__(self, embedding_size: int = 384):
+        self.embedding_size = embedding_size
+
+    def get_hashes(self, text: str) -> list:
+        words = TOKEN_PATTERN.findall(text.lower())
+        features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        return [zlib.crc32(feature.encode("utf-8")) for feature in features]
+
+    def encode(self, texts: list) -> np.ndarray:
+        hashes = [self.get_hashes(text) for text in texts]
+        counts = np.fromiter((len(h) for h in hashes), dtype=np.int64, count=len(texts))
+        flat = np.fromiter((value for h in hashes for value in h), dtype=np.uint32, count=int(counts.sum()))
+
+        # the whole batch is scattered into one (texts x size) matrix in a single bincount
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), counts)
+        columns = (flat % self.embedding_size).astype(np.int64)
+        signs = np.where(flat >> 31, -1.0, 1.0)
+        vectors = np.bincount(
+            rows * self.embedding_size + columns,
+            weights=signs,
+            minlength=len(texts) * self.embedding_size
+        ).reshape(len(texts), self.embedding_size)
+
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class LocalProvider(LLMInterface):
+    """
+    Embeds on the local CPU, no network access needed. The embedding model is
+    either LocalEnum.HASHING or a sentence-transformers model already present
+    on disk (a path, or a name found in model_cache_dir).
+    Batches are spread over a thread pool sized to the cores. Text generation
+    is not supported.
+    """
+
+    def __init__(self, model_cache_dir: str | None = None,
+                 embedding_batch_size: int = 64,
+                 num_threads: int | None = None):
+        self.model_cache_dir = model_cache_dir
+        self.embedding_batch_size = max(1, embedding_batch_size)
+        self.num_threads = num_threads or os.cpu_count() or 1
+
+        self.generation_model_id = None
+        self.embedding_model_id = None
+        self.embedding_size = None
+        self.encoder = None
+
+        self.executor = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix="local-embed")
+        self.logger = logging.getLogger(__name__)
+
+    def set_generation_model(self, model_id: str):
+        self.generation_model_id = model_id
+
+    def set_embedding_model(self, model_id: str, embedding_size: int | None = None):
+        self.embedding_model_id = model_id
+
+        if model_id == LocalEnum.HASHING.value:
+            self.encoder = HashingEncoder(embedding_size=embedding_size or 384)
+            self.embedding_size = self.encoder.embedding_size
+            return
+
+        # imported here, torch is only loaded when a model is actually used
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        # every pool thread runs its own batch on one core instead of all threads sharing all cores
+        torch.set_num_threads(1)
+        self.encoder = SentenceTransformer(model_id, device="cpu", cache_folder=self.model_cache_dir)
+        self.embedding_size = self.encoder.get_sentence_embedding_dimension()
+        if embedding_size and embedding_size != self.embedding_size:
+            self.logger.warning(
+                f"Configured embedding size {embedding_size} differs from {model_id} ({self.embedding_size})"
+            )
+
+    def generate_text(self, prompt: str, chat_history: list | None = None,
+                      max_output_token: int | None = None, temperature: float | None = None):
+        self.logger.error("Text generation is not supported by the local provider")
+        return None
+
+    async def generate_text_async(self, prompt: str, chat_history: list | None = None,
+                                  max_output_token: int | None = None, temperature: float | None = None):
+        return self.generate_text(prompt, chat_history, max_output_token, temperature)
+
+    def embd_text(self, text: str, document_type: str = None):
+        vectors = self.embed_texts([text], document_type=document_type)
+        return vectors[0] if vectors else None
+
+    async def embd_text_async(self, text: str, document_type: str = None):
+        vectors = await self.embed_texts_async([text], document_type=document_type)
+        return vectors[0] if vectors else None
+
+    def encode_batch(self, texts: list) -> np.ndarray:
+        if isinstance(self.encoder, HashingEncoder):
+            return self.encoder.encode(texts)
+        return self.encoder.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+
+    def embed_texts(self, texts: list, document_type: str = None):
+        if self.encoder is None:
+            self.logger.error("Embedding model for the local provider was not set")
+            return None
+        if not texts:
+            return []
+
+        batches = [
+            texts[start:start + self.embedding_batch_size]
+            for start in range(0, len(texts), self.embedding_batch_size)
+        ]
+        vectors = []
+        for batch_vectors in self.executor.map(self.encode_batch, batches):
+            vectors.extend(batch_vectors.tolist())
+        return vectors
+
+    async def embed_texts_async(self, texts: list, document_type: str = None):
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed_texts, texts, document_type)
+
+    def construct_prompt(self, prompt: str, role: str):
+        return {
+            "role": role,
+            "content": prompt
+        }
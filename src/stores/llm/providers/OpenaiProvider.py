@@ -1,87 +1,191 @@
+import asyncio
 import logging
-from ...LLMInterface import LLMInterface
-from ...LLMEnum import OpenAIEnum
-from openai import OpenAI
+from ..LLMInterface import LLMInterface
+from ..LLMEnum import OpenAIEnum
+from ..EmbeddingBatcher import EmbeddingBatcher
+from ..RateScheduler import RateScheduler, PRIORITY_INTERACTIVE, estimate_tokens, get_priority
+from openai import OpenAI, AsyncOpenAI
+from functools import partial
+
+# Most inputs the embeddings endpoint takes in one request
+OPENAI_MAX_EMBEDDING_BATCH=2048
 
 class OpenaiProvider(LLMInterface):
 
     def __init__(self,api_key:str,api_url:str|None=None,
                       defualt_input_max_char:int=50,
                       defualt_output_max_token:int=50,
-                      defualt_gen_temp:float=0.1):
-        
+                      defualt_gen_temp:float=0.1,
+                      embedding_batch_size:int=256,
+                      embedding_batch_max_chars:int=200000,
+                      max_concurrency:int=8,
+                      http_client=None,
+                      scheduler:RateScheduler|None=None):
+
         self.api_key=api_key
         self.api_url=api_url
         self.defualt_input_max_char=defualt_input_max_char
         self.defualt_output_max_token=defualt_output_max_token
         self.defualt_gen_temp=defualt_gen_temp
+        self.embedding_batch_size=min(embedding_batch_size,OPENAI_MAX_EMBEDDING_BATCH)
+        self.embedding_batch_max_chars=embedding_batch_max_chars
 
         self.generation_model_id=None
         self.embedding_model_id=None
         self.embedding_size=None
 
         # OpenAI SDK uses base_url instead of api_url; only set if provided
+        # 429s are retried by the scheduler, not silently inside the SDK
         if self.api_url:
-            self.client=OpenAI(api_key=self.api_key, base_url=self.api_url)
+            self.client=OpenAI(api_key=self.api_key, base_url=self.api_url, max_retries=0)
         else:
-            self.client=OpenAI(api_key=self.api_key)
-         
+            self.client=OpenAI(api_key=self.api_key, max_retries=0)
+
+        # async routes use the async client, its connections come from the shared pool
+        self.async_client=AsyncOpenAI(api_key=self.api_key, base_url=self.api_url, http_client=http_client, max_retries=0)
+        # caps this provider's in-flight async requests
+        self.semaphore=asyncio.Semaphore(max_concurrency)
+        # paces calls against the vendor's rate limits and retries its 429s
+        self.scheduler=scheduler or RateScheduler()
+
         self.logger=logging.getLogger(__name__)
 
     def set_generation_model(self,model_id:str):
         self.generation_model_id=model_id
-    
+
     def set_embedding_model(self,model_id:str,embedding_size:int):
         self.embedding_model_id=model_id
         self.embedding_size=embedding_size
-    
-    def generate_text(self,prompt:str,chat_history: list|None=None,
-    max_output_token:int|None=None,temperature:float|None=None):
+
+    def can_generate(self):
         if not self.client:
             self.logger.error("OpenAI client was not set")
-            return None
-
+            return False
         if not self.generation_model_id:
             self.logger.error("Generation model for openAI was not set")
-            return None
+            return False
+        return True
+
+    def can_embed(self):
+        if not self.client:
+            self.logger.error("OpenAI client was not set")
+            return False
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for openAI was not set")
+            return False
+        return True
 
+    def get_chat_request(self,prompt:str,chat_history: list|None=None,
+    max_output_token:int|None=None,temperature:float|None=None):
         max_tokens = max_output_token if max_output_token is not None else self.defualt_output_max_token
         temperature = temperature if temperature is not None else self.defualt_gen_temp
         messages = list(chat_history) if chat_history else []
         messages.append(self.construct_prompt(prompt=prompt,role=OpenAIEnum.USER.value))
 
-        response = self.client.chat.completions.create(
-            model=self.generation_model_id,
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
+        return {
+            "model": self.generation_model_id,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
 
+    def get_chat_text(self,response):
         if not response or not getattr(response, 'choices', None) or len(response.choices)==0 or not response.choices[0]:
             self.logger.error("Error while generating text with OpenAI")
             return None
         # OpenAI Chat Completions returns string content
         return response.choices[0].message.content
-         
+
+    def generate_text(self,prompt:str,chat_history: list|None=None,
+    max_output_token:int|None=None,temperature:float|None=None):
+        if not self.can_generate():
+            return None
+
+        request = self.get_chat_request(prompt,chat_history,max_output_token,temperature)
+        response = self.scheduler.call(
+            self.client.chat.completions.create, **request,
+            model_id=self.generation_model_id,
+            tokens=self.get_chat_tokens(prompt,chat_history,request),
+            priority=PRIORITY_INTERACTIVE
+        )
+        return self.get_chat_text(response)
+
+    async def generate_text_async(self,prompt:str,chat_history: list|None=None,
+    max_output_token:int|None=None,temperature:float|None=None):
+        if not self.can_generate():
+            return None
+
+        request = self.get_chat_request(prompt,chat_history,max_output_token,temperature)
+        response = await self.scheduler.call_async(
+            self.send_chat_async, request,
+            model_id=self.generation_model_id,
+            tokens=self.get_chat_tokens(prompt,chat_history,request),
+            priority=PRIORITY_INTERACTIVE
+        )
+        return self.get_chat_text(response)
+
+    async def send_chat_async(self,request:dict):
+        async with self.semaphore:
+            return await self.async_client.chat.completions.create(**request)
+
+    def get_chat_tokens(self,prompt:str,chat_history:list|None,request:dict):
+        # prompt and history count against the token budget, and so does the longest answer
+        return estimate_tokens([prompt]+[str(message) for message in chat_history or []])+request["max_tokens"]
 
     def embd_text(self,text:str,document_type:str=None):
-        if not self.client:
-            self.logger.error("OpenAI client was not set")
+        vectors=self.embed_texts([text],document_type=document_type)
+        return vectors[0] if vectors else None
+
+    async def embd_text_async(self,text:str,document_type:str=None):
+        vectors=await self.embed_texts_async([text],document_type=document_type)
+        return vectors[0] if vectors else None
+
+    def get_batcher(self,embed_batch,document_type:str=None):
+        return EmbeddingBatcher(
+            embed_batch=partial(embed_batch,document_type=document_type),
+            max_batch_items=self.embedding_batch_size,
+            max_batch_chars=self.embedding_batch_max_chars,
+            scheduler=self.scheduler,
+            model_id=self.embedding_model_id,
+            priority=get_priority(document_type)
+        )
+
+    def embed_texts(self,texts:list,document_type:str=None):
+        if not self.can_embed():
             return None
-        if not self.embedding_model_id:
-            self.logger.error("Embedding model for openAI was not set")
+        return self.get_batcher(self.embed_batch,document_type).embed(texts)
+
+    async def embed_texts_async(self,texts:list,document_type:str=None):
+        if not self.can_embed():
             return None
+        return await self.get_batcher(self.embed_batch_async,document_type).embed_async(texts)
 
+    def embed_batch(self,texts:list,document_type:str=None):
+        """One embeddings request for a whole batch"""
         response = self.client.embeddings.create(
             model=self.embedding_model_id,
-            input=text,
+            input=texts,
         )
-
-        if not response or not getattr(response, 'data', None) or len(response.data)==0 or not getattr(response.data[0], 'embedding', None):
-            self.logger.error("Error while embedding text with openai")
+        return self.get_vectors(response,len(texts))
+
+    async def embed_batch_async(self,texts:list,document_type:str=None):
+        async with self.semaphore:
+            response = await self.async_client.embeddings.create(
+                model=self.embedding_model_id,
+                input=texts,
+            )
+        return self.get_vectors(response,len(texts))
+
+    def get_vectors(self,response,count:int):
+        if not response or not getattr(response, 'data', None):
+            self.logger.error("Error while embedding texts with openai")
             return None
 
-        return response.data[0].embedding
+        # every item carries the position of its input, don't rely on response order
+        vectors=[None]*count
+        for item in response.data:
+            vectors[item.index]=item.embedding
+        return vectors
 
     def construct_prompt(self,prompt:str,role:str):
         return {
@@ -91,14 +195,3 @@ class OpenaiProvider(LLMInterface):
 
     def process_text(self,text:str):
         return text[:self.defualt_input_max_char].strip()
-
- 
-
-
-       
-
-
-
-
-        
-    
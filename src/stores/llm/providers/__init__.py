@@ -1 +1,3 @@
-from Qdrant
\ No newline at end of file
+from .CohereProvider import CohereProvider
+from .OpenaiProvider import OpenaiProvider
+from .LocalProvider import LocalProvider
@@ -0,0 +1,227 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import hashlib
+import re
+
+CHUNK_UNIT_CHAR = "char"
+CHUNK_UNIT_TOKEN = "token"
+
+WORD_PATTERN = re.compile(r"\S+\s*")
+
+
+def get_content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def number_duplicate_hashes(chunk_dicts: List[Dict[str, Any]]):
+    """
+    Make content hashes unique within a file: the n-th repeat of a chunk gets
+    a ":n" suffix, so repeated boilerplate keeps one stored chunk per occurrence.
+    """
+    seen: Dict[str, int] = {}
+    for chunk in chunk_dicts:
+        content_hash = chunk["content_hash"].split(":")[0]
+        occurrence = seen.get(content_hash, 0)
+        seen[content_hash] = occurrence + 1
+        chunk["content_hash"] = f"{content_hash}:{occurrence}" if occurrence else content_hash
+    return chunk_dicts
+
+
+@dataclass
+class TextChunk:
+    content: str
+    chunk_id: int
+    metadata: Dict[str, Any]
+
+
+# A window unit is a line (or a piece of a long line) kept as a plain list,
+# which is much cheaper to build than an object on the hot path
+UNIT_PAGE, UNIT_PAGE_METADATA, UNIT_START, UNIT_TEXT, UNIT_LENGTH = range(5)
+
+
+class FileChunker:
+    """
+    Streaming chunker: pages go in, chunks come out.
+
+    Text is cut on line boundaries into chunks of at most `chunk_size` units
+    (characters, or whitespace-separated tokens when `length_unit="token"`),
+    and each chunk starts with the last `chunk_overlap` units of the previous one.
+    Lines longer than `chunk_size - chunk_overlap` are cut into pieces of that
+    size, so the overlap always fits next to the piece that follows it.
+    Every line is appended and dropped from the window once, and each chunk
+    is joined once, so the cost is linear in the size of the input.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 length_unit: str = CHUNK_UNIT_CHAR):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        if chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be between 0 and chunk_size - 1")
+        if length_unit not in (CHUNK_UNIT_CHAR, CHUNK_UNIT_TOKEN):
+            raise ValueError(f"Unknown chunk length unit: {length_unit}")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.piece_size = chunk_size - chunk_overlap
+        self.length_unit = length_unit
+
+    def measure(self, text: str) -> int:
+        if self.length_unit == CHUNK_UNIT_TOKEN:
+            return len(text.split())
+        return len(text)
+
+    def split_long_line(self, line: str) -> Iterator[Tuple[int, str]]:
+        """Cut a line longer than piece_size into (offset, piece) parts that fit"""
+        piece_size = self.piece_size
+        if self.length_unit == CHUNK_UNIT_TOKEN:
+            words = [m.start() for m in WORD_PATTERN.finditer(line)]
+            cuts = words[piece_size::piece_size]
+            starts = [0] + cuts
+            ends = cuts + [len(line)]
+            for start, end in zip(starts, ends):
+                yield start, line[start:end]
+            return
+
+        start = 0
+        while start < len(line):
+            end = start + piece_size
+            if end < len(line):
+                # Prefer cutting after a space in the second half of the window
+                space = line.rfind(" ", start + piece_size // 2, end)
+                if space != -1:
+                    end = space + 1
+            yield start, line[start:end]
+            start = end
+
+    def tail(self, text: str, keep: int) -> str:
+        """The last `keep` units of text, starting on a word boundary"""
+        if keep <= 0:
+            return ""
+
+        if self.length_unit == CHUNK_UNIT_TOKEN:
+            words = [m.start() for m in WORD_PATTERN.finditer(text)]
+            if keep >= len(words):
+                return text
+            return text[words[-keep]:]
+
+        if keep >= len(text):
+            return text
+        piece = text[-keep:]
+        if text[-keep - 1].isspace():
+            return piece
+        # Do not start the overlap in the middle of a word
+        space = piece.find(" ")
+        if space == -1:
+            return ""
+        return piece[space + 1:]
+
+    def iter_chunks(self, pages: Iterable[Tuple[str, dict]], first_page: int = 0) -> Iterator[TextChunk]:
+        """
+        Yield chunks from an iterable of (page_text, page_metadata), numbering pages from first_page.
+        Chunk metadata records the page and character offsets where it starts and ends.
+        """
+        window = deque()
+        window_length = 0
+        has_new_text = False
+        chunk_id = 0
+
+        def emit():
+            first, last = window[0], window[-1]
+            content = "".join(unit[UNIT_TEXT] for unit in window)
+            metadata = dict(first[UNIT_PAGE_METADATA])
+            metadata.update({
+                "page": first[UNIT_PAGE],
+                "page_end": last[UNIT_PAGE],
+                "start_index": first[UNIT_START],
+                "end_index": last[UNIT_START] + len(last[UNIT_TEXT]),
+            })
+            return TextChunk(content=content.strip(), chunk_id=chunk_id, metadata=metadata)
+
+        def trim(target: int):
+            nonlocal window_length
+            # Drop whole units while what is left still covers the target
+            while window and window_length - window[0][UNIT_LENGTH] >= target:
+                window_length -= window.popleft()[UNIT_LENGTH]
+            if not window or window_length <= target:
+                return
+            # Cut the first unit so exactly `target` units stay in the window
+            first = window[0]
+            keep = target - (window_length - first[UNIT_LENGTH])
+            text = self.tail(first[UNIT_TEXT], keep)
+            if not text:
+                window_length -= window.popleft()[UNIT_LENGTH]
+                return
+            length = self.measure(text)
+            first[UNIT_START] += len(first[UNIT_TEXT]) - len(text)
+            first[UNIT_TEXT] = text
+            window_length -= first[UNIT_LENGTH] - length
+            first[UNIT_LENGTH] = length
+
+        measure = len if self.length_unit == CHUNK_UNIT_CHAR else self.measure
+        chunk_size = self.chunk_size
+        piece_size = self.piece_size
+
+        def page_units(page_text: str):
+            offset = 0
+            for line in page_text.splitlines(keepends=True):
+                length = measure(line)
+                if length > piece_size:
+                    for start, piece in self.split_long_line(line):
+                        yield offset + start, piece, measure(piece)
+                else:
+                    yield offset, line, length
+                offset += len(line)
+
+        for page, (page_text, page_metadata) in enumerate(pages, start=first_page):
+            page_metadata = page_metadata or {}
+            # Keep the last word of the previous page apart from the first one of this page
+            if window and not window[-1][UNIT_TEXT][-1:].isspace():
+                last = window[-1]
+                last[UNIT_TEXT] += "\n"
+                # the newline is one more character, in token units it adds nothing
+                length = measure(last[UNIT_TEXT])
+                window_length += length - last[UNIT_LENGTH]
+                last[UNIT_LENGTH] = length
+
+            for start, piece, length in page_units(page_text):
+                if window_length + length > chunk_size and window:
+                    if has_new_text:
+                        chunk = emit()
+                        if chunk.content:
+                            yield chunk
+                            chunk_id += 1
+                        has_new_text = False
+                    trim(self.chunk_overlap)
+
+                window.append([page, page_metadata, start, piece, length])
+                window_length += length
+                if not has_new_text and not piece.isspace():
+                    has_new_text = True
+
+        if window and has_new_text:
+            chunk = emit()
+            if chunk.content:
+                yield chunk
+
+    def chunk_text(self, text: str, metadata: dict) -> List[Dict[str, Any]]:
+        """Chunk a single text into documents ready for ChunkModel.insert_chunks"""
+        return self.to_chunk_dicts(self.iter_chunks([(text, {})]), metadata=metadata)
+
+    def to_chunk_dicts(self, chunks: Iterable[TextChunk], metadata: dict) -> List[Dict[str, Any]]:
+        chunk_dicts = [
+            {
+                "project_id": metadata["project_id"],
+                "filename": metadata["filename"],
+                "chunk_id": chunk.chunk_id,
+                "chunk_size": len(chunk.content),
+                "content": chunk.content,
+                "content_hash": get_content_hash(chunk.content),
+                "metadata": {**metadata, **chunk.metadata},
+            }
+            for chunk in chunks
+        ]
+        for chunk in chunk_dicts:
+            chunk["total_chunks"] = len(chunk_dicts)
+        return number_duplicate_hashes(chunk_dicts)
@@ -0,0 +1,128 @@
+"""
+Format-aware text extraction.
+
+Each backend is a generator yielding (text, metadata) one page or block of
+paragraphs at a time, so a document is never held in memory as a whole.
+The backend is picked from the sniffed content type, not the file extension.
+"""
+from typing import Iterator, Tuple
+from xml.etree.ElementTree import iterparse
+import zipfile
+
+from helpers.config import get_settings
+from .file_types import (
+    DOCX_CONTENT_TYPE,
+    PDF_CONTENT_TYPE,
+    TEXT_CONTENT_TYPE,
+    get_fallback_encoding,
+    sniff_text_encoding,
+)
+
+# Paragraphs are grouped into blocks of about this many characters
+DEFAULT_BLOCK_CHARS = 65536
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class UnsupportedFileType(ValueError):
+    pass
+
+
+def iter_text_lines(file_path: str, fallback_encodings: list = None) -> Iterator[str]:
+    """
+    Lines of a text file decoded as the upload was sniffed: BOM, UTF-8 or a fallback encoding.
+    Only the first block was sniffed, so a UTF-8 file switches to the fallback encoding its
+    first undecodable line fits, for the rest of the file; nothing is dropped silently.
+    """
+    encoding = sniff_text_encoding(file_path, fallback_encodings)
+    if encoding != "utf-8":
+        with open(file_path, "r", encoding=encoding, errors="replace") as f:
+            yield from f
+        return
+
+    with open(file_path, "rb") as f:
+        for line in f:
+            if encoding == "utf-8":
+                try:
+                    yield line.decode(encoding).replace("\r\n", "\n")
+                    continue
+                except UnicodeDecodeError:
+                    encoding = get_fallback_encoding(line, fallback_encodings) or encoding
+            yield line.decode(encoding, errors="replace").replace("\r\n", "\n")
+
+
+def iter_text_pages(file_path: str, start: int = 0, stop: int = None,
+                    block_chars: int = DEFAULT_BLOCK_CHARS) -> Iterator[Tuple[str, dict]]:
+    """Blocks of whole lines, cut at blank lines (paragraph ends) once block_chars is reached"""
+    lines = []
+    size = 0
+    block_offset = 0
+    for line in iter_text_lines(file_path, get_settings().FILE_TEXT_FALLBACK_ENCODINGS):
+        lines.append(line)
+        size += len(line)
+        # cut at a paragraph end, or anywhere once a block gets far too long
+        if (size >= block_chars and not line.strip()) or size >= block_chars * 4:
+            yield "".join(lines), {"source": file_path, "offset": block_offset}
+            block_offset += size
+            lines = []
+            size = 0
+
+    if lines:
+        yield "".join(lines), {"source": file_path, "offset": block_offset}
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: int = None) -> Iterator[Tuple[str, dict]]:
+    """One PDF page at a time, optionally limited to the page range [start, stop)"""
+    import fitz
+
+    with fitz.open(file_path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for page_number in range(start, stop):
+            text = doc.load_page(page_number).get_text()
+            yield text, {"source": file_path, "total_pages": doc.page_count}
+
+
+def iter_docx_pages(file_path: str, start: int = 0, stop: int = None,
+                    block_chars: int = DEFAULT_BLOCK_CHARS) -> Iterator[Tuple[str, dict]]:
+    """Paragraphs of word/document.xml parsed incrementally, grouped into blocks"""
+    paragraphs = []
+    size = 0
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open("word/document.xml") as document:
+            for _, element in iterparse(document, events=("end",)):
+                if element.tag != f"{WORD_NAMESPACE}p":
+                    continue
+
+                text = "".join(node.text or "" for node in element.iter(f"{WORD_NAMESPACE}t"))
+                # drop the parsed paragraph so the tree never holds the whole document
+                element.clear()
+                if not text.strip():
+                    continue
+
+                paragraphs.append(text + "\n")
+                size += len(text) + 1
+                if size >= block_chars:
+                    yield "".join(paragraphs), {"source": file_path}
+                    paragraphs = []
+                    size = 0
+
+    if paragraphs:
+        yield "".join(paragraphs), {"source": file_path}
+
+
+EXTRACTORS = {
+    TEXT_CONTENT_TYPE: iter_text_pages,
+    PDF_CONTENT_TYPE: iter_pdf_pages,
+    DOCX_CONTENT_TYPE: iter_docx_pages,
+}
+
+
+def get_extractor(content_type: str):
+    extractor = EXTRACTORS.get(content_type)
+    if extractor is None:
+        raise UnsupportedFileType(f"No text extractor for content type: {content_type}")
+    return extractor
+
+
+def iter_file_pages(file_path: str, content_type: str, start: int = 0, stop: int = None) -> Iterator[Tuple[str, dict]]:
+    return get_extractor(content_type)(file_path, start=start, stop=stop)
@@ -0,0 +1,95 @@
+import re
+from typing import Optional
+
+# Magic bytes used to detect the real type of a file from its first block
+FILE_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+]
+
+PDF_CONTENT_TYPE = "application/pdf"
+TEXT_CONTENT_TYPE = "text/plain"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ZIP_CONTENT_TYPE = "application/zip"
+TAR_CONTENT_TYPE = "application/x-tar"
+GZIP_CONTENT_TYPE = "application/gzip"
+ARCHIVE_CONTENT_TYPES = [ZIP_CONTENT_TYPE, TAR_CONTENT_TYPE, GZIP_CONTENT_TYPE]
+UNKNOWN_CONTENT_TYPE = "application/octet-stream"
+
+SNIFF_BLOCK_SIZE = 4096
+
+# Byte order marks of text files, UTF-32 LE's first: it starts with UTF-16 LE's
+TEXT_BOMS = [
+    (b"\xff\xfe\x00\x00", "utf-32"),
+    (b"\x00\x00\xfe\xff", "utf-32"),
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+]
+# Tried after UTF-8 for text without a BOM, e.g. Arabic text saved by Windows
+DEFAULT_FALLBACK_ENCODINGS = ["cp1256"]
+# A single-byte code page decodes any bytes, binary data shows up as control characters
+CONTROL_CHARACTER_PATTERN = re.compile(r"[\x00-\x08\x0e-\x1f\x7f]")
+
+
+def detect_text_encoding(block: bytes, fallback_encodings: list = None) -> Optional[str]:
+    """Encoding of text starting with block: its BOM, UTF-8, else the first fallback it decodes with; None if binary"""
+    for bom, encoding in TEXT_BOMS:
+        if block.startswith(bom):
+            return encoding
+
+    if b"\x00" in block:
+        return None
+
+    # The block may end in the middle of a multi-byte character, but is not all of one
+    for cut in range(min(4, len(block))):
+        try:
+            block[:len(block) - cut].decode("utf-8")
+            return "utf-8"
+        except UnicodeDecodeError:
+            continue
+
+    return get_fallback_encoding(block, fallback_encodings)
+
+
+def get_fallback_encoding(block: bytes, fallback_encodings: list = None) -> Optional[str]:
+    """The first fallback encoding block decodes with as text, None if none does"""
+    for encoding in fallback_encodings if fallback_encodings is not None else DEFAULT_FALLBACK_ENCODINGS:
+        try:
+            text = block.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            continue
+        if not CONTROL_CHARACTER_PATTERN.search(text):
+            return encoding
+    return None
+
+
+def sniff_content_type(block: bytes, fallback_encodings: list = None) -> str:
+    """Detect the content type from the first bytes of a file"""
+    for signature, content_type in FILE_SIGNATURES:
+        if block.startswith(signature):
+            # docx is a zip archive whose first entries describe a word document
+            if content_type == ZIP_CONTENT_TYPE and (b"word/" in block or b"[Content_Types].xml" in block):
+                return DOCX_CONTENT_TYPE
+            return content_type
+
+    # tar has no leading magic, its header carries "ustar" at offset 257
+    if block[257:262] == b"ustar":
+        return TAR_CONTENT_TYPE
+
+    if detect_text_encoding(block, fallback_encodings) is not None:
+        return TEXT_CONTENT_TYPE
+
+    return UNKNOWN_CONTENT_TYPE
+
+
+def sniff_file_type(file_path: str, fallback_encodings: list = None) -> str:
+    with open(file_path, "rb") as f:
+        return sniff_content_type(f.read(SNIFF_BLOCK_SIZE), fallback_encodings)
+
+
+def sniff_text_encoding(file_path: str, fallback_encodings: list = None) -> str:
+    with open(file_path, "rb") as f:
+        return detect_text_encoding(f.read(SNIFF_BLOCK_SIZE), fallback_encodings) or "utf-8"
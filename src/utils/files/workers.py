@@ -0,0 +1,47 @@
+"""
+Module-level functions run inside the process pool.
+They only take and return picklable values (paths, params, lists of dicts).
+"""
+from typing import Any, Dict, List, Tuple
+from helpers.timing import StageTimer
+from .chunck import FileChunker, CHUNK_UNIT_CHAR
+from .extractors import iter_file_pages
+
+
+def count_pdf_pages(file_path: str) -> int:
+    import fitz
+
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+
+def load_file_pages(file_path: str, content_type: str, start: int = 0, stop: int = None) -> List[Tuple[str, dict]]:
+    return list(iter_file_pages(file_path, content_type, start=start, stop=stop))
+
+
+def chunk_file(file_path: str, content_type: str, metadata: Dict[str, Any],
+               chunk_size: int, chunk_overlap: int, length_unit: str = CHUNK_UNIT_CHAR,
+               start: int = 0, stop: int = None) -> Dict[str, Any]:
+    """
+    Extract a file (or a page range of a PDF) and chunk it in the worker.
+    Pages stream from the extractor straight into the chunker, one at a time.
+    """
+    timer = StageTimer()
+    chunker = FileChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_unit=length_unit)
+
+    pages = timer.track("extract", iter_file_pages(file_path, content_type, start=start, stop=stop))
+    chunks = timer.track("chunk", chunker.iter_chunks(pages, first_page=start))
+    chunk_dicts = chunker.to_chunk_dicts(chunks, metadata=metadata)
+
+    # the chunk stage timer also ran while pages were being extracted
+    timings = timer.as_dict()
+    timings["chunk"] = round(max(0.0, timings.get("chunk", 0.0) - timings.get("extract", 0.0)), 4)
+
+    return {"chunks": chunk_dicts, "timings": timings}
+
+
+def chunk_pages(pages: List[Tuple[str, dict]], metadata: Dict[str, Any],
+                chunk_size: int, chunk_overlap: int, length_unit: str = CHUNK_UNIT_CHAR) -> List[Dict[str, Any]]:
+    """Chunk already extracted pages in the worker"""
+    chunker = FileChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_unit=length_unit)
+    return chunker.to_chunk_dicts(chunker.iter_chunks(pages), metadata=metadata)
@@ -0,0 +1,78 @@
+from collections import Counter
+from typing import Dict, List, Tuple
+import math
+import re
+
+# Letters and digits, joined by "-" or "_" into one token: error codes and
+# identifiers like ERR_CONN_RESET or HTTP-404 stay searchable as a whole
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_][^\W_]+)*")
+TOKEN_PART_PATTERN = re.compile(r"[-_]")
+MAX_TOKEN_LENGTH = 64  # longer runs are encoded data, not words
+
+# Harakat, Quranic marks and tatweel
+ARABIC_MARKS_PATTERN = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+ARABIC_LETTER_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # Persian digits
+})
+# Definite article with its attached particles, longest first
+ARABIC_ARTICLES = ("وال", "بال", "كال", "فال", "لل", "ال")
+
+# Stopwords, normalized below; they are in most chunks and weigh nothing in BM25
+STOPWORDS_TEXT = """
+a an and are as at be but by for from has have in into is it its of on or that the their then there
+these this to was were which will with not no can do does if so such than they we you he she
+في من على الى عن مع هذا هذه ذلك تلك التي الذي الذين هو هي هم او ان كان كانت لا ما لم لن قد ثم كل بين
+عند حتى بعد قبل اي غير انه انها و ف ب ل
+"""
+
+
+def normalize(text: str) -> str:
+    """Case-folds and unifies Arabic spelling variants, so queries match how documents were written"""
+    return ARABIC_MARKS_PATTERN.sub("", text.casefold()).translate(ARABIC_LETTER_MAP)
+
+
+STOPWORDS = frozenset(normalize(word) for word in STOPWORDS_TEXT.split())
+
+
+def strip_arabic_article(token: str) -> str:
+    for article in ARABIC_ARTICLES:
+        if token.startswith(article) and len(token) - len(article) >= 2:
+            return token[len(article):]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Terms of a text, in order. A joined identifier yields itself and its parts,
+    Arabic words lose the definite article, stopwords are dropped.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(normalize(text)):
+        if len(token) > MAX_TOKEN_LENGTH:
+            continue
+        parts = TOKEN_PART_PATTERN.split(token)
+        if len(parts) > 1:
+            terms.append(token)
+        for part in parts:
+            if part not in STOPWORDS:
+                terms.append(strip_arabic_article(part))
+    return terms
+
+
+def get_term_frequencies(text: str) -> Tuple[Dict[str, int], int]:
+    """(term -> count, number of terms) of a text"""
+    terms = tokenize(text)
+    return dict(Counter(terms)), len(terms)
+
+
+def bm25_idf(chunks: int, df: int) -> float:
+    # the +1 keeps terms found in most chunks from scoring negative
+    return math.log(1 + (chunks - df + 0.5) / (df + 0.5))
+
+
+def bm25_term_score(tf: int, idf: float, length: int, average_length: float,
+                    k1: float = 1.2, b: float = 0.75) -> float:
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average_length))